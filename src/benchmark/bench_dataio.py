@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Compare loading time of device profile with pure Python YAML loader, libyaml loader and compiled cache.
+"""
+
+try:
+    ## following import success only when file is directly executed from command line
+    ## otherwise will throw exception when executing as parameter for "python -m"
+    # pylint: disable=W0611
+    import __init__
+except ImportError:
+    ## when import fails then it means that the script was executed indirectly
+    ## in this case __init__ is already loaded
+    pass
+
+import os
+import timeit
+import argparse
+import tempfile
+
+import yaml
+
+from btgattmitm import dataio
+
+
+def generate_profile(services_num: int, chars_num: int):
+    services = {}
+    handle = 1
+    for serv_index in range(services_num):
+        serv_uuid = f"0000{0xA000 + serv_index:04x}-0000-1000-8000-00805f9b34fb"
+        chars = {}
+        for char_index in range(chars_num):
+            char_uuid = f"0000{0xB000 + serv_index * chars_num + char_index:04x}-0000-1000-8000-00805f9b34fb"
+            chars[char_uuid] = {
+                "name": f"char {char_index}",
+                "uuid": char_uuid,
+                "handle": handle,
+                "properties": ["read", "write", "notify"],
+                "value": 0,
+            }
+            handle += 2
+        services[serv_uuid] = {"name": f"service {serv_index}", "uuid": serv_uuid, "characteristics": chars}
+    return {
+        "connectto": "AA:BB:CC:DD:EE:FF",
+        "addrtype": "public",
+        "advertisement": {1: 6, 9: "device", 0xFF: {0x0059: bytearray(os.urandom(20))}},
+        "scanresponse": {0x16: {"180f": bytearray(os.urandom(4))}},
+        "services": services,
+    }
+
+
+def load_pure(path):
+    with open(path, encoding="utf-8") as data_file:
+        return yaml.load(data_file, Loader=yaml.FullLoader)
+
+
+def load_libyaml(path):
+    return dataio.load_from(path, use_cache=False)
+
+
+def load_cached(path):
+    return dataio.load_from(path, use_cache=True)
+
+
+def measure(function, path, number) -> float:
+    total = timeit.timeit(lambda: function(path), number=number)
+    return total / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Device profile loading benchmark")
+    parser.add_argument("--number", type=int, default=20, help="Number of iterations")
+    args = parser.parse_args()
+
+    cases = [("small", 3, 4), ("large", 20, 20)]
+    print(f"{'profile':<8} {'chars':>6} {'pure [ms]':>10} {'libyaml [ms]':>13} {'cache [ms]':>11}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for label, services_num, chars_num in cases:
+            path = os.path.join(temp_dir, f"{label}.yaml")
+            dataio.dump_to(generate_profile(services_num, chars_num), path)
+            ## create cache
+            load_cached(path)
+            pure_time = measure(load_pure, path, args.number)
+            libyaml_time = measure(load_libyaml, path, args.number)
+            cache_time = measure(load_cached, path, args.number)
+            chars_total = services_num * chars_num
+            print(f"{label:<8} {chars_total:>6} {pure_time:>10.2f} {libyaml_time:>13.2f} {cache_time:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Measure import time of command line interface using 'python -X importtime'.
+
+Script exits with error code when total import time exceeds given limit,
+so it can be used to detect startup regressions (e.g. eager import of backend).
+"""
+
+import os
+import sys
+import argparse
+import subprocess  # nosec
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, os.pardir))
+
+
+def measure_imports(args_list):
+    """Return list of tuples (module, self time [us], cumulative time [us], nesting level)."""
+    command = [sys.executable, "-X", "importtime", os.path.join(SRC_DIR, "btgattmitm", "main.py")] + args_list
+    result = subprocess.run(command, capture_output=True, text=True, check=False, cwd=SRC_DIR)  # nosec
+    ret_list = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        items = line[len("import time:") :].split("|")
+        if len(items) != 3:
+            continue
+        try:
+            self_time = int(items[0])
+            cumulative_time = int(items[1])
+        except ValueError:
+            ## header line
+            continue
+        module_field = items[2].rstrip()
+        module_name = module_field.lstrip()
+        ## top level modules are preceded by single space
+        level = (len(module_field) - len(module_name) - 1) // 2
+        ret_list.append((module_name, self_time, cumulative_time, level))
+    return ret_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI import time benchmark")
+    parser.add_argument("--top", type=int, default=15, help="Number of heaviest imports to print")
+    parser.add_argument("--limit", type=float, default=0, help="Maximum allowed total import time in ms (0 - no limit)")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of measurements (best one is taken)")
+    args = parser.parse_args()
+
+    best_total = None
+    best_imports = None
+    for _ in range(args.repeat):
+        imports_list = measure_imports(["--help"])
+        total = sum(item[1] for item in imports_list)
+        if best_total is None or total < best_total:
+            best_total = total
+            best_imports = imports_list
+
+    top_level = [item for item in best_imports if item[3] == 0]
+    top_level.sort(key=lambda item: item[2], reverse=True)
+    print(f"{'module':<50} {'cumulative [ms]':>16}")
+    for module_name, _self_time, cumulative_time, _level in top_level[: args.top]:
+        print(f"{module_name:<50} {cumulative_time / 1000:>16.2f}")
+
+    total_ms = best_total / 1000
+    print(f"total import time of 'main.py --help': {total_ms:.2f} ms")
+    loaded = set(item[0] for item in best_imports)
+    for backend_module in ("bluepy", "bleak", "dbus", "gi"):
+        if backend_module in loaded:
+            print(f"warning: backend module '{backend_module}' imported eagerly")
+
+    if args.limit > 0 and total_ms > args.limit:
+        print(f"import time exceeds limit: {total_ms:.2f} > {args.limit:.2f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Compare byte-by-byte value marshalling with bulk conversion from 'bytesconv' module.
+"""
+
+try:
+    ## following import success only when file is directly executed from command line
+    ## otherwise will throw exception when executing as parameter for "python -m"
+    # pylint: disable=W0611
+    import __init__
+except ImportError:
+    ## when import fails then it means that the script was executed indirectly
+    ## in this case __init__ is already loaded
+    pass
+
+import os
+import struct
+import logging
+import timeit
+import argparse
+
+import dbus
+
+from btgattmitm.dbusobject.bytesconv import to_bytes, to_dbus_bytes, HexData
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+PAYLOAD_SIZES = [20, 244, 512]
+
+
+## ============== previous implementation ==============
+
+
+def old_to_hex_string(data):
+    if isinstance(data, bytes):
+        return data.hex()
+    return " ".join("0x{:02X}".format(x) for x in data)
+
+
+def old_write(value):
+    data = bytes()
+    for val in value:
+        data += struct.pack("B", val)
+    _LOGGER.debug("Client writes: data: %s hex: %s", repr(data), old_to_hex_string(data))
+    return data
+
+
+def old_notify(value):
+    vallist = []
+    for x in value:
+        vallist.append(dbus.Byte(x))
+    return vallist
+
+
+def old_read(value):
+    _LOGGER.debug("Client reads: data: %s hex: %s", repr(value), old_to_hex_string(value))
+    return value
+
+
+## ============== current implementation ==============
+
+
+def new_write(value):
+    data = to_bytes(value)
+    _LOGGER.debug("Client writes: data: %r hex: %s", data, HexData(data))
+    return data
+
+
+def new_notify(value):
+    return to_dbus_bytes(value)
+
+
+def new_read(value):
+    _LOGGER.debug("Client reads: data: %r hex: %s", value, HexData(value))
+    return to_dbus_bytes(value)
+
+
+## =====================================================
+
+
+def measure(function, value, number) -> float:
+    total = timeit.timeit(lambda: function(value), number=number)
+    return total / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Value marshalling benchmark")
+    parser.add_argument("--number", type=int, default=20000, help="Number of iterations")
+    args = parser.parse_args()
+
+    ## debug logging disabled as in normal operation
+    logging.basicConfig(level=logging.INFO)
+
+    print(f"{'case':<10} {'size':>5} {'old [us]':>10} {'new [us]':>10} {'speedup':>8}")
+    for size in PAYLOAD_SIZES:
+        payload = os.urandom(size)
+        ## WriteValue previously received array of 'dbus.Byte', now 'dbus.ByteArray'
+        dbus_array = dbus.Array([dbus.Byte(item) for item in payload], signature="y")
+        dbus_bytes = dbus.ByteArray(payload)
+        ## bluepy returns bytes, bleak returns bytearray
+        cases = [
+            ("write", old_write, dbus_array, new_write, dbus_bytes),
+            ("read", old_read, payload, new_read, payload),
+            ("notify", old_notify, bytearray(payload), new_notify, bytearray(payload)),
+        ]
+        for label, old_function, old_value, new_function, new_value in cases:
+            old_time = measure(old_function, old_value, args.number)
+            new_time = measure(new_function, new_value, args.number)
+            print(f"{label:<10} {size:>5} {old_time:>10.2f} {new_time:>10.2f} {old_time / new_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Compare idle CPU usage and notification latency of event-driven NotificationHandler
+against legacy "process_notifications() + sleep(0.001)" loop.
+
+Backend is simulated by pipe: producer writes timestamps, connector reads them.
+"""
+
+try:
+    ## following import success only when file is directly executed from command line
+    ## otherwise will throw exception when executing as parameter for "python -m"
+    ## aliased - module defines classes with '__init__' methods
+    # pylint: disable=W0611
+    import __init__ as _bootstrap
+except ImportError:
+    ## when import fails then it means that the script was executed indirectly
+    ## in this case __init__ is already loaded
+    pass
+
+import os
+import time
+import struct
+import select
+import argparse
+from threading import Thread
+
+from btgattmitm.connector import AbstractConnector, NotificationHandler
+from btgattmitm.upstream import LatencyStats
+
+
+RECORD_FORMAT = "d"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+
+class PipeConnector(AbstractConnector):
+    def __init__(self, expose_fd: bool):
+        self.expose_fd = expose_fd
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.latency = LatencyStats(max_samples=100000)
+
+    def is_connected(self) -> bool:
+        return True
+
+    def get_notification_fd(self) -> int:
+        if self.expose_fd:
+            return self.read_fd
+        return None
+
+    def process_notifications(self):
+        ## non-blocking drain of pending data
+        ready, _, _ = select.select([self.read_fd], [], [], 0)
+        if not ready:
+            return
+        try:
+            data = os.read(self.read_fd, RECORD_SIZE * 64)
+        except BlockingIOError:
+            return
+        now = time.perf_counter()
+        for offset in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+            sent_time = struct.unpack_from(RECORD_FORMAT, data, offset)[0]
+            self.latency.add(now - sent_time)
+
+    def notify(self):
+        os.write(self.write_fd, struct.pack(RECORD_FORMAT, time.perf_counter()))
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class LegacyNotificationHandler(Thread):
+    """Copy of previous implementation of notification handler loop."""
+
+    def __init__(self, connector: AbstractConnector):
+        Thread.__init__(self, target=self._work)
+        self.connector = connector
+        self.daemon = True
+        self.execute = True
+
+    def stop(self):
+        self.execute = False
+        self.join()
+
+    def _work(self):
+        while self.execute:
+            self.connector.process_notifications()
+            time.sleep(0.001)  ## prevents starving other thread
+
+
+def measure(handler_class, expose_fd: bool, idle_time: float, notify_count: int, notify_interval: float):
+    connector = PipeConnector(expose_fd)
+    handler = handler_class(connector)
+    handler.start()
+    try:
+        ## idle CPU
+        start_cpu = time.process_time()
+        start_wall = time.perf_counter()
+        time.sleep(idle_time)
+        idle_cpu = (time.process_time() - start_cpu) / (time.perf_counter() - start_wall) * 100.0
+
+        ## notification latency
+        for _ in range(notify_count):
+            connector.notify()
+            time.sleep(notify_interval)
+        time.sleep(0.05)
+    finally:
+        handler.stop()
+        connector.close()
+    return idle_cpu, connector.latency.get_summary()
+
+
+def print_result(label, idle_cpu, latency):
+    print(
+        f"{label:<14} idle CPU: {idle_cpu:6.2f}%"
+        f"  latency p50: {latency['p50'] * 1e6:8.1f} us"
+        f"  p99: {latency['p99'] * 1e6:8.1f} us"
+        f"  max: {latency['max'] * 1e6:8.1f} us"
+        f"  samples: {latency['count']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notification handler benchmark")
+    parser.add_argument("--idletime", type=float, default=3.0, help="Idle measurement time in seconds")
+    parser.add_argument("--count", type=int, default=500, help="Number of notifications")
+    parser.add_argument("--interval", type=float, default=0.002, help="Interval between notifications in seconds")
+    args = parser.parse_args()
+
+    idle_cpu, latency = measure(LegacyNotificationHandler, False, args.idletime, args.count, args.interval)
+    print_result("legacy loop", idle_cpu, latency)
+
+    idle_cpu, latency = measure(NotificationHandler, True, args.idletime, args.count, args.interval)
+    print_result("event-driven", idle_cpu, latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Inventory of local Bluetooth adapters.
+
+List of adapters is read once from sysfs (or mgmt socket when sysfs is not available)
+and cached until adapter is added or removed. Changes are detected by listening mgmt
+events in background thread, without privileges to mgmt socket list is read again
+when looked up adapter is not found.
+"""
+
+import os
+import re
+import logging
+import threading
+import subprocess  # nosec
+from typing import List, Dict, Callable
+
+from btgattmitm.synchronized import synchronized
+from btgattmitm.btmgmt.mgmtsocket import (
+    MgmtSocket,
+    MgmtError,
+    MGMT_EV_INDEX_ADDED,
+    MGMT_EV_INDEX_REMOVED,
+    MGMT_SETTING_LE,
+    MGMT_SETTING_POWERED,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+SYSFS_BLUETOOTH_PATH = "/sys/class/bluetooth"
+
+## adapter entries are named 'hci{index}', connections are named 'hci{index}:{handle}'
+ADAPTER_NAME_PATTERN = re.compile(r"^hci(\d+)$")
+
+
+class AdapterInfo:
+    def __init__(self, index: int, address: str = None):
+        self.index = index
+        self.name = f"hci{index}"
+        self.address = address
+        self.alias: str = None  ## friendly name of controller
+        self.dev_type: str = None  ## e.g. 'Primary'
+        ## bits of mgmt settings (MGMT_SETTING_*), None if unknown
+        self.supported_settings: int = None
+        self.current_settings: int = None
+
+    def is_le_supported(self) -> bool:
+        if self.supported_settings is None:
+            ## unknown - assume supported
+            return True
+        return bool(self.supported_settings & MGMT_SETTING_LE)
+
+    def is_powered(self) -> bool:
+        if self.current_settings is None:
+            return True
+        return bool(self.current_settings & MGMT_SETTING_POWERED)
+
+    def __repr__(self):
+        return f"AdapterInfo({self.name}, {self.address})"
+
+
+class AdapterInventory:
+    def __init__(self, sysfs_path: str = SYSFS_BLUETOOTH_PATH, use_mgmt: bool = True):
+        self.sysfs_path = sysfs_path
+        self.use_mgmt = use_mgmt
+        self._adapters: Dict[int, AdapterInfo] = None
+        self._methods_lock = threading.RLock()
+        ## mgmt events of added and removed adapters are received by background thread
+        self._listener_started = False
+        self._listener: threading.Thread = None
+
+    @synchronized
+    def get_adapters(self) -> List[AdapterInfo]:
+        if self._adapters is None:
+            self._adapters = self._load()
+            if not self._listener_started:
+                self._listener_started = True
+                self._start_listener()
+        return [self._adapters[index] for index in sorted(self._adapters)]
+
+    def get_adapter(self, index: int) -> AdapterInfo:
+        return self._find(lambda adapter: adapter.index == index)
+
+    def find_by_name(self, name: str) -> AdapterInfo:
+        return self._find(lambda adapter: adapter.name == name)
+
+    def find_by_address(self, address: str) -> AdapterInfo:
+        address = address.replace("-", ":").upper()
+        return self._find(lambda adapter: adapter.address == address)
+
+    ## drop cached adapters - list will be read again on next access
+    @synchronized
+    def invalidate(self):
+        self._adapters = None
+
+    ## can be set as 'MgmtSocket.event_handler'
+    def handle_mgmt_event(self, event: int, index: int, _params: bytes = None):
+        if event in (MGMT_EV_INDEX_ADDED, MGMT_EV_INDEX_REMOVED):
+            _LOGGER.info("adapter %s added or removed - refreshing adapters list", index)
+            self.invalidate()
+
+    ## ======================================================
+
+    ## on miss list is read again - adapter could be added after list was read
+    def _find(self, predicate: Callable[[AdapterInfo], bool]) -> AdapterInfo:
+        for adapter in self.get_adapters():
+            if predicate(adapter):
+                return adapter
+        self.invalidate()
+        for adapter in self.get_adapters():
+            if predicate(adapter):
+                return adapter
+        return None
+
+    def _start_listener(self):
+        mgmt = self._open_mgmt()
+        if mgmt is None:
+            return
+        try:
+            ## kernel sends index events to socket after it read index list
+            mgmt.read_index_list()
+        except (MgmtError, OSError) as exc:
+            _LOGGER.debug("unable to listen adapter changes: %s", exc)
+            mgmt.close()
+            return
+        mgmt.event_handler = self.handle_mgmt_event
+        self._listener = threading.Thread(target=self._listen, args=(mgmt,), name="AdapterListener", daemon=True)
+        self._listener.start()
+
+    def _listen(self, mgmt: MgmtSocket):
+        try:
+            while True:
+                mgmt.read_events()
+        except OSError as exc:
+            _LOGGER.debug("adapter listener stopped: %s", exc)
+        finally:
+            mgmt.close()
+
+    def _load(self) -> Dict[int, AdapterInfo]:
+        adapters = self._read_sysfs()
+        mgmt = self._open_mgmt()
+        try:
+            if adapters is None:
+                adapters = self._read_mgmt_index_list(mgmt)
+            if mgmt is not None:
+                for adapter in adapters.values():
+                    self._read_mgmt_info(mgmt, adapter)
+        finally:
+            if mgmt is not None:
+                mgmt.close()
+
+        missing = [adapter for adapter in adapters.values() if adapter.address is None]
+        if missing:
+            self._read_hcitool_addresses(adapters)
+        _LOGGER.debug("found adapters: %s", list(adapters.values()))
+        return adapters
+
+    ## returns None if sysfs is not available
+    def _read_sysfs(self) -> Dict[int, AdapterInfo]:
+        try:
+            entries = os.listdir(self.sysfs_path)
+        except OSError:
+            return None
+        adapters = {}
+        for entry in entries:
+            matched = ADAPTER_NAME_PATTERN.match(entry)
+            if matched is None:
+                continue
+            adapter = AdapterInfo(int(matched.group(1)))
+            entry_path = os.path.join(self.sysfs_path, entry)
+            address = _read_attribute(entry_path, "address")
+            if address:
+                adapter.address = address.upper()
+            adapter.dev_type = _read_attribute(entry_path, "type")
+            adapters[adapter.index] = adapter
+        return adapters
+
+    def _open_mgmt(self) -> MgmtSocket:
+        if not self.use_mgmt:
+            return None
+        mgmt = MgmtSocket()
+        try:
+            mgmt.open()
+            return mgmt
+        except OSError as exc:
+            _LOGGER.debug("unable to open mgmt socket: %s", exc)
+            return None
+
+    def _read_mgmt_index_list(self, mgmt: MgmtSocket) -> Dict[int, AdapterInfo]:
+        if mgmt is None:
+            return {}
+        try:
+            return {index: AdapterInfo(index) for index in mgmt.read_index_list()}
+        except (MgmtError, OSError) as exc:
+            _LOGGER.warning("unable to read adapters list: %s", exc)
+            return {}
+
+    def _read_mgmt_info(self, mgmt: MgmtSocket, adapter: AdapterInfo):
+        try:
+            info = mgmt.read_info(adapter.index)
+        except (MgmtError, OSError) as exc:
+            _LOGGER.warning("unable to read info of adapter %s: %s", adapter.name, exc)
+            return
+        adapter.address = info.address
+        adapter.alias = info.name
+        adapter.supported_settings = info.supported_settings
+        adapter.current_settings = info.current_settings
+
+    def _read_hcitool_addresses(self, adapters: Dict[int, AdapterInfo]):
+        ## last resort - newer kernels do not expose address in sysfs
+        from btgattmitm.hcitool.advertisement import get_hci_ifaces  # pylint: disable=C0415
+
+        try:
+            name_mac_list = get_hci_ifaces()
+        except (OSError, subprocess.CalledProcessError) as exc:
+            _LOGGER.warning("unable to read adapters addresses: %s", exc)
+            return
+        for item in name_mac_list or []:
+            matched = ADAPTER_NAME_PATTERN.match(item[0])
+            if matched is None or len(item) < 2:
+                continue
+            adapter = adapters.get(int(matched.group(1)))
+            if adapter is not None and adapter.address is None:
+                adapter.address = item[1].replace("-", ":").upper()
+
+
+def _read_attribute(entry_path: str, name: str) -> str:
+    try:
+        with open(os.path.join(entry_path, name), "r", encoding="utf-8") as attr_file:
+            return attr_file.read().strip()
+    except OSError:
+        return None
+
+
+## =============================================================
+
+
+_INVENTORY: AdapterInventory = None
+
+
+## returns shared inventory
+def get_inventory() -> AdapterInventory:
+    global _INVENTORY  # pylint: disable=W0603
+    if _INVENTORY is None:
+        _INVENTORY = AdapterInventory()
+    return _INVENTORY
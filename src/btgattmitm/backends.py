@@ -0,0 +1,127 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Registry of connector and advertiser backends.
+
+Backend modules (and their dependencies like bluepy, bleak or D-Bus) are imported
+only when backend is created.
+"""
+
+import logging
+from typing import Dict, Callable
+
+from btgattmitm.connector import AbstractConnector
+from btgattmitm.advertisementmanager import AdvertisementManager
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# ===================================================
+
+
+def _create_bluepy_connector(mac: str, iface: int = None, address_type: str = None, scan_timeout: float = 10.0):
+    from btgattmitm.bluepyconnector import BluepyConnector  # pylint: disable=C0415
+
+    return BluepyConnector(mac, iface=iface, address_type=address_type, scan_timeout=scan_timeout)
+
+
+def _create_bleak_connector(mac: str, iface: int = None, address_type: str = None, scan_timeout: float = 10.0):
+    # pylint: disable=W0613
+    from btgattmitm.bleakconnector import BleakConnector  # pylint: disable=C0415
+
+    return BleakConnector(mac)
+
+
+## first item is default
+CONNECTORS: Dict[str, Callable[..., AbstractConnector]] = {
+    "bluepy": _create_bluepy_connector,
+    "bleak": _create_bleak_connector,
+}
+
+
+def create_connector(
+    backend: str, mac: str, iface: int = None, address_type: str = None, scan_timeout: float = 10.0
+) -> AbstractConnector:
+    factory = CONNECTORS.get(backend)
+    if factory is None:
+        raise ValueError(f"unknown connector backend: {backend}")
+    return factory(mac, iface=iface, address_type=address_type, scan_timeout=scan_timeout)
+
+
+# ===================================================
+
+
+def _create_btmgmt_advertiser(
+    bus, iface_index: int, sudo_mode: bool = False, change_mac: str = None, session_index: int = 0
+):
+    # pylint: disable=W0613
+    from btgattmitm.btmgmt.advertisement import BtmgmtAdvertisementManager  # pylint: disable=C0415
+
+    ## advertising instance have to be greater than 1
+    return BtmgmtAdvertisementManager(
+        iface_index, sudo_mode=sudo_mode, change_mac=change_mac, adv_instance=2 + session_index
+    )
+
+
+def _create_hcitool_advertiser(
+    bus, iface_index: int, sudo_mode: bool = False, change_mac: str = None, session_index: int = 0
+):
+    # pylint: disable=W0613
+    from btgattmitm.hcitool.advertisement import HciToolAdvertisementManager  # pylint: disable=C0415
+
+    if session_index > 0:
+        _LOGGER.warning("hcitool advertiser supports single advertisement per adapter")
+    return HciToolAdvertisementManager(iface_index, sudo_mode=sudo_mode)
+
+
+def _create_dbus_advertiser(
+    bus, iface_index: int, sudo_mode: bool = False, change_mac: str = None, session_index: int = 0
+):
+    # pylint: disable=W0613
+    from btgattmitm.dbusobject.advertisement import DBusAdvertisementManager  # pylint: disable=C0415
+    from btgattmitm.dbusobject.application import get_session_path  # pylint: disable=C0415
+
+    path_base = None
+    if session_index > 0:
+        path_base = get_session_path(session_index) + "/advertisement"
+    return DBusAdvertisementManager(bus, iface_index, path_base=path_base)
+
+
+## first item is default
+ADVERTISERS: Dict[str, Callable[..., AdvertisementManager]] = {
+    "btmgmt": _create_btmgmt_advertiser,
+    "hcitool": _create_hcitool_advertiser,
+    "dbus": _create_dbus_advertiser,
+}
+
+
+## session_index - index of MITM session, each session gets own advertisement
+def create_advertiser(
+    backend: str, bus, iface_index: int, sudo_mode: bool = False, change_mac: str = None, session_index: int = 0
+) -> AdvertisementManager:
+    factory = ADVERTISERS.get(backend)
+    if factory is None:
+        raise ValueError(f"unknown advertiser backend: {backend}")
+    return factory(bus, iface_index, sudo_mode=sudo_mode, change_mac=change_mac, session_index=session_index)
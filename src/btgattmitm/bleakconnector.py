@@ -22,57 +22,95 @@
 # SOFTWARE.
 #
 
-import struct
 import logging
 from typing import List, Dict, Any
 import pprint
 import asyncio
+from threading import Thread
 
 from bleak import BleakClient, BleakScanner
 
 from btgattmitm.synchronized import synchronized
 from btgattmitm.dbusobject.exception import InvalidStateError
 from btgattmitm.connector import AbstractConnector, CallbackContainer, ServiceData, AdvertisementData
+from btgattmitm.connector import SubscriptionManager, CCCD_NOTIFY, CCCD_INDICATE, STATIC_DESCRIPTOR_UUIDS
+from btgattmitm.capture import DIR_RX, DIR_TX, OP_READ_REQ, OP_READ_RSP, OP_WRITE_REQ, OP_WRITE_CMD, OP_NOTIFY
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
 class SyncedBleakDevice:
-    def __init__(self):
+    """Synchronous facade over bleak client.
+
+    All coroutines are executed on one long-lived event loop running in separate thread,
+    so notification callbacks are delivered as soon as they arrive and requests
+    from many threads can be in flight at the same time.
+    """
+
+    def __init__(self, request_timeout: float = None):
         self._client = None
-        self.device_props = None
+        self.device_props: Dict[str, Any] = None
+        self.request_timeout = request_timeout
         self.running_loop = asyncio.new_event_loop()
+        self._loop_thread = Thread(target=self._run_loop, name="BleakLoop", daemon=True)
+        self._loop_thread.start()
 
     def is_connected(self) -> bool:
         return self._client is not None
 
     def connect(self, mac):
         coroutine = self._async_connect(mac)
-        self.running_loop.run_until_complete(coroutine)
+        self._run(coroutine)
 
     def disconnect(self):
-        pass
+        if self.running_loop.is_closed():
+            return
+        if self._client is not None:
+            try:
+                self._run(self._client.disconnect())
+            except Exception:  # pylint: disable=W0718
+                _LOGGER.exception("unable to disconnect")
+            self._client = None
+        self.running_loop.call_soon_threadsafe(self.running_loop.stop)
+        self._loop_thread.join()
+        self.running_loop.close()
+
+    ## wait until loop thread ends or timeout occurs
+    def wait_closed(self, timeout: float):
+        self._loop_thread.join(timeout)
 
     def getServices(self) -> List[ServiceData]:
         coroutine = self._async_get_services()
-        return self.running_loop.run_until_complete(coroutine)
+        return self._run(coroutine)
 
-    def writeCharacteristic(self, handle, val):
-        coroutine = self._async_writeCharacteristic(handle, val)
-        return self.running_loop.run_until_complete(coroutine)
+    def writeCharacteristic(self, handle, val, withResponse=False):
+        coroutine = self._async_writeCharacteristic(handle, val, withResponse)
+        return self._run(coroutine)
 
     def readCharacteristic(self, handle):
         coroutine = self._async_readCharacteristic(handle)
-        return self.running_loop.run_until_complete(coroutine)
-
-    def waitForNotifications(self, timeout):
-        coroutine = asyncio.sleep(timeout)
-        return self.running_loop.run_until_complete(coroutine)
+        return self._run(coroutine)
 
     def startNotify(self, handle, callback):
         coroutine = self._async_start_notify(handle, callback)
-        return self.running_loop.run_until_complete(coroutine)
+        return self._run(coroutine)
+
+    def stopNotify(self, handle):
+        coroutine = self._async_stop_notify(handle)
+        return self._run(coroutine)
+
+    def _run(self, coroutine):
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.running_loop)
+        return future.result(self.request_timeout)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.running_loop)
+        try:
+            _LOGGER.info("Starting bleak event loop")
+            self.running_loop.run_forever()
+        finally:
+            _LOGGER.info("Bleak event loop stopped")
 
     # =================================================
 
@@ -114,12 +152,24 @@ class SyncedBleakDevice:
                     char_handle = char_item.handle
                     char_props = char_item.properties
                     # _LOGGER.debug("Char: %s p:%s", char_item, char_props_str)
-                    serv_data.add_characteristic(char_uuid, char_name, char_handle, char_props)
+                    char_data = serv_data.add_characteristic(char_uuid, char_name, char_handle, char_props)
+                    for desc_item in char_item.descriptors:
+                        desc_value = None
+                        if desc_item.uuid in STATIC_DESCRIPTOR_UUIDS:
+                            desc_value = await self._async_read_static_descriptor(desc_item.handle)
+                        char_data.add_descriptor(desc_item.uuid, desc_item.description, desc_item.handle, desc_value)
             return ret_list
         except Exception:
             _LOGGER.exception("exception occur")
             raise
 
+    async def _async_read_static_descriptor(self, handle):
+        try:
+            return bytes(await self._client.read_gatt_descriptor(handle))
+        except Exception as exc:  # pylint: disable=W0703
+            _LOGGER.warning("unable to read descriptor h:%#x: %s", handle, exc)
+            return None
+
     async def _async_readCharacteristic(self, handler):
         try:
             return await self._client.read_gatt_char(handler)
@@ -127,9 +177,9 @@ class SyncedBleakDevice:
             _LOGGER.exception("exception occur")
             raise
 
-    async def _async_writeCharacteristic(self, handler, value):
+    async def _async_writeCharacteristic(self, handler, value, response=False):
         try:
-            return await self._client.write_gatt_char(handler, value)
+            return await self._client.write_gatt_char(handler, value, response=response)
         except Exception:
             _LOGGER.exception("exception occur")
             raise
@@ -141,14 +191,27 @@ class SyncedBleakDevice:
             _LOGGER.exception("exception occur")
             raise
 
+    async def _async_stop_notify(self, handler):
+        try:
+            return await self._client.stop_notify(handler)
+        except Exception:  # noqa
+            _LOGGER.exception("exception occur")
+            raise
+
 
 class BleakConnector(AbstractConnector):
+    ## maximum time in seconds of waiting for result of request (ATT transaction timeout)
+    REQUEST_TIMEOUT = 30.0
+
     def __init__(self, mac):
         super().__init__()
 
         self.address = mac
         self.callbacks = CallbackContainer()
+        self.subscriptions = SubscriptionManager(self._write_cccd, self.callbacks)
         self._peripheral: SyncedBleakDevice = None
+        ## handles with started notification
+        self._notifying = set()
 
     def is_connected(self) -> bool:
         return self._peripheral is not None
@@ -156,8 +219,15 @@ class BleakConnector(AbstractConnector):
     def get_address(self) -> str:
         return self.address
 
+    ## address type reported by BlueZ, 'public' if not known yet
     def get_address_type(self):
-        raise NotImplementedError()
+        if self._peripheral is not None and self._peripheral.device_props:
+            return self._peripheral.device_props.get("AddressType", "public")
+        return "public"
+
+    ## scanning is part of connecting - whole call is limited by request timeout
+    def get_connect_timeout(self) -> float:
+        return self.REQUEST_TIMEOUT
 
     def get_advertisement_data(self) -> Dict[str, AdvertisementData]:
         if self._peripheral is None:
@@ -192,11 +262,13 @@ class BleakConnector(AbstractConnector):
             return None
 
         _LOGGER.debug("Connecting to device: %s", self.address)
-        peripheral = SyncedBleakDevice()
+        peripheral = SyncedBleakDevice(request_timeout=self.REQUEST_TIMEOUT)
         peripheral.connect(self.address)
 
         if peripheral.is_connected():
             self._peripheral = peripheral
+        else:
+            peripheral.disconnect()
         return self._peripheral
 
     @synchronized
@@ -205,55 +277,69 @@ class BleakConnector(AbstractConnector):
         if self._peripheral is not None:
             self._peripheral.disconnect()
         self._peripheral = None
+        self._notifying.clear()
+        self.callbacks.print_stats()
+        self.subscriptions.clear()
 
     def handleNotification(self, cHandle: int, data):
-        try:
-            ## _LOGGER.debug("new notification: %#x >%s<", cHandle, data)
-            callbacks = self.callbacks.get(cHandle)
-            if callbacks is None:
-                ##_LOGGER.debug("no callback found for handle: %i", cHandle)
-                return
-            for function in callbacks:
-                if function is not None:
-                    function(data)
-        except:  # noqa    # pylint: disable=W0702
-            _LOGGER.exception("notification exception")
+        ## _LOGGER.debug("new notification: %#x >%s<", cHandle, data)
+        self.record_traffic(DIR_RX, OP_NOTIFY, cHandle, data)
+        self.callbacks.dispatch(cHandle, data)
 
     def handleDiscovery(self, scanEntry, isNewDev, isNewData):
         _LOGGER.debug("new discovery: %s %s %s", scanEntry, isNewDev, isNewData)
 
-    @synchronized
-    def write_characteristic(self, handle, val):
-        if self._peripheral is None:
-            raise InvalidStateError("not connected")
-        self._peripheral.writeCharacteristic(handle, val)
+    def write_characteristic(self, handle, val, with_response=False):
+        peripheral = self._get_peripheral()
+        self.record_traffic(DIR_TX, OP_WRITE_REQ if with_response else OP_WRITE_CMD, handle, val)
+        peripheral.writeCharacteristic(handle, val, with_response)
 
-    @synchronized
     def read_characteristic(self, handle):
-        if self._peripheral is None:
-            raise InvalidStateError("not connected")
-        value = self._peripheral.readCharacteristic(handle)
+        peripheral = self._get_peripheral()
+        self.record_traffic(DIR_TX, OP_READ_REQ, handle)
+        value = peripheral.readCharacteristic(handle)
+        self.record_traffic(DIR_RX, OP_READ_RSP, handle, value)
         # _LOGGER.info(f"bleak received value {value} from handler {handle}")
         return value
 
-    @synchronized
     def subscribe_for_notification(self, handle, callback):
-        if self._peripheral is None:
-            raise InvalidStateError("not connected")
-        self._peripheral.startNotify(handle, lambda char_obj, value: callback(value))
-        # self._peripheral.startNotify(handle, callback)
-        # data = struct.pack("BB", 1, 0)
-        # self.write_characteristic(handle, data)
-        self.callbacks.register(handle, callback)
+        self.subscriptions.subscribe(handle, CCCD_NOTIFY, callback)
 
-    @synchronized
     def unsubscribe_from_notification(self, handle, callback):
-        data = struct.pack("BB", 0, 0)
-        ret = self.write_characteristic(handle, data)
-        self.callbacks.unregister(handle, callback)
-        return ret
+        return self.subscriptions.unsubscribe(handle, CCCD_NOTIFY, callback)
+
+    def subscribe_for_indication(self, handle: int, callback):
+        self.subscriptions.subscribe(handle, CCCD_INDICATE, callback)
+
+    def unsubscribe_from_indication(self, handle: int, callback):
+        return self.subscriptions.unsubscribe(handle, CCCD_INDICATE, callback)
 
-    @synchronized
     def process_notifications(self):
-        if self._peripheral is not None:
-            self._peripheral.waitForNotifications(0.1)
+        ## notifications are delivered directly by event loop thread
+        peripheral = self._peripheral
+        if peripheral is not None:
+            peripheral.wait_closed(1.0)
+
+    ## ================================================================================
+
+    def _get_peripheral(self) -> SyncedBleakDevice:
+        peripheral = self._peripheral
+        if peripheral is None:
+            raise InvalidStateError("not connected")
+        return peripheral
+
+    ## bleak handles both notifications and indications by 'start_notify'
+    ## called by subscription manager - writes are serialised by the manager, so connector lock
+    ## is not taken (disconnect clears subscriptions while holding it)
+    def _write_cccd(self, handle: int, value: int):
+        peripheral = self._get_peripheral()
+        if value:
+            if handle in self._notifying:
+                return None
+            peripheral.startNotify(handle, lambda _char_obj, data: self.handleNotification(handle, data))
+            self._notifying.add(handle)
+            return None
+        if handle not in self._notifying:
+            return None
+        self._notifying.discard(handle)
+        return peripheral.stopNotify(handle)
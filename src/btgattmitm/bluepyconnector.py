@@ -22,15 +22,19 @@
 # SOFTWARE.
 #
 
+import time
 import struct
 import logging
-from typing import List, Dict
+from typing import List, Dict, Any
 
 from bluepy import btle
 
 from btgattmitm.synchronized import synchronized
 from btgattmitm.dbusobject.exception import InvalidStateError
+from btgattmitm.upstream import UpstreamEngine, PRIORITY_WRITE, PRIORITY_READ, PRIORITY_BACKGROUND
 from btgattmitm.connector import AbstractConnector, CallbackContainer, ServiceData, AdvertisementData
+from btgattmitm.connector import SubscriptionManager, CCCD_NOTIFY, CCCD_INDICATE, STATIC_DESCRIPTOR_UUIDS
+from btgattmitm.capture import DIR_RX, DIR_TX, OP_READ_REQ, OP_READ_RSP, OP_WRITE_REQ, OP_WRITE_CMD, OP_NOTIFY
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -115,9 +119,52 @@ def get_services_data(peripheral: btle.Peripheral) -> List[ServiceData]:
             char_handle = ch.getHandle()
             char_props = props_mask_to_list(ch)
             serv_data.add_characteristic(char_uuid, char_name, char_handle, char_props)
+        add_descriptors(serv, serv_data)
     return ret_list
 
 
+## attribute types of declarations reported by 'find information' together with descriptors
+DECLARATION_UUIDS = (
+    "00002800-0000-1000-8000-00805f9b34fb",
+    "00002801-0000-1000-8000-00805f9b34fb",
+    "00002802-0000-1000-8000-00805f9b34fb",
+    "00002803-0000-1000-8000-00805f9b34fb",
+)
+
+
+## discover descriptors of all characteristics of service in one pass over its handles range
+def add_descriptors(serv: btle.Service, serv_data: ServiceData):
+    chars_list = sorted(serv_data.getCharacteristics(), key=lambda item: item.getHandle())
+    if not chars_list:
+        return
+    try:
+        descs_list = serv.getDescriptors()
+    except btle.BTLEException as ex:
+        _LOGGER.warning("unable to discover descriptors of service %s: %s", serv_data.uuid, ex)
+        return
+    value_handles = set(char_data.getHandle() for char_data in chars_list)
+    for desc in descs_list:
+        desc_uuid = str(desc.uuid)
+        if desc_uuid in DECLARATION_UUIDS or desc.handle in value_handles:
+            continue
+        ## descriptor belongs to the nearest preceding characteristic
+        owner = None
+        for char_data in chars_list:
+            if char_data.getHandle() > desc.handle:
+                break
+            owner = char_data
+        if owner is None:
+            continue
+        desc_value = None
+        if desc_uuid in STATIC_DESCRIPTOR_UUIDS:
+            try:
+                desc_value = bytes(desc.read())
+            except btle.BTLEException as ex:
+                _LOGGER.warning("unable to read descriptor %s h:%#x: %s", desc_uuid, desc.handle, ex)
+        _LOGGER.debug("Desc: %s h:%#x of char h:%#x", desc_uuid, desc.handle, owner.getHandle())
+        owner.add_descriptor(desc_uuid, desc.uuid.getCommonName(), desc.handle, desc_value)
+
+
 # =================================================
 
 
@@ -125,16 +172,38 @@ def get_services_data(peripheral: btle.Peripheral) -> List[ServiceData]:
 class BluepyConnector(AbstractConnector):
     """Deprecated connector based on bluepy."""
 
+    ## interval of checking scan results
+    SCAN_STEP = 0.05
+    ## maximum time in seconds request of priority class can wait in upstream queue
+    ## client reads waiting longer than D-Bus method call timeout (25s) are useless
+    REQUEST_DEADLINES = {PRIORITY_WRITE: None, PRIORITY_READ: 25.0, PRIORITY_BACKGROUND: 10.0}
+    ## maximum time in seconds of waiting for result of request (queue wait and ATT transaction)
+    REQUEST_TIMEOUT = 60.0
+
     ## iface: int - hci index
-    def __init__(self, mac: str, iface: int = None, address_type: str = None):
+    ## scan_timeout: maximum time of scanning advertisement data
+    ## scan_response_timeout: time to wait for scan response after advertisement
+    def __init__(
+        self,
+        mac: str,
+        iface: int = None,
+        address_type: str = None,
+        scan_timeout: float = 10.0,
+        scan_response_timeout: float = 1.0,
+    ):
         super().__init__()
 
         self.address: str = mac
         self.addressType: str = address_type
         self.iface: int = iface
+        self.scan_timeout: float = scan_timeout
+        self.scan_response_timeout: float = scan_response_timeout
         self.callbacks = CallbackContainer()
-        self.connectDelegate = ConnectDelegate(self.callbacks)
+        self.subscriptions = SubscriptionManager(self._write_cccd, self.callbacks)
+        self.connectDelegate = ConnectDelegate(self.callbacks, self)
         self._peripheral: btle.Peripheral = None
+        ## thread owning peripheral after connection
+        self._engine: UpstreamEngine = None
 
     def is_connected(self) -> bool:
         return self._peripheral is not None
@@ -145,22 +214,36 @@ class BluepyConnector(AbstractConnector):
     def get_address_type(self):
         return self.addressType
 
+    def get_scan_timeout(self) -> float:
+        return self.scan_timeout
+
     def get_advertisement_data(self) -> Dict[str, AdvertisementData]:
         return self._scan()
 
-    @synchronized
+    ## separate lock - scanning does not block connection
+    @synchronized("_scan_lock")
     def _scan(self) -> Dict[str, AdvertisementData]:
         _LOGGER.info("scanning device %s advertisement data using controller: %s", self.address, self.iface)
         delegate = ScanDelegate(self.address)
         scanner = btle.Scanner(iface=self.iface)
         scanner.withDelegate(delegate)
+        start_time = time.time()
         try:
-            scanner.scan(10.0)
+            scanner.start()
+            try:
+                ## stop as soon as advertisement and scan response are received
+                while time.time() - start_time < self.scan_timeout:
+                    scanner.process(self.SCAN_STEP)
+                    if delegate.is_complete(self.scan_response_timeout):
+                        break
+            finally:
+                scanner.stop()
         except btle.BTLEDisconnectError:
             _LOGGER.warning("device disconnected prematurely")
         except:  # noqa
             _LOGGER.error("exception occured while scanning devices")
             raise
+        _LOGGER.info("scanning finished in %.3fs", time.time() - start_time)
         adv_data = delegate.get_adv_data()
         scan_data = delegate.get_scan_data()
         return {"adv": adv_data, "scan": scan_data}
@@ -169,7 +252,7 @@ class BluepyConnector(AbstractConnector):
         peripheral: btle.Peripheral = self.connect()
         if peripheral is None:
             return None
-        services_list = get_services_data(peripheral)
+        services_list = self._execute("discover", get_services_data, peripheral, priority=PRIORITY_BACKGROUND)
         ServiceData.print_services(services_list)
         return services_list
 
@@ -190,6 +273,7 @@ class BluepyConnector(AbstractConnector):
                 self._peripheral.withDelegate(self.connectDelegate)
                 self._peripheral.connect(self.address, addrType=addr_type, iface=self.iface)
                 self.addressType = str(addr_type)
+                self._start_engine()
                 return self._peripheral
             except btle.BTLEException as ex:
                 self._peripheral = None
@@ -200,55 +284,105 @@ class BluepyConnector(AbstractConnector):
     @synchronized
     def disconnect(self):
         _LOGGER.debug("Disconnecting")
-        if self._peripheral is not None:
-            self._peripheral.disconnect()
+        self._stop_engine()
+        self.callbacks.print_stats()
+        self.subscriptions.clear()
+        peripheral = self._peripheral
         self._peripheral = None
+        if peripheral is not None:
+            try:
+                peripheral.disconnect()
+            except btle.BTLEException as exc:
+                ## e.g. helper process already died
+                _LOGGER.warning("unable to disconnect: %s", exc)
+
+    def get_upstream_stats(self) -> Dict[str, Any]:
+        engine = self._engine
+        if engine is None:
+            return {}
+        return engine.get_stats()
+
+    ## returns queue depth and wait time statistics of priority classes
+    def get_upstream_class_stats(self) -> Dict[str, Any]:
+        engine = self._engine
+        if engine is None:
+            return {}
+        return engine.get_class_stats()
 
     ## ================================================================================
 
-    @synchronized
     def read_characteristic(self, handle):
-        if self._peripheral is None:
-            raise InvalidStateError("not connected")
-        return self._peripheral.readCharacteristic(handle)
+        return self._execute("read", self._read_characteristic, handle, priority=PRIORITY_READ)
 
-    @synchronized
-    def write_characteristic(self, handle: int, val):
-        if self._peripheral is None:
-            raise InvalidStateError("not connected")
-        try:
-            self._peripheral.writeCharacteristic(handle, val)
-        except:  # noqa
-            _LOGGER.error("error writing to characteristic: %#x %s", handle, val)
-            raise
+    def write_characteristic(self, handle: int, val, with_response=False):
+        return self._execute("write", self._write_characteristic, handle, val, with_response, priority=PRIORITY_WRITE)
 
-    @synchronized
     def subscribe_for_notification(self, handle: int, callback):
-        data = struct.pack("BB", 1, 0)
-        self.write_characteristic(handle, data)
-        self.callbacks.register(handle, callback)
+        self.subscriptions.subscribe(handle, CCCD_NOTIFY, callback)
 
-    @synchronized
     def unsubscribe_from_notification(self, handle: int, callback):
-        data = struct.pack("BB", 0, 0)
-        ret = self.write_characteristic(handle, data)
-        self.callbacks.unregister(handle, callback)
-        return ret
+        return self.subscriptions.unsubscribe(handle, CCCD_NOTIFY, callback)
 
-    @synchronized
     def subscribe_for_indication(self, handle: int, callback):
-        data = struct.pack("BB", 2, 0)
-        self.write_characteristic(handle, data)
-        self.callbacks.register(handle, callback)
+        self.subscriptions.subscribe(handle, CCCD_INDICATE, callback)
 
-    @synchronized
     def unsubscribe_from_indication(self, handle: int, callback):
-        data = struct.pack("BB", 0, 0)
-        ret = self.write_characteristic(handle, data)
-        self.callbacks.unregister(handle, callback)
-        return ret
+        return self.subscriptions.unsubscribe(handle, CCCD_INDICATE, callback)
 
     def get_service_by_uuid(self, uuid: str):
+        return self._execute("service", self._get_service_by_uuid, uuid, priority=PRIORITY_BACKGROUND)
+
+    ## ================================================================================
+
+    def process_notifications(self):
+        ## notifications are drained by upstream engine thread
+        ## so just wait here without holding any lock
+        engine = self._engine
+        if engine is None:
+            return
+        if not engine.is_alive():
+            ## engine stopped on poll error - connection is not usable anymore
+            _LOGGER.warning("upstream engine stopped, disconnecting")
+            self.disconnect()
+            return
+        engine.join(1.0)
+
+    ## ================================================================================
+
+    def _execute(self, label: str, function, *args, priority: int = PRIORITY_READ):
+        engine = self._engine
+        if engine is None:
+            ## not connected or engine not started yet
+            return function(*args)
+        deadline = self.REQUEST_DEADLINES.get(priority)
+        return engine.execute_request(
+            label, function, *args, timeout=self.REQUEST_TIMEOUT, priority=priority, deadline=deadline
+        )
+
+    def _write_cccd(self, handle: int, value: int):
+        data = struct.pack("<H", value)
+        cccd_handle = self.get_cccd_handle(handle)
+        return self.write_characteristic(cccd_handle, data, with_response=True)
+
+    def _read_characteristic(self, handle):
+        if self._peripheral is None:
+            raise InvalidStateError("not connected")
+        self.record_traffic(DIR_TX, OP_READ_REQ, handle)
+        data = self._peripheral.readCharacteristic(handle)
+        self.record_traffic(DIR_RX, OP_READ_RSP, handle, data)
+        return data
+
+    def _write_characteristic(self, handle: int, val, with_response=False):
+        if self._peripheral is None:
+            raise InvalidStateError("not connected")
+        self.record_traffic(DIR_TX, OP_WRITE_REQ if with_response else OP_WRITE_CMD, handle, val)
+        try:
+            return self._peripheral.writeCharacteristic(handle, val, withResponse=with_response)
+        except:  # noqa
+            _LOGGER.error("error writing to characteristic: %#x %s", handle, val)
+            raise
+
+    def _get_service_by_uuid(self, uuid: str):
         if self._peripheral is None:
             raise InvalidStateError("not connected")
         try:
@@ -257,66 +391,122 @@ class BluepyConnector(AbstractConnector):
             _LOGGER.warning("service %s not found", uuid)
             return None
 
-    ## ================================================================================
-
-    @synchronized
-    def process_notifications(self):
-        if self._peripheral is None:
+    def _poll_notifications(self, timeout: float):
+        peripheral = self._peripheral
+        if peripheral is None:
             return
-        if self._peripheral.waitForNotifications(1.0):
+        peripheral.waitForNotifications(timeout)
+
+    ## descriptor of bluepy helper output pipe
+    def _helper_fd(self) -> int:
+        peripheral = self._peripheral
+        if peripheral is None:
+            return None
+        helper = peripheral._helper  # pylint: disable=W0212
+        if helper is None:
+            return None
+        return helper.stdout.fileno()
+
+    def _start_engine(self):
+        self._stop_engine()
+        self._engine = UpstreamEngine(
+            self._poll_notifications, name=f"Upstream-{self.address}", fd_function=self._helper_fd
+        )
+        self._engine.start()
+
+    def _stop_engine(self):
+        engine = self._engine
+        if engine is None:
             return
-        # _LOGGER.debug("waiting for notifications...")
+        self._engine = None
+        engine.stop()
+        engine.print_stats()
 
 
 ###
 class ConnectDelegate(btle.DefaultDelegate):
 
-    def __init__(self, callbacks=None):
+    def __init__(self, callbacks=None, connector: BluepyConnector = None):
         super().__init__()
         self.callbacks = callbacks
+        self.connector = connector
 
     def handleNotification(self, cHandle: int, data):
-        try:
-            _LOGGER.debug("Received new notification: %#x >%s<", cHandle, data)
-            callbacks = self.callbacks.get(cHandle)
-            if callbacks is None:
-                # _LOGGER.debug("No callback found for notification handle: %#x", cHandle)
-                return
-            for function in callbacks:
-                if function is not None:
-                    function(data)
-        except:  # noqa    # pylint: disable=W0702
-            _LOGGER.exception("notification exception")
+        _LOGGER.debug("Received new notification: %#x >%s<", cHandle, data)
+        if self.connector is not None:
+            ## bluepy does not distinguish notifications from indications
+            self.connector.record_traffic(DIR_RX, OP_NOTIFY, cHandle, data)
+        self.callbacks.dispatch(cHandle, data)
 
     def handleDiscovery(self, scanEntry, isNewDev, isNewData):
         _LOGGER.debug("new discovery: %s %s %s", scanEntry, isNewDev, isNewData)
 
 
+class ScanResult:
+    def __init__(self):
+        self.addr_type: str = None  # public or random
+        self.adv_dict = AdvertisementData()
+        self.scan_dict = AdvertisementData()
+        ## raw data of first advertisement
+        self.adv_raw = None
+        self.adv_time: float = None
+        self.scan_response = False
+
+
 ###
 class ScanDelegate(btle.DefaultDelegate):
 
+    ## mac_filter - address or list of addresses
     def __init__(self, mac_filter=None):
         super().__init__()
+        if isinstance(mac_filter, str):
+            mac_filter = [mac_filter]
         if mac_filter:
-            mac_filter = mac_filter.lower()
-        self.mac_filter = mac_filter
-
-        self.addr_type: str = None  # public or random
-        self.adv_dict = AdvertisementData()
-        self.scan_dict = AdvertisementData()
-
-    def get_adv_data(self) -> AdvertisementData:
-        return self.adv_dict
-
-    def get_scan_data(self) -> AdvertisementData:
-        return self.scan_dict
+            mac_filter = [mac.lower() for mac in mac_filter]
+        self.mac_filter: List[str] = mac_filter
+        self.results: Dict[str, ScanResult] = {}
+
+    def get_result(self, address: str = None) -> ScanResult:
+        if address is None:
+            if not self.mac_filter:
+                return None
+            address = self.mac_filter[0]
+        return self.results.get(address.lower())
+
+    def get_adv_data(self, address: str = None) -> AdvertisementData:
+        result = self.get_result(address)
+        if result is None:
+            return AdvertisementData()
+        return result.adv_dict
+
+    def get_scan_data(self, address: str = None) -> AdvertisementData:
+        result = self.get_result(address)
+        if result is None:
+            return AdvertisementData()
+        return result.scan_dict
+
+    ## check if advertisement and scan response of all filtered devices received
+    ## 'scan_response_timeout' - time to wait for scan response after advertisement (device might be not scannable)
+    def is_complete(self, scan_response_timeout: float) -> bool:
+        if not self.mac_filter:
+            return False
+        now = time.time()
+        for address in self.mac_filter:
+            result = self.results.get(address)
+            if result is None:
+                return False
+            if result.scan_response:
+                continue
+            if now - result.adv_time < scan_response_timeout:
+                return False
+        return True
 
     def handleNotification(self, cHandle: int, data):
         _LOGGER.debug("new notification: %#x >%s<", cHandle, data)
 
     def handleDiscovery(self, scanEntry, isNewDev, isNewData):
         if self.mac_filter:
-            if self.mac_filter != scanEntry.addr:
+            if scanEntry.addr not in self.mac_filter:
                 _LOGGER.debug(
                     "new discovery: %s RSSI=%s AddrType=%s (skipping)",
                     scanEntry.addr,
@@ -333,19 +523,27 @@ class ScanDelegate(btle.DefaultDelegate):
             isNewDev,
             isNewData,
         )
+        result = self.results.get(scanEntry.addr)
+        if result is None:
+            result = ScanResult()
+            self.results[scanEntry.addr] = result
         if isNewDev:
             ## advertisement data
-            self.addr_type = scanEntry.addrType
+            result.addr_type = scanEntry.addrType
+            result.adv_raw = scanEntry.rawData
+            result.adv_time = time.time()
             for adtype, desc, value in scanEntry.getScanData():
                 _LOGGER.debug(f"  {desc} ({adtype}) = {value}")
-                ScanDelegate.append_to_dict(self.adv_dict, adtype, value)
+                ScanDelegate.append_to_dict(result.adv_dict, adtype, value)
         else:
-            ## scan response data
+            ## scan response data (or repeated advertisement)
+            if scanEntry.rawData != result.adv_raw:
+                result.scan_response = True
             for adtype, desc, value in scanEntry.getScanData():
-                if self.adv_dict.contains(adtype):
+                if result.adv_dict.contains(adtype):
                     continue
                 _LOGGER.debug(f"  {desc} ({adtype}) = {value}")
-                ScanDelegate.append_to_dict(self.scan_dict, adtype, value)
+                ScanDelegate.append_to_dict(result.scan_dict, adtype, value)
 
     @staticmethod
     def append_to_dict(data_dict: AdvertisementData, adtype, value):
@@ -25,90 +25,69 @@
 import logging
 from typing import List, Any, Dict
 
+import threading
 import subprocess  # nosec
 
 from btgattmitm.connector import AdvertisementData
 from btgattmitm.advertisementmanager import AdvertisementManager
 from btgattmitm.hcitool.advertisement import find_mac_by_hci_iface, parse_hcitool_output_status
+from btgattmitm.hcitool.hcisocket import HciSocket, HciError
+from btgattmitm.adapters import get_inventory
+from btgattmitm.btmgmt.mgmtsocket import MgmtSocket, MgmtError, MGMT_ADV_FLAG_CONNECTABLE
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
+class AdapterSettings:
+    """Adapter-wide settings shared by advertisers (sessions) of the same adapter.
+
+    Settings are applied by the first advertiser of adapter, following advertisers
+    only check that their settings are compatible.
+    """
+
+    def __init__(self):
+        self.users = 0
+        self.public_address: str = None
+        self.local_name: str = None
+
+
+## adapter index to its settings
+_ADAPTER_SETTINGS: Dict[int, AdapterSettings] = {}
+_ADAPTER_SETTINGS_LOCK = threading.Lock()
+
+
 class Advertiser:
 
-    def __init__(self, hci_iface_index: int):
+    def __init__(self, hci_iface_index: int, adv_instance: int = 2):
         self.iface = hci_iface_index
+        ## have to be greater than 1, each MITM session uses own instance
+        self.adv_instance = adv_instance
         self.adv_data = AdvertisementData()
         self.scanresp_data = AdvertisementData()
         self.sudo_mode = False
         self.change_mac: str = None
+        ## native mgmt socket, if not available then 'btmgmt' tool is used
+        self.mgmt: MgmtSocket = None
+        ## settings of adapter, set while advertiser is user of them
+        self._adapter_settings: AdapterSettings = None
 
     def advertise(self) -> bool:
         try:
             _LOGGER.info("Starting advertisement")
+            self._open_mgmt()
 
-            if self.change_mac:
-                _LOGGER.info("setting MAC address to %s", self.change_mac)
-                self._run_btmgmt_cmd(["power", "off"])
-                self._run_btmgmt_cmd(["public-addr", self.change_mac])
-                self._run_btmgmt_cmd(["power", "on"])
-
-            # ## enable BLE
-            # _LOGGER.info("enabling BLE")
-            # if self._run_btmgmt_cmd(["le", "on"]) is False:
-            #     _LOGGER.error("unable to start BLE advertisement")
-            #     return False
-
-            # ## disable "classic" device type
-            # if self._run_btmgmt_cmd(["bredr", "off"]) is False:
-            #     _LOGGER.warning("unable to disable classic mode")
-
-            ## disable default advertisement - "add-adv" will activate advertisement automatically with custom data
-            _LOGGER.info("disabling btmgmt advertising")
-            if self._run_btmgmt_cmd(["advertising", "off"]) is False:
-                _LOGGER.error("unable to configure advertisement")
-                return False
-
-            # _LOGGER.info("clearing old advertisings")
-            # self._run_btmgmt_cmd(["clr-adv"])
-
-            bt_name = self.adv_data.get_name()
-            if bt_name is not None:
-                _LOGGER.info("setting device name: %s", bt_name)
-                if self._run_btmgmt_cmd(["name", bt_name]) is False:
-                    _LOGGER.warning("unable to set advertising name")
+            with _ADAPTER_SETTINGS_LOCK:
+                if self._configure_adapter() is False:
+                    return False
 
             ## set advertisement data
             _LOGGER.info("setting advertisement data")
-            adv_command_data = ["add-adv"]
-
-            # service_uuids = self.adv_data.get_prop(0x06)
-            # if service_uuids is not None:
-            #     adv_command_data.append("-u")
-            #     adv_command_data.extend(service_uuids)
-
             adv_data = self._prepare_adv_data()
 
-            ## set advertisement
-            data = adv_data[0]
-            if data:
-                adv_command_data.append("-d")  ## set advertising data
-                adv_command_data.append(data)
-
-            ## set scan response
-            data = adv_data[1]
-            if data:
-                adv_command_data.append("-s")  ## set scan response data
-                adv_command_data.append(data)
+            adv_instance = str(self.adv_instance)
 
-            adv_command_data.append("-c")  ## set connectable
-
-            adv_instance = "2"  ## have to be greater than 1
-
-            adv_command_data.append(adv_instance)  ## set advertising instance
-
-            if self._run_btmgmt_cmd(adv_command_data) is False:
+            if self._add_advertising(adv_instance, adv_data[0], adv_data[1]) is False:
                 _LOGGER.error("unable to configure advertisement")
                 return False
 
@@ -129,7 +108,11 @@ class Advertiser:
     def stop(self):
         try:
             # stop advertising
-            self._run_btmgmt_cmd("clr-adv")
+            self._remove_advertising()
+            self._release_adapter()
+            if self.mgmt is not None:
+                self.mgmt.close()
+                self.mgmt = None
             _LOGGER.info("Advertisement stopped")
             return True
 
@@ -143,6 +126,77 @@ class Advertiser:
             _LOGGER.exception("exception occur during advertisement stop")
             return False
 
+    ## apply adapter-wide settings, have to be called with settings lock acquired
+    ## power cycle or name change of adapter would break advertisements and connections
+    ## of other sessions, so only the first session of adapter applies settings
+    def _configure_adapter(self) -> bool:
+        settings = _ADAPTER_SETTINGS.get(self.iface)
+        if settings is None:
+            settings = AdapterSettings()
+            _ADAPTER_SETTINGS[self.iface] = settings
+        if self._adapter_settings is None:
+            self._adapter_settings = settings
+            settings.users += 1
+        if settings.users > 1:
+            return self._check_shared_adapter(settings)
+
+        if self.change_mac:
+            _LOGGER.info("setting MAC address to %s", self.change_mac)
+            self._set_powered(False)
+            self._set_public_address(self.change_mac)
+            self._set_powered(True)
+        settings.public_address = self.change_mac
+
+        # ## enable BLE
+        # _LOGGER.info("enabling BLE")
+        # if self._run_btmgmt_cmd(["le", "on"]) is False:
+        #     _LOGGER.error("unable to start BLE advertisement")
+        #     return False
+
+        # ## disable "classic" device type
+        # if self._run_btmgmt_cmd(["bredr", "off"]) is False:
+        #     _LOGGER.warning("unable to disable classic mode")
+
+        ## disable default advertisement - "add-adv" will activate advertisement automatically with custom data
+        _LOGGER.info("disabling btmgmt advertising")
+        if self._set_advertising(False) is False:
+            _LOGGER.error("unable to configure advertisement")
+            return False
+
+        # _LOGGER.info("clearing old advertisings")
+        # self._run_btmgmt_cmd(["clr-adv"])
+
+        bt_name = self.adv_data.get_name()
+        if bt_name is not None:
+            _LOGGER.info("setting device name: %s", bt_name)
+            if self._set_local_name(bt_name) is False:
+                _LOGGER.warning("unable to set advertising name")
+        settings.local_name = bt_name
+        return True
+
+    def _check_shared_adapter(self, settings: AdapterSettings) -> bool:
+        _LOGGER.info("adapter hci%s shared with other session, keeping its settings", self.iface)
+        if self.change_mac and self.change_mac.upper() != (settings.public_address or "").upper():
+            _LOGGER.error(
+                "unable to change MAC of hci%s to %s - adapter used by other session", self.iface, self.change_mac
+            )
+            return False
+        bt_name = self.adv_data.get_name()
+        if bt_name is not None and bt_name != settings.local_name:
+            ## advertisement data still contains the name
+            _LOGGER.warning("unable to set device name %s - adapter used by other session", bt_name)
+        return True
+
+    def _release_adapter(self):
+        with _ADAPTER_SETTINGS_LOCK:
+            settings = self._adapter_settings
+            if settings is None:
+                return
+            self._adapter_settings = None
+            settings.users -= 1
+            if settings.users < 1 and _ADAPTER_SETTINGS.get(self.iface) is settings:
+                del _ADAPTER_SETTINGS[self.iface]
+
     def _prepare_adv_data(self):
         ret_adv_list = []
         ret_scan_list = []
@@ -189,27 +243,113 @@ class Advertiser:
         ### at least works, but better to disable privacy instead of setting MAC directly
         _LOGGER.info("setting MAC address (prevent privacy)")
         device_mac = find_mac_by_hci_iface(self.iface)
+        if device_mac is None:
+            _LOGGER.warning("unable to set MAC address")
+            return False
+
+        try:
+            with HciSocket(self.iface) as hci:
+                response = hci.le_set_advertising_set_random_address(int(adv_instance), device_mac)
+                status = response.status
+        except HciError as exc:
+            status = exc.status
+        except OSError as exc:
+            _LOGGER.info("unable to use HCI socket (%s), using 'hcitool'", exc)
+            status = self._set_random_address_hcitool(adv_instance, device_mac)
+            if status is None:
+                _LOGGER.warning("unable to set MAC address")
+                return False
+
+        if status == 0x00:
+            _LOGGER.info("static MAC address configured")
+        else:
+            _LOGGER.warning("unable to set MAC address, response status: %s", status)
+
+        return True
+
+    ## returns status of command or None if status could not be read
+    def _set_random_address_hcitool(self, adv_instance, device_mac: str) -> int:
         mac_pairs = device_mac.split(":")
         mac_pairs.reverse()
-        cmd_list = ["hcitool", "-i", "hci0", "cmd", "0x08", "0x0035", f"0{adv_instance}"]
+        cmd_list = ["hcitool", "-i", f"hci{self.iface}", "cmd", "0x08", "0x0035", f"{int(adv_instance):02x}"]
         cmd_list.extend(mac_pairs)
         result = self._run_cmd(cmd_list)
         if result is None or result.returncode != 0:
-            _LOGGER.warning("unable to set MAC address")
-            return False
+            return None
 
         status_byte = parse_hcitool_output_status(result.stdout)
         if status_byte is None:
-            _LOGGER.warning("unable to set MAC address")
-            return False
-        status = int(status_byte, 16)
-        if status == 0x00:
-            _LOGGER.info("static MAC address configured")
-        else:
-            _LOGGER.warning("unable to set MAC address, response status: %s", status)
+            return None
+        return int(status_byte, 16)
 
+    def _open_mgmt(self) -> bool:
+        if self.mgmt is not None:
+            return True
+        mgmt = MgmtSocket()
+        try:
+            mgmt.open()
+        except OSError as exc:
+            _LOGGER.info("unable to open mgmt socket (%s), using 'btmgmt' tool", exc)
+            return False
+        ## refresh adapters list when adapter is added or removed
+        mgmt.event_handler = get_inventory().handle_mgmt_event
+        self.mgmt = mgmt
         return True
 
+    def _set_powered(self, enabled: bool) -> bool:
+        if self.mgmt is not None:
+            return self._run_mgmt_cmd(self.mgmt.set_powered, enabled)
+        return self._run_btmgmt_cmd(["power", "on" if enabled else "off"])
+
+    def _set_public_address(self, mac_address: str) -> bool:
+        if self.mgmt is not None:
+            return self._run_mgmt_cmd(self.mgmt.set_public_address, mac_address)
+        return self._run_btmgmt_cmd(["public-addr", mac_address])
+
+    def _set_advertising(self, enabled: bool) -> bool:
+        if self.mgmt is not None:
+            return self._run_mgmt_cmd(self.mgmt.set_advertising, int(enabled))
+        return self._run_btmgmt_cmd(["advertising", "on" if enabled else "off"])
+
+    def _set_local_name(self, name: str) -> bool:
+        if self.mgmt is not None:
+            return self._run_mgmt_cmd(self.mgmt.set_local_name, name)
+        return self._run_btmgmt_cmd(["name", name])
+
+    ## 'adv_data' and 'scan_data' are hex strings
+    def _add_advertising(self, adv_instance: str, adv_data: str, scan_data: str) -> bool:
+        if self.mgmt is not None:
+            return self._run_mgmt_cmd(
+                self.mgmt.add_advertising,
+                int(adv_instance),
+                bytes.fromhex(adv_data),
+                bytes.fromhex(scan_data),
+                MGMT_ADV_FLAG_CONNECTABLE,
+            )
+        adv_command_data = ["add-adv"]
+        if adv_data:
+            adv_command_data.append("-d")  ## set advertising data
+            adv_command_data.append(adv_data)
+        if scan_data:
+            adv_command_data.append("-s")  ## set scan response data
+            adv_command_data.append(scan_data)
+        adv_command_data.append("-c")  ## set connectable
+        adv_command_data.append(adv_instance)  ## set advertising instance
+        return self._run_btmgmt_cmd(adv_command_data)
+
+    def _remove_advertising(self) -> bool:
+        if self.mgmt is not None:
+            return self._run_mgmt_cmd(self.mgmt.remove_advertising, self.adv_instance)
+        return self._run_btmgmt_cmd(["rm-adv", str(self.adv_instance)])
+
+    def _run_mgmt_cmd(self, command, *args) -> bool:
+        try:
+            command(self.iface, *args)
+            return True
+        except (MgmtError, OSError) as exc:
+            _LOGGER.error("error while running mgmt command: %s", exc)
+            return False
+
     def _run_btmgmt_cmd(self, cmd_params: str | List[str] = None) -> bool:
         if cmd_params is None:
             cmd_params = []
@@ -402,8 +542,8 @@ def remove_hex_prefix(data_list: List[str]):
 
 class BtmgmtAdvertisementManager(AdvertisementManager):
 
-    def __init__(self, hci_iface_index: int, sudo_mode: bool = False, change_mac: str = None):
-        self.adv = Advertiser(hci_iface_index)
+    def __init__(self, hci_iface_index: int, sudo_mode: bool = False, change_mac: str = None, adv_instance: int = 2):
+        self.adv = Advertiser(hci_iface_index, adv_instance)
         self.adv.sudo_mode = sudo_mode
         self.adv.change_mac = change_mac
 
@@ -0,0 +1,341 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Client of kernel Bluetooth Management API (the same interface used by 'btmgmt' tool).
+
+Commands are sent as binary frames over single AF_BLUETOOTH socket bound to HCI_CHANNEL_CONTROL.
+Opening the socket requires CAP_NET_ADMIN capability.
+"""
+
+import os
+import logging
+import socket
+import struct
+import threading
+import time
+import ctypes
+from typing import List, Callable
+
+from btgattmitm.synchronized import synchronized
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+## not defined if Python is built without Bluetooth headers
+AF_BLUETOOTH = getattr(socket, "AF_BLUETOOTH", 31)
+BTPROTO_HCI = 1
+HCI_CHANNEL_CONTROL = 3
+MGMT_INDEX_NONE = 0xFFFF
+
+## header: opcode/event code, controller index, parameters length
+MGMT_HEADER = struct.Struct("<HHH")
+
+MGMT_OP_READ_INDEX_LIST = 0x0003
+MGMT_OP_READ_INFO = 0x0004
+MGMT_OP_SET_POWERED = 0x0005
+MGMT_OP_SET_LOCAL_NAME = 0x000F
+MGMT_OP_SET_ADVERTISING = 0x0029
+MGMT_OP_SET_PUBLIC_ADDRESS = 0x0039
+MGMT_OP_ADD_ADVERTISING = 0x003E
+MGMT_OP_REMOVE_ADVERTISING = 0x003F
+
+MGMT_EV_CMD_COMPLETE = 0x0001
+MGMT_EV_CMD_STATUS = 0x0002
+MGMT_EV_INDEX_ADDED = 0x0004
+MGMT_EV_INDEX_REMOVED = 0x0005
+
+MGMT_STATUS_SUCCESS = 0x00
+
+MGMT_STATUS_NAMES = {
+    0x00: "Success",
+    0x01: "Unknown Command",
+    0x02: "Not Connected",
+    0x03: "Failed",
+    0x04: "Connect Failed",
+    0x05: "Authentication Failed",
+    0x06: "Not Paired",
+    0x07: "No Resources",
+    0x08: "Timeout",
+    0x09: "Already Connected",
+    0x0A: "Busy",
+    0x0B: "Rejected",
+    0x0C: "Not Supported",
+    0x0D: "Invalid Parameters",
+    0x0E: "Disconnected",
+    0x0F: "Not Powered",
+    0x10: "Cancelled",
+    0x11: "Invalid Index",
+    0x12: "RFKilled",
+    0x13: "Already Paired",
+    0x14: "Permission Denied",
+}
+
+## bits of controller settings
+MGMT_SETTING_POWERED = 0x00000001
+MGMT_SETTING_CONNECTABLE = 0x00000002
+MGMT_SETTING_BREDR = 0x00000080
+MGMT_SETTING_LE = 0x00000200
+MGMT_SETTING_ADVERTISING = 0x00000400
+MGMT_SETTING_STATIC_ADDRESS = 0x00008000
+
+## flags of ADD_ADVERTISING command
+MGMT_ADV_FLAG_CONNECTABLE = 0x00000001
+
+MGMT_MAX_NAME_LENGTH = 249
+MGMT_MAX_SHORT_NAME_LENGTH = 11
+
+
+def get_status_name(status: int) -> str:
+    return MGMT_STATUS_NAMES.get(status, f"0x{status:02X}")
+
+
+## convert MAC string (e.g. 00:11:22:33:44:55) to little endian bytes
+def mac_to_bytes(mac_address: str) -> bytes:
+    mac_address = mac_address.replace("-", ":")
+    data = bytes.fromhex(mac_address.replace(":", ""))
+    if len(data) != 6:
+        raise ValueError(f"invalid MAC address: {mac_address}")
+    return data[::-1]
+
+
+def bytes_to_mac(data: bytes) -> str:
+    return ":".join(f"{item:02X}" for item in reversed(data[:6]))
+
+
+class _SockaddrHci(ctypes.Structure):  # pylint: disable=R0903
+    _fields_ = [("hci_family", ctypes.c_ushort), ("hci_dev", ctypes.c_ushort), ("hci_channel", ctypes.c_ushort)]
+
+
+## Python's 'socket.bind()' does not allow to select HCI channel, so libc's 'bind' is called directly
+def bind_hci_channel(sock: socket.socket, dev_index: int, channel: int):
+    libc = ctypes.CDLL(None, use_errno=True)
+    addr = _SockaddrHci(AF_BLUETOOTH, dev_index, channel)
+    ret = libc.bind(sock.fileno(), ctypes.byref(addr), ctypes.sizeof(addr))
+    if ret != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+## =============================================================
+
+
+class MgmtError(Exception):
+    def __init__(self, opcode: int, status: int):
+        super().__init__(f"mgmt command 0x{opcode:04X} failed with status: {get_status_name(status)}")
+        self.opcode = opcode
+        self.status = status
+
+
+class MgmtResponse:
+    def __init__(self, event: int, opcode: int, index: int, status: int, data: bytes = b""):
+        self.event = event  ## MGMT_EV_CMD_COMPLETE or MGMT_EV_CMD_STATUS
+        self.opcode = opcode
+        self.index = index
+        self.status = status
+        self.data = data  ## return parameters
+
+    def is_success(self) -> bool:
+        return self.status == MGMT_STATUS_SUCCESS
+
+    def __repr__(self):
+        return (
+            f"MgmtResponse(event=0x{self.event:04X}, opcode=0x{self.opcode:04X}, index={self.index},"
+            f" status={get_status_name(self.status)}, data={self.data.hex()})"
+        )
+
+
+class ControllerInfo:
+    INFO_STRUCT = struct.Struct("<6sBHII3s")
+
+    def __init__(self, data: bytes):
+        info = self.INFO_STRUCT.unpack_from(data)
+        self.address = bytes_to_mac(info[0])
+        self.version = info[1]
+        self.manufacturer = info[2]
+        self.supported_settings = info[3]
+        self.current_settings = info[4]
+        self.class_of_device = info[5]
+        offset = self.INFO_STRUCT.size
+        self.name = _decode_name(data[offset : offset + MGMT_MAX_NAME_LENGTH])
+        offset += MGMT_MAX_NAME_LENGTH
+        self.short_name = _decode_name(data[offset : offset + MGMT_MAX_SHORT_NAME_LENGTH])
+
+
+def _decode_name(data: bytes) -> str:
+    return data.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+
+
+## =============================================================
+
+
+class MgmtSocket:
+    """Persistent connection to Bluetooth Management API.
+
+    Events not being response to sent command are passed to 'event_handler'.
+    """
+
+    def __init__(self, sock=None, timeout: float = 5.0):
+        ## 'sock' allows to pass already opened socket (or fake one in tests)
+        self._sock = sock
+        self.timeout = timeout
+        self.event_handler: Callable[[int, int, bytes], None] = None
+        self._methods_lock = threading.RLock()
+
+    def open(self):
+        if self._sock is not None:
+            return
+        sock = socket.socket(AF_BLUETOOTH, socket.SOCK_RAW | socket.SOCK_CLOEXEC, BTPROTO_HCI)
+        try:
+            bind_hci_channel(sock, MGMT_INDEX_NONE, HCI_CHANNEL_CONTROL)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def close(self):
+        if self._sock is None:
+            return
+        self._sock.close()
+        self._sock = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    ## ======================================================
+
+    def read_index_list(self) -> List[int]:
+        response = self.execute(MGMT_OP_READ_INDEX_LIST)
+        (count,) = struct.unpack_from("<H", response.data)
+        return list(struct.unpack_from(f"<{count}H", response.data, 2))
+
+    def read_info(self, index: int) -> ControllerInfo:
+        response = self.execute(MGMT_OP_READ_INFO, index)
+        return ControllerInfo(response.data)
+
+    def set_powered(self, index: int, enabled: bool):
+        return self.execute(MGMT_OP_SET_POWERED, index, struct.pack("<B", int(enabled)))
+
+    def set_local_name(self, index: int, name: str, short_name: str = ""):
+        name_data = name.encode("utf-8")[: MGMT_MAX_NAME_LENGTH - 1]
+        short_data = short_name.encode("utf-8")[: MGMT_MAX_SHORT_NAME_LENGTH - 1]
+        params = name_data.ljust(MGMT_MAX_NAME_LENGTH, b"\0") + short_data.ljust(MGMT_MAX_SHORT_NAME_LENGTH, b"\0")
+        return self.execute(MGMT_OP_SET_LOCAL_NAME, index, params)
+
+    def set_advertising(self, index: int, mode: int):
+        ## mode: 0 - off, 1 - on, 2 - connectable
+        return self.execute(MGMT_OP_SET_ADVERTISING, index, struct.pack("<B", mode))
+
+    def set_public_address(self, index: int, mac_address: str):
+        return self.execute(MGMT_OP_SET_PUBLIC_ADDRESS, index, mac_to_bytes(mac_address))
+
+    ## returns added instance
+    def add_advertising(
+        self,
+        index: int,
+        instance: int,
+        adv_data: bytes = b"",
+        scan_rsp: bytes = b"",
+        flags: int = MGMT_ADV_FLAG_CONNECTABLE,
+        duration: int = 0,
+        timeout: int = 0,
+    ) -> int:
+        params = struct.pack("<BIHHBB", instance, flags, duration, timeout, len(adv_data), len(scan_rsp))
+        params += adv_data + scan_rsp
+        response = self.execute(MGMT_OP_ADD_ADVERTISING, index, params)
+        if response.data:
+            return response.data[0]
+        return instance
+
+    ## instance 0 removes all instances
+    def remove_advertising(self, index: int, instance: int = 0):
+        return self.execute(MGMT_OP_REMOVE_ADVERTISING, index, struct.pack("<B", instance))
+
+    ## wait for packet and pass received events to 'event_handler'
+    ## 'timeout' - None waits until packet is received
+    def read_events(self, timeout: float = None):
+        if self._sock is None:
+            raise ConnectionError("mgmt socket is not opened")
+        self._sock.settimeout(timeout)
+        packet = self._sock.recv(4096)
+        response = self._parse_packet(packet)
+        if response is not None:
+            _LOGGER.debug("unexpected mgmt response: %s", response)
+
+    ## ======================================================
+
+    ## send command and raise MgmtError if command failed
+    def execute(self, opcode: int, index: int = MGMT_INDEX_NONE, params: bytes = b"") -> MgmtResponse:
+        response = self.send_command(opcode, index, params)
+        if not response.is_success():
+            raise MgmtError(opcode, response.status)
+        return response
+
+    @synchronized
+    def send_command(self, opcode: int, index: int = MGMT_INDEX_NONE, params: bytes = b"") -> MgmtResponse:
+        if self._sock is None:
+            raise ConnectionError("mgmt socket is not opened")
+        frame = MGMT_HEADER.pack(opcode, index, len(params)) + params
+        _LOGGER.debug("mgmt command: 0x%04X index: %s params: %s", opcode, index, params.hex())
+        self._sock.send(frame)
+        return self._wait_response(opcode, index)
+
+    def _wait_response(self, opcode: int, index: int) -> MgmtResponse:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"no response for mgmt command 0x{opcode:04X}")
+            self._sock.settimeout(remaining)
+            try:
+                packet = self._sock.recv(4096)
+            except socket.timeout as exc:
+                raise TimeoutError(f"no response for mgmt command 0x{opcode:04X}") from exc
+            response = self._parse_packet(packet)
+            if response is None:
+                continue
+            if response.opcode == opcode and response.index == index:
+                _LOGGER.debug("mgmt response: %s", response)
+                return response
+            _LOGGER.warning("unexpected mgmt response: %s", response)
+
+    ## returns response or None if packet is not response for command
+    def _parse_packet(self, packet: bytes) -> MgmtResponse:
+        if len(packet) < MGMT_HEADER.size:
+            _LOGGER.warning("invalid mgmt packet: %s", packet.hex())
+            return None
+        event, index, length = MGMT_HEADER.unpack_from(packet)
+        params = packet[MGMT_HEADER.size : MGMT_HEADER.size + length]
+        if event in (MGMT_EV_CMD_COMPLETE, MGMT_EV_CMD_STATUS) and len(params) >= 3:
+            cmd_opcode, status = struct.unpack_from("<HB", params)
+            return MgmtResponse(event, cmd_opcode, index, status, params[3:])
+        if self.event_handler is not None:
+            self.event_handler(event, index, params)
+        else:
+            _LOGGER.debug("mgmt event: 0x%04X index: %s params: %s", event, index, params.hex())
+        return None
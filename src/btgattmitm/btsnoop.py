@@ -0,0 +1,241 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Writer of intercepted traffic in btsnoop format (readable by Wireshark and btmon).
+
+ATT PDUs are wrapped in L2CAP and HCI ACL packets (H4 datalink). Upstream link
+(connector) and downstream link (D-Bus mock) are distinguished by ACL connection
+handle. Records are queued by proxy threads and encoded and written in bulk
+by background thread, so recording never waits for disk.
+"""
+
+import logging
+from typing import Dict, Any, List, Deque, Tuple, Optional, BinaryIO
+from collections import deque
+
+import os
+import time
+import struct
+import threading
+
+from btgattmitm.capture import (
+    TrafficRecorder,
+    DIR_RX,
+    OP_READ_REQ,
+    OP_READ_RSP,
+    OP_WRITE_RSP,
+)
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+BTSNOOP_MAGIC = b"btsnoop\x00"
+BTSNOOP_VERSION = 1
+## HCI UART (H4)
+BTSNOOP_DATALINK_H4 = 1002
+## microseconds between 0000-01-01 and 1970-01-01
+BTSNOOP_EPOCH_DELTA = 0x00DCDDB30F2F8000
+
+BTSNOOP_HEADER = struct.Struct(">8sII")
+## original length, included length, flags, cumulative drops, timestamp
+BTSNOOP_RECORD = struct.Struct(">IIIIq")
+
+## record flags
+FLAG_RECEIVED = 0x01
+
+H4_ACL = 0x02
+## ACL handle, ACL length, L2CAP length, L2CAP channel
+ACL_L2CAP_HEADER = struct.Struct("<BHHHH")
+ACL_PB_FIRST_FLUSHABLE = 0x2000
+L2CAP_CID_ATT = 0x0004
+
+## connection handles presented in capture
+UPSTREAM_CONN_HANDLE = 0x0040
+DOWNSTREAM_CONN_HANDLE = 0x0041
+
+
+def encode_att_pdu(opcode: int, handle: int, data: bytes) -> bytes:
+    if opcode == OP_READ_RSP:
+        return bytes((opcode,)) + data
+    if opcode == OP_WRITE_RSP:
+        return bytes((opcode,))
+    if opcode == OP_READ_REQ:
+        return struct.pack("<BH", opcode, handle)
+    ## write request, write command, notification, indication
+    return struct.pack("<BH", opcode, handle) + data
+
+
+def encode_record(timestamp: float, link: int, direction: int, opcode: int, handle: int, data: bytes) -> bytes:
+    att_pdu = encode_att_pdu(opcode, handle, data)
+    ## links of additional sessions (see 'capture.SessionRecorder') get subsequent handles
+    conn_handle = UPSTREAM_CONN_HANDLE + link
+    att_length = len(att_pdu)
+    packet_header = ACL_L2CAP_HEADER.pack(
+        H4_ACL, conn_handle | ACL_PB_FIRST_FLUSHABLE, att_length + 4, att_length, L2CAP_CID_ATT
+    )
+    packet_length = ACL_L2CAP_HEADER.size + att_length
+    flags = FLAG_RECEIVED if direction == DIR_RX else 0
+    timestamp_us = int(timestamp * 1000000) + BTSNOOP_EPOCH_DELTA
+    record_header = BTSNOOP_RECORD.pack(packet_length, packet_length, flags, 0, timestamp_us)
+    return record_header + packet_header + att_pdu
+
+
+class BtsnoopWriter(TrafficRecorder):
+    """Background writer of btsnoop capture file with size and time based rotation."""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        rotate_interval: float = 0,
+        backup_count: int = 5,
+        max_pending: int = 65536,
+        flush_interval: float = 0.2,
+    ):
+        self.path = path
+        ## 0 disables size rotation
+        self.max_bytes = max_bytes
+        ## 0 disables time rotation
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+
+        ## items: arguments of 'encode_record'
+        self._pending: Deque[Tuple[float, int, int, int, int, bytes]] = deque()
+        self._file: Optional[BinaryIO] = None
+        self._file_size = 0
+        self._file_opened = 0.0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="BtsnoopWriter", daemon=True)
+
+        self.written = 0
+        self.dropped = 0
+        self.rotated = 0
+
+    def start(self):
+        self._open_file()
+        self._thread.start()
+
+    ## called by proxy threads - only appends to queue
+    def record(self, link: int, direction: int, opcode: int, handle: int, data: bytes):
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        if data is None:
+            data = b""
+        self._pending.append((time.time(), link, direction, opcode, handle, bytes(data)))
+
+    def close(self):
+        if self._thread.is_alive():
+            self._stop_event.set()
+            self._thread.join()
+        self._write_pending()
+        self._close_file()
+        self.print_stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotated": self.rotated,
+            "pending": len(self._pending),
+        }
+
+    def print_stats(self):
+        stats = self.get_stats()
+        _LOGGER.info(
+            "btsnoop capture: written: %s dropped: %s rotated: %s",
+            stats["written"],
+            stats["dropped"],
+            stats["rotated"],
+        )
+
+    ## =====================================================
+
+    def _run(self):
+        try:
+            while not self._stop_event.wait(self.flush_interval):
+                self._write_pending()
+        except Exception:  # pylint: disable=W0703
+            _LOGGER.exception("btsnoop writer failed")
+
+    def _write_pending(self):
+        if self._file is None:
+            return
+        chunks: List[bytes] = []
+        chunks_size = 0
+        pending = self._pending
+        while pending:
+            item = pending.popleft()
+            chunk = encode_record(*item)
+            chunks.append(chunk)
+            chunks_size += len(chunk)
+            if self.max_bytes > 0 and self._file_size + chunks_size >= self.max_bytes:
+                self._write_chunks(chunks)
+                chunks = []
+                chunks_size = 0
+                self._rotate()
+        if chunks:
+            self._write_chunks(chunks)
+        self._file.flush()
+        if self.rotate_interval > 0 and time.time() - self._file_opened >= self.rotate_interval:
+            self._rotate()
+
+    def _write_chunks(self, chunks: List[bytes]):
+        if self._file is None:
+            ## file not opened (e.g. failed rotation)
+            self.dropped += len(chunks)
+            return
+        data = b"".join(chunks)
+        self._file.write(data)
+        self._file_size += len(data)
+        self.written += len(chunks)
+
+    def _open_file(self):
+        self._file = open(self.path, "wb")  # pylint: disable=R1732
+        header = BTSNOOP_HEADER.pack(BTSNOOP_MAGIC, BTSNOOP_VERSION, BTSNOOP_DATALINK_H4)
+        self._file.write(header)
+        self._file_size = len(header)
+        self._file_opened = time.time()
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+    ## rotation scheme same as in 'logging.handlers.RotatingFileHandler'
+    def _rotate(self):
+        self._close_file()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source_path = f"{self.path}.{i}"
+                if os.path.exists(source_path):
+                    os.replace(source_path, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self._open_file()
+        self.rotated += 1
+
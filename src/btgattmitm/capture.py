@@ -0,0 +1,448 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Capture of intercepted traffic.
+
+Records are stored in preallocated arrays and values in one shared 'bytearray',
+so recording does not allocate objects nor format strings. When spill file is
+given, full buffer is appended to the file through memory mapping by background
+thread, otherwise the oldest records are overwritten.
+"""
+
+import logging
+from typing import Dict, Any, List, Iterator, Tuple, Union
+from array import array
+
+import os
+import mmap
+import time
+import struct
+import threading
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+## link between MITM and device
+LINK_UPSTREAM = 0
+## link between client and MITM (D-Bus mock)
+LINK_DOWNSTREAM = 1
+
+## direction relative to MITM
+DIR_RX = 0
+DIR_TX = 1
+
+## ATT opcodes
+OP_READ_REQ = 0x0A
+OP_READ_RSP = 0x0B
+OP_WRITE_REQ = 0x12
+OP_WRITE_RSP = 0x13
+OP_NOTIFY = 0x1B
+OP_INDICATE = 0x1D
+OP_WRITE_CMD = 0x52
+
+
+## record in spill file: timestamp, handle, link, direction, opcode, data length, followed by data
+SPILL_RECORD = struct.Struct("<dHBBBI")
+SPILL_MAGIC = b"BTMITMCAP1\x00\x00"
+
+
+class TrafficRecorder:
+    """Interface of traffic consumers."""
+
+    def record(self, link: int, direction: int, opcode: int, handle: int, data: bytes):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+
+class TrafficRecorderList(TrafficRecorder):
+    """Passes traffic to multiple recorders."""
+
+    def __init__(self, recorders: List[TrafficRecorder] = None):
+        if recorders is None:
+            recorders = []
+        self.recorders: List[TrafficRecorder] = recorders
+
+    def record(self, link: int, direction: int, opcode: int, handle: int, data: bytes):
+        for recorder in self.recorders:
+            recorder.record(link, direction, opcode, handle, data)
+
+    def close(self):
+        for recorder in self.recorders:
+            recorder.close()
+
+
+class SessionRecorder(TrafficRecorder):
+    """Passes traffic of one of multiple MITM sessions to shared recorder.
+
+    Links of session are shifted by '2 * session_index', so sessions can be distinguished
+    in shared capture. Shared recorder is not closed by session.
+    """
+
+    def __init__(self, recorder: TrafficRecorder, session_index: int):
+        self.recorder = recorder
+        self.link_offset = 2 * session_index
+
+    def record(self, link: int, direction: int, opcode: int, handle: int, data: bytes):
+        self.recorder.record(link + self.link_offset, direction, opcode, handle, data)
+
+
+class TrafficCounter(TrafficRecorder):
+    """Counts records and bytes per link and direction."""
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        ## indexed by '2 * link + direction'
+        self._records = [0] * 4
+        self._bytes = [0] * 4
+        self._lock = threading.Lock()
+
+    def record(self, link: int, direction: int, opcode: int, handle: int, data: bytes):
+        index = 2 * (link % 2) + direction
+        with self._lock:
+            self._records[index] += 1
+            if data:
+                self._bytes[index] += len(data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            records = list(self._records)
+            data_bytes = list(self._bytes)
+        duration = time.monotonic() - self.start_time
+        ret_stats = {"duration": duration, "records": sum(records), "bytes": sum(data_bytes)}
+        for link, link_name in ((LINK_UPSTREAM, "upstream"), (LINK_DOWNSTREAM, "downstream")):
+            for direction, dir_name in ((DIR_RX, "rx"), (DIR_TX, "tx")):
+                index = 2 * link + direction
+                ret_stats[f"{link_name}_{dir_name}_records"] = records[index]
+                ret_stats[f"{link_name}_{dir_name}_bytes"] = data_bytes[index]
+        ret_stats["throughput"] = ret_stats["bytes"] / duration if duration > 0 else 0.0
+        return ret_stats
+
+
+class RecordBuffer:
+    """Preallocated storage of records and their values."""
+
+    def __init__(self, capacity: int, data_capacity: int):
+        self.capacity = capacity
+        self.data_capacity = data_capacity
+        ## preallocated fields
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.handles = array("H", bytes(2 * capacity))
+        self.links = array("B", bytes(capacity))
+        self.directions = array("B", bytes(capacity))
+        self.opcodes = array("B", bytes(capacity))
+        self.offsets = array("L", bytes(array("L").itemsize * capacity))
+        self.lengths = array("L", bytes(array("L").itemsize * capacity))
+        self.data = bytearray(data_capacity)
+        self.data_view = memoryview(self.data)
+        ## index of oldest record
+        self.head = 0
+        self.count = 0
+        self.data_pos = 0
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+        self.data_pos = 0
+
+    ## 'position' - position of record counted from the oldest one
+    def get_record(self, position: int):
+        index = (self.head + position) % self.capacity
+        offset = self.offsets[index]
+        length = self.lengths[index]
+        return (
+            self.timestamps[index],
+            self.links[index],
+            self.directions[index],
+            self.opcodes[index],
+            self.handles[index],
+            bytes(self.data_view[offset : offset + length]),
+        )
+
+    ## returns records serialized in spill file format
+    def pack(self) -> bytes:
+        ## data is sliced without copying
+        chunks: List[Union[bytes, memoryview]] = []
+        for i in range(self.count):
+            index = (self.head + i) % self.capacity
+            offset = self.offsets[index]
+            length = self.lengths[index]
+            chunks.append(
+                SPILL_RECORD.pack(
+                    self.timestamps[index],
+                    self.handles[index],
+                    self.links[index],
+                    self.directions[index],
+                    self.opcodes[index],
+                    length,
+                )
+            )
+            chunks.append(self.data_view[offset : offset + length])
+        return b"".join(chunks)
+
+
+class TrafficRing(TrafficRecorder):
+    """Ring of captured records.
+
+    With spill file two buffers are used: full buffer is swapped with empty one
+    and written to the file by flusher thread, so recording does not wait for the file.
+    Recording waits only when both buffers are full.
+    """
+
+    def __init__(self, capacity: int = 65536, data_capacity: int = None, spill_path: str = None):
+        if data_capacity is None:
+            data_capacity = capacity * 64
+        self.capacity = capacity
+        self.data_capacity = data_capacity
+        self._buffer = RecordBuffer(capacity, data_capacity)
+        self._lock = threading.Lock()
+        ## notified when buffer is passed to or released by flusher
+        self._cond = threading.Condition(self._lock)
+        self.recorded = 0
+        self.dropped = 0
+        self.spilled = 0
+        self._spill: SpillFile = None
+        ## buffer waiting for or being written by flusher
+        self._pending: RecordBuffer = None
+        ## empty buffer to swap with full one, None while flusher writes
+        self._standby: RecordBuffer = None
+        self._closing = False
+        self._flusher: threading.Thread = None
+        if spill_path:
+            self._spill = SpillFile(spill_path)
+            self._standby = RecordBuffer(capacity, data_capacity)
+            self._flusher = threading.Thread(target=self._flush_loop, name="CaptureFlusher", daemon=True)
+            self._flusher.start()
+
+    def __len__(self):
+        return self._buffer.count
+
+    def record(self, link: int, direction: int, opcode: int, handle: int, data: bytes):
+        if data is None:
+            data = b""
+        payload: Union[bytes, memoryview] = data
+        length = len(payload)
+        if length > self.data_capacity:
+            length = self.data_capacity
+            payload = memoryview(data)[:length]
+        with self._lock:
+            if self._buffer.count >= self.capacity:
+                self._make_room()
+            buffer = self._buffer
+            pos = buffer.data_pos
+            if pos + length > self.data_capacity:
+                pos = 0
+            if self._spill is not None and buffer.count > 0 and self._overlaps_oldest(buffer, pos, pos + length):
+                self._swap_buffers()
+                buffer = self._buffer
+                pos = 0
+            else:
+                self._evict_overlapping(pos, pos + length)
+            buffer.data_view[pos : pos + length] = payload
+            buffer.data_pos = pos + length
+
+            index = (buffer.head + buffer.count) % self.capacity
+            buffer.timestamps[index] = time.time()
+            buffer.handles[index] = handle & 0xFFFF
+            buffer.links[index] = link
+            buffer.directions[index] = direction
+            buffer.opcodes[index] = opcode
+            buffer.offsets[index] = pos
+            buffer.lengths[index] = length
+            buffer.count += 1
+            self.recorded += 1
+
+    ## returns tuples (timestamp, link, direction, opcode, handle, data) from oldest to newest
+    def get_records(self) -> Iterator[Tuple[float, int, int, int, int, bytes]]:
+        with self._lock:
+            ret_list = [self._buffer.get_record(i) for i in range(self._buffer.count)]
+        return iter(ret_list)
+
+    ## write buffered records to spill file and wait until they are written
+    def flush(self):
+        if self._spill is None:
+            return
+        with self._cond:
+            if self._buffer.count > 0:
+                self._swap_buffers()
+            while self._pending is not None:
+                self._cond.wait()
+            self._spill.flush()
+
+    def close(self):
+        self.flush()
+        if self._spill is not None:
+            with self._cond:
+                self._closing = True
+                self._cond.notify_all()
+            self._flusher.join()
+            self._spill.close()
+            self._spill = None
+        self.print_stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "recorded": self.recorded,
+                "buffered": self._buffer.count,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+            }
+
+    def print_stats(self):
+        stats = self.get_stats()
+        _LOGGER.info(
+            "traffic capture: recorded: %s buffered: %s dropped: %s spilled: %s",
+            stats["recorded"],
+            stats["buffered"],
+            stats["dropped"],
+            stats["spilled"],
+        )
+
+    ## =====================================================
+
+    def _make_room(self):
+        if self._spill is not None:
+            self._swap_buffers()
+            return
+        self._drop_oldest()
+
+    def _drop_oldest(self):
+        buffer = self._buffer
+        buffer.head = (buffer.head + 1) % self.capacity
+        buffer.count -= 1
+        self.dropped += 1
+
+    def _overlaps_oldest(self, buffer: RecordBuffer, start: int, end: int) -> bool:
+        offset = buffer.offsets[buffer.head]
+        length = buffer.lengths[buffer.head]
+        if length == 0:
+            return start <= offset < end
+        return offset < end and start < offset + length
+
+    def _evict_overlapping(self, start: int, end: int):
+        while self._buffer.count > 0 and self._overlaps_oldest(self._buffer, start, end):
+            self._drop_oldest()
+
+    ## pass active buffer to flusher, waits if flusher still writes previous buffer
+    ## have to be called with lock acquired
+    def _swap_buffers(self):
+        while self._standby is None:
+            self._cond.wait()
+        self._pending = self._buffer
+        self._buffer = self._standby
+        self._standby = None
+        self._cond.notify_all()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closing:
+                    self._cond.wait()
+                buffer = self._pending
+            if buffer is None:
+                return
+            try:
+                self._spill.write(buffer.pack())
+                written = True
+            except Exception:  # pylint: disable=W0703
+                _LOGGER.exception("unable to write capture file")
+                written = False
+            with self._cond:
+                if written:
+                    self.spilled += buffer.count
+                else:
+                    self.dropped += buffer.count
+                buffer.clear()
+                self._pending = None
+                self._standby = buffer
+                self._cond.notify_all()
+
+
+class SpillFile:
+    """Append-only file written through memory mapped windows."""
+
+    def __init__(self, path: str, window_size: int = 4 * 1024 * 1024):
+        granularity = mmap.ALLOCATIONGRANULARITY
+        self.window_size = max(granularity, (window_size // granularity) * granularity)
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        ## size of valid data
+        self._size = 0
+        self._window: mmap.mmap = None
+        self._window_start = 0
+        self.write(SPILL_MAGIC)
+
+    def write(self, data: bytes):
+        data_view = memoryview(data)
+        while len(data_view) > 0:
+            if self._window is None or self._size >= self._window_start + self.window_size:
+                self._map_window(self._size)
+            window_pos = self._size - self._window_start
+            chunk_size = min(len(data_view), self.window_size - window_pos)
+            self._window[window_pos : window_pos + chunk_size] = data_view[:chunk_size]
+            self._size += chunk_size
+            data_view = data_view[chunk_size:]
+
+    def flush(self):
+        if self._window is not None:
+            self._window.flush()
+
+    def close(self):
+        if self._fd is None:
+            return
+        if self._window is not None:
+            self._window.flush()
+            self._window.close()
+            self._window = None
+        ## cut preallocated space
+        os.ftruncate(self._fd, self._size)
+        os.close(self._fd)
+        self._fd = None
+
+    def _map_window(self, position: int):
+        if self._window is not None:
+            self._window.flush()
+            self._window.close()
+        granularity = mmap.ALLOCATIONGRANULARITY
+        self._window_start = (position // granularity) * granularity
+        os.ftruncate(self._fd, self._window_start + self.window_size)
+        self._window = mmap.mmap(self._fd, self.window_size, offset=self._window_start)
+
+
+## returns tuples (timestamp, link, direction, opcode, handle, data)
+def read_spill_file(path: str) -> Iterator[Tuple[float, int, int, int, int, bytes]]:
+    with open(path, "rb") as spill_file:
+        content = spill_file.read()
+    if not content.startswith(SPILL_MAGIC):
+        raise ValueError(f"invalid capture file: {path}")
+    pos = len(SPILL_MAGIC)
+    while pos + SPILL_RECORD.size <= len(content):
+        timestamp, handle, link, direction, opcode, length = SPILL_RECORD.unpack_from(content, pos)
+        pos += SPILL_RECORD.size
+        data = content[pos : pos + length]
+        pos += length
+        yield (timestamp, link, direction, opcode, handle, data)
@@ -23,11 +23,15 @@
 #
 
 import logging
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Tuple, Callable
 
-from time import sleep
+import time
+import threading
 from threading import Thread
 
+from btgattmitm.fdwait import WakeupFd, wait_readable
+from btgattmitm.capture import LINK_UPSTREAM
+
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -73,12 +77,56 @@ class AdvertisementData:
         self.props_dict[0x02] = service_list
 
 
+## Client Characteristic Configuration descriptor
+CCCD_UUID = "00002902-0000-1000-8000-00805f9b34fb"
+## descriptors with constant value - read once on discovery and served locally by mock
+STATIC_DESCRIPTOR_UUIDS = (
+    "00002901-0000-1000-8000-00805f9b34fb",  ## Characteristic User Description
+    "00002904-0000-1000-8000-00805f9b34fb",  ## Characteristic Presentation Format
+)
+
+
+class DescriptorData:
+    def __init__(self, desc_uuid: str, desc_name: str, desc_handle: int, desc_value: bytes = None):
+        self._uuid: str = desc_uuid
+        self._common_name: str = desc_name
+        self._handle: int = desc_handle
+        ## value of static descriptor, None if not known
+        self._value: bytes = desc_value
+
+    @property
+    def uuid(self):
+        return self._uuid
+
+    def getCommonName(self):
+        if self._common_name is None:
+            return self.uuid
+        return self._common_name
+
+    def getHandle(self):
+        return self._handle
+
+    @property
+    def value(self) -> bytes:
+        return self._value
+
+    def get_data(self):
+        ret_data = {}
+        ret_data["name"] = self._common_name
+        ret_data["uuid"] = self._uuid
+        ret_data["handle"] = self._handle
+        if self._value is not None:
+            ret_data["value"] = self._value.hex()
+        return ret_data
+
+
 class CharacteristicData:
     def __init__(self, char_uuid: str, char_name: str, char_handle: int, char_props: List[str]):
         self._uuid: str = char_uuid
         self._common_name: str = char_name
         self._handle: int = char_handle
         self._props_list: List[str] = char_props
+        self._descs_list: List[DescriptorData] = []
 
     @property
     def uuid(self):
@@ -96,6 +144,26 @@ class CharacteristicData:
     def getHandle(self):
         return self._handle
 
+    def getDescriptors(self) -> List[DescriptorData]:
+        return self._descs_list
+
+    def add_descriptor(self, desc_uuid: str, desc_name: str, desc_handle: int, desc_value: bytes = None):
+        desc_data = DescriptorData(desc_uuid, desc_name, desc_handle, desc_value)
+        self._descs_list.append(desc_data)
+
+    def find_descriptor(self, uuid: str) -> DescriptorData:
+        for desc_item in self._descs_list:
+            if desc_item.uuid == uuid:
+                return desc_item
+        return None
+
+    ## returns handle of Client Characteristic Configuration descriptor or None if not discovered
+    def get_cccd_handle(self) -> int:
+        desc_item = self.find_descriptor(CCCD_UUID)
+        if desc_item is None:
+            return None
+        return desc_item.getHandle()
+
     def get_data(self):
         ret_data = {}
         ret_data["name"] = self._common_name
@@ -103,6 +171,8 @@ class CharacteristicData:
         ret_data["handle"] = self._handle
         ret_data["properties"] = self._props_list
         ret_data["value"] = 0
+        if self._descs_list:
+            ret_data["descriptors"] = [desc_item.get_data() for desc_item in self._descs_list]
         return ret_data
 
 
@@ -126,9 +196,12 @@ class ServiceData:
 
     # handle: int, example: 61
     # properties: List[str], example: ["write-without-response", "write"]
-    def add_characteristic(self, char_uuid: str, char_name: str, char_handle: int, char_props: List[str]):
+    def add_characteristic(
+        self, char_uuid: str, char_name: str, char_handle: int, char_props: List[str]
+    ) -> CharacteristicData:
         char_data = CharacteristicData(char_uuid, char_name, char_handle, char_props)
         self._chars_list.append(char_data)
+        return char_data
 
     def get_data(self):
         ret_data = {}
@@ -159,6 +232,10 @@ class ServiceData:
                 char_item.getHandle(),
                 char_item.properties,
             )
+            for desc_item in char_item.getDescriptors():
+                _LOGGER.debug(
+                    "    Desc: %s [%s] h:%#x", desc_item.uuid, desc_item.getCommonName(), desc_item.getHandle()
+                )
 
     @staticmethod
     def print_services(serv_list: "List[ServiceData]"):
@@ -192,10 +269,28 @@ class ServiceData:
                 char_name = char_cfg.get("name")
                 char_handle = char_cfg.get("handle")
                 char_props = char_cfg.get("properties")
-                serv.add_characteristic(char_uuid, char_name, char_handle, char_props)
+                char_data = serv.add_characteristic(char_uuid, char_name, char_handle, char_props)
+                for desc_cfg in char_cfg.get("descriptors", []):
+                    desc_value = desc_cfg.get("value")
+                    if desc_value is not None:
+                        desc_value = bytes.fromhex(desc_value)
+                    char_data.add_descriptor(
+                        desc_cfg.get("uuid"), desc_cfg.get("name"), desc_cfg.get("handle"), desc_value
+                    )
             ret_list.append(serv)
         return ret_list
 
+    ## returns dict: value handle -> CCCD handle, of characteristics with discovered CCCD
+    @staticmethod
+    def get_cccd_handles(service_list: List["ServiceData"]) -> Dict[int, int]:
+        ret_dict = {}
+        for serv in service_list:
+            for char_item in serv.getCharacteristics():
+                cccd_handle = char_item.get_cccd_handle()
+                if cccd_handle is not None:
+                    ret_dict[char_item.getHandle()] = cccd_handle
+        return ret_dict
+
     @staticmethod
     def find_characteristic_handle(service_list: List["ServiceData"], uuid: str) -> int:
         for serv in service_list:
@@ -209,10 +304,37 @@ class ServiceData:
 
 
 class ServiceConnector:
+    ## receiver of upstream traffic (e.g. 'TrafficRing')
+    traffic_recorder = None
+
+    ## value handle -> handle of Client Characteristic Configuration descriptor
+    cccd_handles: Dict[int, int] = {}
+
+    def set_traffic_recorder(self, recorder):
+        self.traffic_recorder = recorder
+
+    ## services proxied by connector - allows resolving descriptors of characteristics
+    def set_services(self, service_list: List[ServiceData]):
+        self.cccd_handles = ServiceData.get_cccd_handles(service_list)
+
+    def get_cccd_handle(self, handle: int) -> int:
+        cccd_handle = self.cccd_handles.get(handle)
+        if cccd_handle is not None:
+            return cccd_handle
+        ## descriptors not discovered (e.g. profile stored without them) - assume common layout
+        _LOGGER.debug("CCCD of characteristic %#x not known, assuming handle %#x", handle, handle + 1)
+        return handle + 1
+
+    def record_traffic(self, direction: int, opcode: int, handle: int, data: bytes = None):
+        recorder = self.traffic_recorder
+        if recorder is not None:
+            recorder.record(LINK_UPSTREAM, direction, opcode, handle, data)
+
     def read_characteristic(self, handle):
         raise NotImplementedError()
 
-    def write_characteristic(self, handle, val):
+    ## 'with_response' - send write request instead of write command
+    def write_characteristic(self, handle, val, with_response=False):
         raise NotImplementedError()
 
     def subscribe_for_notification(self, handle, callback):
@@ -244,6 +366,14 @@ class AbstractConnector(ServiceConnector):
     def get_address_type(self):
         raise NotImplementedError()
 
+    ## maximum time in seconds of scanning device advertisement data
+    def get_scan_timeout(self) -> float:
+        return 0.0
+
+    ## maximum time in seconds of establishing connection to device
+    def get_connect_timeout(self) -> float:
+        return 0.0
+
     def disconnect(self):
         raise NotImplementedError()
 
@@ -255,6 +385,11 @@ class AbstractConnector(ServiceConnector):
     def get_services(self) -> List[ServiceData]:
         raise NotImplementedError()
 
+    ## returns file descriptor that becomes readable when notifications are pending
+    ## or None if connector drains notifications on its own (then 'process_notifications' blocks)
+    def get_notification_fd(self) -> int:
+        return None
+
     def process_notifications(self):
         raise NotImplementedError()
 
@@ -274,54 +409,294 @@ class AbstractConnector(ServiceConnector):
 # =====================================================
 
 
+class DispatchStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total_time += duration
+        if duration > self.max_time:
+            self.max_time = duration
+
+    def get_data(self) -> Dict[str, Any]:
+        return {"count": self.count, "total_time": self.total_time, "max_time": self.max_time}
+
+
 class CallbackContainer:
+    """Notification dispatch table.
+
+    Callbacks of each handle are stored in immutable tuple replaced on every
+    (un)register, so dispatch iterates consistent snapshot without taking lock.
+    Statistics objects are created on register, dispatching thread only updates their counters.
+    """
+
     def __init__(self):
-        self.container = {}
+        ## handle to tuple of pairs: callback and its stats
+        self.container: Dict[int, Tuple[Tuple[Callable, DispatchStats], ...]] = {}
+        self._lock = threading.Lock()
+        ## handle to stats of each callback
+        self._stats: Dict[int, Dict[str, DispatchStats]] = {}
 
     def register(self, handle, callback):
-        handlers = self.get(handle)
-        if handlers is None:
-            handlers = set()
-            self.container[handle] = handlers
-        handlers.add(callback)
+        with self._lock:
+            handlers = self.container.get(handle, ())
+            if any(item[0] == callback for item in handlers):
+                return
+            handle_stats = self._stats.setdefault(handle, {})
+            callback_name = get_callback_name(callback)
+            callback_stats = handle_stats.get(callback_name)
+            if callback_stats is None:
+                callback_stats = DispatchStats()
+                handle_stats[callback_name] = callback_stats
+            self.container[handle] = handlers + ((callback, callback_stats),)
 
     def unregister(self, handle, callback):
-        handlers = self.get(handle)
+        with self._lock:
+            handlers = self.container.get(handle)
+            if handlers is None:
+                return
+            handlers = tuple(item for item in handlers if item[0] != callback)
+            if handlers:
+                self.container[handle] = handlers
+            else:
+                del self.container[handle]
+
+    def get(self, handle) -> Tuple[Callable, ...]:
+        handlers = self.container.get(handle)
         if handlers is None:
-            return
-        handlers.discard(callback)
+            return None
+        return tuple(item[0] for item in handlers)
+
+    ## returns number of called callbacks
+    def dispatch(self, handle, data) -> int:
+        handlers = self.container.get(handle)
+        if not handlers:
+            return 0
+        for function, callback_stats in handlers:
+            start_time = time.perf_counter()
+            try:
+                function(data)
+            except:  # noqa    # pylint: disable=W0702
+                _LOGGER.exception("notification callback exception, handle: %#x", handle)
+            callback_stats.add(time.perf_counter() - start_time)
+        return len(handlers)
+
+    def get_stats(self) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            stats_items = [(handle, list(handle_stats.items())) for handle, handle_stats in self._stats.items()]
+        ret_data = {}
+        for handle, handle_stats in stats_items:
+            ## skip callbacks not called yet
+            callbacks_data = {name: stats.get_data() for name, stats in handle_stats if stats.count > 0}
+            if not callbacks_data:
+                continue
+            ret_data[handle] = {
+                "count": max(item["count"] for item in callbacks_data.values()),
+                "total_time": sum(item["total_time"] for item in callbacks_data.values()),
+                "callbacks": callbacks_data,
+            }
+        return ret_data
 
-    def get(self, handle):
-        if handle in self.container:
-            return self.container[handle]
-        return None
+    def print_stats(self):
+        stats = self.get_stats()
+        for handle, handle_data in sorted(stats.items()):
+            _LOGGER.info(
+                "notifications on %#x: count: %s callbacks time: %.3f ms",
+                handle,
+                handle_data["count"],
+                handle_data["total_time"] * 1000.0,
+            )
+            for name, data in handle_data["callbacks"].items():
+                _LOGGER.info(
+                    "  %s: count: %s total: %.3f ms max: %.3f ms",
+                    name,
+                    data["count"],
+                    data["total_time"] * 1000.0,
+                    data["max_time"] * 1000.0,
+                )
+
+
+## bits of Client Characteristic Configuration descriptor value
+CCCD_NOTIFY = 0x01
+CCCD_INDICATE = 0x02
+
+
+class SubscriptionManager:
+    """Reference counted subscriptions of notifications and indications.
+
+    Each subscriber (callback and mode) of handle is counted. Upstream CCCD is written
+    only when notifications or indications of handle become enabled by the first subscriber
+    or disabled by the last one, so both bits are kept when both modes are in use.
+
+    CCCD is written without holding lock of reference counts, so 'write_cccd' can take
+    locks of connector (e.g. while connector calls 'clear' during disconnect).
+    Writes are serialised by separate lock.
+    """
+
+    ## 'write_cccd' - function receiving handle and new CCCD value (CCCD_* bits)
+    def __init__(self, write_cccd: Callable[[int, int], Any], callbacks: CallbackContainer):
+        self.write_cccd = write_cccd
+        self.callbacks = callbacks
+        ## handle -> (callback, mode) -> reference count
+        self._refs: Dict[int, Dict[Tuple[Callable, int], int]] = {}
+        ## handle -> CCCD value written upstream
+        self._values: Dict[int, int] = {}
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self.writes = 0
+        self.skipped = 0
+
+    def subscribe(self, handle: int, mode: int, callback) -> Any:
+        key = (callback, mode)
+        with self._lock:
+            handle_refs = self._refs.setdefault(handle, {})
+            handle_refs[key] = handle_refs.get(key, 0) + 1
+            self.callbacks.register(handle, callback)
+        try:
+            return self._update(handle)
+        except Exception:
+            with self._lock:
+                self._release(handle, key)
+            raise
+
+    ## returns result of CCCD write or None if nothing written
+    def unsubscribe(self, handle: int, mode: int, callback) -> Any:
+        key = (callback, mode)
+        with self._lock:
+            if key not in self._refs.get(handle, {}):
+                _LOGGER.debug("unsubscribing not subscribed callback from %#x", handle)
+                return None
+            self._release(handle, key)
+        return self._update(handle)
+
+    ## returns CCCD value of handle expected by subscribers
+    def get_value(self, handle: int) -> int:
+        with self._lock:
+            value = 0
+            for _callback, mode in self._refs.get(handle, {}):
+                value |= mode
+            return value
+
+    ## forget all subscriptions (e.g. on disconnect)
+    def clear(self):
+        with self._lock:
+            for handle, handle_refs in self._refs.items():
+                for callback, _mode in handle_refs:
+                    self.callbacks.unregister(handle, callback)
+            self._refs = {}
+            self._values = {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "handles": len([value for value in self._values.values() if value]),
+                "writes": self.writes,
+                "skipped": self.skipped,
+            }
+
+    def _release(self, handle: int, key):
+        handle_refs = self._refs.get(handle)
+        if handle_refs is None or key not in handle_refs:
+            ## cleared in meantime
+            return
+        count = handle_refs[key] - 1
+        if count > 0:
+            handle_refs[key] = count
+            return
+        del handle_refs[key]
+        callback = key[0]
+        if not any(item[0] == callback for item in handle_refs):
+            self.callbacks.unregister(handle, callback)
+        if not handle_refs:
+            del self._refs[handle]
+
+    ## write CCCD if value expected by subscribers differs from written one
+    def _update(self, handle: int) -> Any:
+        with self._write_lock:
+            with self._lock:
+                value = self.get_value(handle)
+                if value == self._values.get(handle, 0):
+                    self.skipped += 1
+                    return None
+            _LOGGER.debug("writing CCCD of %#x: %#x", handle, value)
+            ret = self.write_cccd(handle, value)
+            with self._lock:
+                self.writes += 1
+                if value:
+                    self._values[handle] = value
+                else:
+                    self._values.pop(handle, None)
+            return ret
+
+
+def get_callback_name(function) -> str:
+    name = getattr(function, "__qualname__", None)
+    if name is None:
+        return repr(function)
+    owner = getattr(function, "__self__", None)
+    if owner is not None:
+        return f"{name}@{id(owner):#x}"
+    return name
 
 
 class NotificationHandler(Thread):
+    ## time to wait between checks when connector is not connected
+    IDLE_TIMEOUT = 0.1
+    ## blocking 'process_notifications' returning faster is considered broken (e.g. lost connection)
+    MIN_PROCESS_TIME = 0.001
+
     def __init__(self, connector: AbstractConnector):
         Thread.__init__(self, target=self._work)
         self.connector: AbstractConnector = connector
         self.daemon = True
         self.execute = True
+        self._wakeup = WakeupFd()
 
     def stop(self):
         _LOGGER.info("Stopping notify handler")
         self._stop_loop()
-        self.join()
+        if self.is_alive():
+            self.join()
+        self._wakeup.close()
 
     def _work(self):
         try:
             _LOGGER.info("Starting notify handler")
-            self.execute = True
             while self.execute:
                 try:
-                    self.connector.process_notifications()
+                    self._wait_and_process()
                 except:  # noqa    # pylint: disable=W0702
                     _LOGGER.exception("Exception occurred")
                     self._stop_loop()
-                sleep(0.001)  ## prevents starving other thread
         finally:
             _LOGGER.info("Notification handler run loop stopped")
 
+    def _wait_and_process(self):
+        if not self.connector.is_connected():
+            self._wakeup.wait(self.IDLE_TIMEOUT)
+            return
+
+        notify_fd = self.connector.get_notification_fd()
+        if notify_fd is None:
+            ## connector blocks on its own
+            start_time = time.monotonic()
+            self.connector.process_notifications()
+            if time.monotonic() - start_time < self.MIN_PROCESS_TIME:
+                ## connector did not block - prevent busy loop
+                self._wakeup.wait(self.IDLE_TIMEOUT)
+            return
+
+        ## block until backend has data or until stop request
+        wakeup_fd = self._wakeup.fileno()
+        ready_list = wait_readable([notify_fd, wakeup_fd])
+        if wakeup_fd in ready_list:
+            self._wakeup.clear()
+        if self.execute and notify_fd in ready_list:
+            self.connector.process_notifications()
+
     def _stop_loop(self):
         self.execute = False
+        self._wakeup.wake()
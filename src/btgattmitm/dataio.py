@@ -3,12 +3,32 @@
 ##
 
 import logging
+import os
+import pickle
+import hashlib
+
 import yaml
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
+## use libyaml bindings if available
+try:
+    from yaml import CFullLoader as FullLoader, CDumper as Dumper
+except ImportError:
+    from yaml import FullLoader, Dumper
+
+
+## directory of compiled cache files, if None then user cache directory is used
+## cache files are pickled, so directory have to be private to user
+CACHE_DIR = None
+## suffix of compiled cache file
+CACHE_SUFFIX = ".cache"
+## increase when format of cache file changes
+CACHE_VERSION = 1
+
+
 def bytearray_constructor(_, node):
     # def bytearray_constructor(loader, node):
     node_values = node.value
@@ -19,24 +39,103 @@ def bytearray_constructor(_, node):
 
 # fix bytearray deserialization error
 yaml.add_constructor("tag:yaml.org,2002:python/object/apply:builtins.bytearray", bytearray_constructor)
+if FullLoader is not yaml.FullLoader:
+    yaml.add_constructor(
+        "tag:yaml.org,2002:python/object/apply:builtins.bytearray", bytearray_constructor, Loader=FullLoader
+    )
 
 
 # ===================================================
 
 
 def dump(data_object):
-    return yaml.dump(data_object, sort_keys=True)
+    return yaml.dump(data_object, Dumper=Dumper, sort_keys=True)
 
 
 def dump_to(data_object, output_path):
     with open(output_path, "w", encoding="utf-8") as output_file:
-        yaml.dump(data_object, output_file, sort_keys=True)
+        yaml.dump(data_object, output_file, Dumper=Dumper, sort_keys=True)
 
 
 def load(json_content):
-    return yaml.full_load(json_content)
-
-
-def load_from(config_path):
-    with open(config_path, encoding="utf-8") as data_file:
-        return yaml.full_load(data_file)
+    return yaml.load(json_content, Loader=FullLoader)
+
+
+def load_from(config_path, use_cache=True):
+    """Load YAML file.
+
+    If 'use_cache' is set, then parsed content is stored in compiled cache file in private cache directory
+    and reused while loaded file does not change (same modification time, size and content hash).
+    """
+    with open(config_path, "rb") as data_file:
+        content = data_file.read()
+    if not use_cache:
+        return load(content)
+
+    file_stat = os.stat(config_path)
+    cache_key = (CACHE_VERSION, file_stat.st_mtime_ns, file_stat.st_size, hashlib.sha1(content).hexdigest())
+    cache_path = get_cache_path(config_path)
+    if cache_path is None:
+        return load(content)
+    data_object = _load_cache(cache_path, cache_key)
+    if data_object is not None:
+        return data_object[0]
+
+    data_object = load(content)
+    _store_cache(cache_path, cache_key, data_object)
+    return data_object
+
+
+## returns path of compiled cache file of given file or None if private cache directory is not available
+def get_cache_path(config_path):
+    cache_dir = CACHE_DIR
+    if cache_dir is None:
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(cache_home, "btgattmitm")
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        dir_stat = os.stat(cache_dir)
+    except OSError as exc:
+        _LOGGER.debug("unable to create cache directory %s: %s", cache_dir, exc)
+        return None
+    if dir_stat.st_uid != os.getuid() or dir_stat.st_mode & 0o077:
+        _LOGGER.warning("cache directory %s is not private to user - cache disabled", cache_dir)
+        return None
+    path_hash = hashlib.sha1(os.path.abspath(config_path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, path_hash + CACHE_SUFFIX)
+
+
+## remove compiled cache file of given file
+def remove_cache(config_path):
+    cache_path = get_cache_path(config_path)
+    if cache_path is not None and os.path.isfile(cache_path):
+        os.remove(cache_path)
+
+
+## returns tuple with cached object or None if cache is not valid
+def _load_cache(cache_path, cache_key):
+    try:
+        with open(cache_path, "rb") as cache_file:
+            stored_key = pickle.load(cache_file)
+            if stored_key != cache_key:
+                return None
+            return (pickle.load(cache_file),)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:  # pylint: disable=W0703
+        _LOGGER.warning("unable to load cache %s: %s", cache_path, exc)
+        return None
+
+
+def _store_cache(cache_path, cache_key, data_object):
+    temp_path = f"{cache_path}.{os.getpid()}"
+    try:
+        with open(temp_path, "wb") as cache_file:
+            pickle.dump(cache_key, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data_object, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError as exc:
+        ## e.g. directory is read-only
+        _LOGGER.debug("unable to store cache %s: %s", cache_path, exc)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
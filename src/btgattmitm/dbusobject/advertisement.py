@@ -6,7 +6,7 @@
 
 import logging
 import pprint
-from typing import List
+from typing import Dict, Any, List
 
 import dbus.service
 
@@ -46,16 +46,19 @@ SCANRESP_PROP_ID_TO_NAME_DICT = {
 class Advertisement(dbus.service.Object):
     PATH_BASE = "/org/bluez/btmitmapp/advertisement"
 
-    def __init__(self, bus, index, advertising_type):
-        self.path = self.PATH_BASE + str(index)
+    ## path_base - path prefix of advertisement object, by default 'PATH_BASE'
+    def __init__(self, bus, index, advertising_type, path_base: str = None):
+        if path_base is None:
+            path_base = self.PATH_BASE
+        self.path = path_base + str(index)
         self.bus = bus
 
         self.ad_type = advertising_type
         self.discoverable = True
-        self.include_tx_power = None
+        self.include_tx_power: bool = None
 
-        self.adv_data = {}
-        self.scanresp_data = {}
+        self.adv_data: Dict[Any, Any] = {}
+        self.scanresp_data: Dict[Any, Any] = {}
         dbus.service.Object.__init__(self, bus, self.path)
 
     def get_properties(self):
@@ -222,17 +225,18 @@ class Advertisement(dbus.service.Object):
 
 class DBusAdvertisementManager(AdvertisementManager):
 
-    def __init__(self, bus, index):
+    def __init__(self, bus, index, path_base: str = None):
         super().__init__()
-        self.adv = Advertisement(bus, index, "peripheral")
+        self.adapter = f"hci{index}"
+        self.adv = Advertisement(bus, index, "peripheral", path_base)
         self.adv.include_tx_power = True
 
-        self.register_completed = False
+        self.register_completed: bool = False
         self.manager_iface = None
 
     ## configuration of service
     def initialize(self):
-        advertise_adapter = find_advertise_adapter(self.adv.bus)
+        advertise_adapter = find_advertise_adapter(self.adv.bus, self.adapter)
         if not advertise_adapter:
             _LOGGER.error("LEAdvertisingManager1 interface not found")
             return
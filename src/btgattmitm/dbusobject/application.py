@@ -5,7 +5,7 @@
 #
 
 import logging
-from typing import List
+from typing import List, Dict, Any
 import pprint
 
 import dbus
@@ -17,6 +17,13 @@ from btgattmitm.dbusobject.service import Service
 _LOGGER = logging.getLogger(__name__)
 
 
+## path of application of given MITM session (session 0 uses base path)
+def get_session_path(session_index: int = 0) -> str:
+    if session_index == 0:
+        return Application.PATH_BASE
+    return f"{Application.PATH_BASE}/session{session_index}"
+
+
 class Application(dbus.service.Object):
     PATH_BASE = "/org/bluez/btmitmapp"
 
@@ -24,30 +31,40 @@ class Application(dbus.service.Object):
     org.bluez.GattApplication1 interface implementation
     """
 
-    def __init__(self, bus):
+    def __init__(self, bus, path: str = None):
         _LOGGER.debug("Initializing Application")
-        self.path = self.PATH_BASE
+        if path is None:
+            path = self.PATH_BASE
+        self.path = path
         self.services: List[Service] = []
+        ## snapshot of objects tree - rebuilt after services change
+        self._managed_objects: Dict[dbus.ObjectPath, Dict[str, Dict[str, Any]]] = None
         dbus.service.Object.__init__(self, bus, self.path)
 
+    ## service have to be completely configured (characteristics and descriptors added) before adding
     def add_service(self, service: Service):
+        service.application = self
         self.services.append(service)
+        self.invalidate_objects()
+
+    def invalidate_objects(self):
+        self._managed_objects = None
+
+    ## returned dictionary is shared - do not modify it
+    def get_managed_objects(self):
+        if self._managed_objects is not None:
+            return self._managed_objects
+        response = {}
+        for service in self.services:
+            response.update(service.get_managed_objects())
+        self._managed_objects = response
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("registered services:\n%s", pprint.pformat(response))
+        return response
 
     def get_path(self):
         return dbus.ObjectPath(self.path)
 
     @dbus.service.method(DBUS_OM_IFACE, out_signature="a{oa{sa{sv}}}")
     def GetManagedObjects(self):
-        response = {}
-        ##_LOGGER.debug("Application::GetManagedObjects: %r", self.services)
-
-        for service in self.services:
-            response[service.get_path()] = service.get_properties()
-            chrcs = service.get_characteristics()
-            for chrc in chrcs:
-                response[chrc.get_path()] = chrc.get_properties()
-                descs = chrc.get_descriptors()
-                for desc in descs:
-                    response[desc.get_path()] = desc.get_properties()
-        _LOGGER.info("registered services:\n%s", pprint.pformat(response))
-        return response
+        return self.get_managed_objects()
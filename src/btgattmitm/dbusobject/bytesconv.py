@@ -0,0 +1,78 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Conversion of characteristic values between D-Bus and connectors.
+
+Values are converted in bulk (single C-level copy) instead of byte by byte.
+Hex representation for logs is computed only when log record is emitted.
+"""
+
+import dbus
+
+
+def to_bytes(value) -> bytes:
+    """Convert value received from D-Bus or connector to bytes.
+
+    'dbus.ByteArray' (received with 'byte_arrays=True') is subclass of bytes and is returned as is.
+    """
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, int):
+        return bytes((value,))
+    if isinstance(value, str):
+        ## data in form of string (Python 2 legacy)
+        return value.encode("latin-1")
+    ## bytearray, memoryview, dbus.Array of dbus.Byte, list of ints
+    return bytes(value)
+
+
+def to_dbus_bytes(value) -> dbus.ByteArray:
+    """Convert value to D-Bus 'ay' type without creating 'dbus.Byte' object per byte."""
+    if isinstance(value, dbus.ByteArray):
+        return value
+    return dbus.ByteArray(to_bytes(value))
+
+
+def to_hex_string(data) -> str:
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return data.hex()
+    return to_bytes(data).hex()
+
+
+class HexData:
+    """Lazy hex representation of data.
+
+    Pass as logger argument, conversion is done only if record is going to be emitted.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return to_hex_string(self.data)
+
+    def __repr__(self):
+        return self.__str__()
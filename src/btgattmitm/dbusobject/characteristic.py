@@ -12,6 +12,7 @@ import dbus.service
 from btgattmitm.constants import DBUS_PROP_IFACE
 from btgattmitm.constants import GATT_CHRC_IFACE
 from btgattmitm.dbusobject.exception import InvalidArgsException, NotSupportedException
+from btgattmitm.dbusobject.bytesconv import to_dbus_bytes
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -26,6 +27,8 @@ class Characteristic(dbus.service.Object):
         self.uuid: str = uuid
         self.prop_flags: List[str] = flags
         self.descriptors: List[Any] = []
+        ## precomputed properties - rebuilt after descriptors change
+        self._properties = None
         dbus.service.Object.__init__(self, bus, self.path)
 
     def get_properties_list(self) -> List[str]:
@@ -33,6 +36,8 @@ class Characteristic(dbus.service.Object):
         return self.prop_flags
 
     def get_properties(self):
+        if self._properties is not None:
+            return self._properties
         props = {
             GATT_CHRC_IFACE: {
                 "Service": self.service.get_path(),
@@ -42,6 +47,7 @@ class Characteristic(dbus.service.Object):
             }
         }
         #         print( "returning props:", props )
+        self._properties = props
         return props
 
     def get_path(self):
@@ -51,6 +57,8 @@ class Characteristic(dbus.service.Object):
 
     def add_descriptor(self, descriptor):
         self.descriptors.append(descriptor)
+        self._properties = None
+        self.service.invalidate_objects()
 
     def get_descriptor_paths(self):
         result = []
@@ -81,23 +89,25 @@ class Characteristic(dbus.service.Object):
             # pylint: disable=E1111
             value = self.readValueHandler()
             if value is None:
-                return []
-            # value = self._wrap(value)
+                value = b""
             # _LOGGER.debug("Sending data to client: %s", repr(value))
-            return value
+            return to_dbus_bytes(value)
         except:  # noqa    # pylint: disable=W0702
             logging.exception("Exception occured")
             raise
 
     ### called when connected device send something to characteristic
     # @dbus.service.method(GATT_CHRC_IFACE, in_signature="ay")
-    @dbus.service.method(GATT_CHRC_IFACE, in_signature="aya{sv}")
-    def WriteValue(self, value, _value):
-        # def WriteValue(self, value, options):
+    ## 'byte_arrays' - receive value as 'dbus.ByteArray' (bytes) instead of array of 'dbus.Byte'
+    ## 'async_callbacks' - reply can be sent later, so main loop does not wait for device
+    @dbus.service.method(
+        GATT_CHRC_IFACE, in_signature="aya{sv}", byte_arrays=True, async_callbacks=("reply_handler", "error_handler")
+    )
+    def WriteValue(self, value, options, reply_handler, error_handler):
         try:
             # _LOGGER.debug("Received data from client: %s", repr(value))
             # value = self._unwrap(value)
-            return self.writeValueHandler(value)
+            self.writeValueAsyncHandler(value, options, reply_handler, error_handler)
         except:  # noqa    # pylint: disable=W0702
             logging.exception("Exception occured")
             raise
@@ -129,8 +139,15 @@ class Characteristic(dbus.service.Object):
         _LOGGER.debug("Default ReadValue called, returning error")
         raise NotSupportedException()
 
-    def writeValueHandler(self, _value):
-        # def writeValueHandler(self, value):
+    ## called on D-Bus main loop, 'reply_handler' or 'error_handler' has to be called once write is completed
+    ## exception raised here is sent as error reply
+    def writeValueAsyncHandler(self, value, options, reply_handler, _error_handler):
+        self.writeValueHandler(value, options)
+        reply_handler()
+
+    ## options - dict of write options, e.g. "type": "command" or "request"
+    def writeValueHandler(self, _value, _options=None):
+        # def writeValueHandler(self, value, options):
         _LOGGER.debug("Default WriteValue called, returning error")
         raise NotSupportedException()
 
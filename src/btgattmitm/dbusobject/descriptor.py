@@ -0,0 +1,81 @@
+#
+# Code based on:
+#        https://github.com/Vudentz/BlueZ/blob/master/test/example-gatt-server
+#
+
+import logging
+from typing import List
+
+import dbus.service
+
+from btgattmitm.constants import DBUS_PROP_IFACE
+from btgattmitm.constants import GATT_DESC_IFACE
+from btgattmitm.dbusobject.exception import InvalidArgsException, NotSupportedException
+from btgattmitm.dbusobject.bytesconv import to_dbus_bytes
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Descriptor(dbus.service.Object):
+    def __init__(self, bus, index: int, uuid: str, flags, characteristic):
+        self.bus = bus
+        self.characteristic = characteristic
+        self.index: int = index
+        self.path: str = characteristic.path + "/desc" + str(index)
+        self.uuid: str = uuid
+        self.flags: List[str] = flags
+        ## precomputed properties
+        self._properties = None
+        dbus.service.Object.__init__(self, bus, self.path)
+
+    def get_properties(self):
+        if self._properties is not None:
+            return self._properties
+        self._properties = {
+            GATT_DESC_IFACE: {
+                "Characteristic": self.characteristic.get_path(),
+                "UUID": self.uuid,
+                "Flags": self.flags,
+            }
+        }
+        return self._properties
+
+    def get_path(self):
+        return dbus.ObjectPath(self.path)
+
+    @dbus.service.method(DBUS_PROP_IFACE, in_signature="s", out_signature="a{sv}")
+    def GetAll(self, interface):
+        if interface != GATT_DESC_IFACE:
+            raise InvalidArgsException()
+        return self.get_properties()[GATT_DESC_IFACE]
+
+    @dbus.service.method(GATT_DESC_IFACE, in_signature="a{sv}", out_signature="ay")
+    def ReadValue(self, _options):
+        try:
+            # pylint: disable=E1111
+            value = self.readValueHandler()
+            if value is None:
+                value = b""
+            return to_dbus_bytes(value)
+        except:  # noqa    # pylint: disable=W0702
+            logging.exception("Exception occured")
+            raise
+
+    @dbus.service.method(GATT_DESC_IFACE, in_signature="aya{sv}", byte_arrays=True)
+    def WriteValue(self, value, options):
+        try:
+            return self.writeValueHandler(value, options)
+        except:  # noqa    # pylint: disable=W0702
+            logging.exception("Exception occured")
+            raise
+
+    # =======================================================
+
+    def readValueHandler(self):
+        _LOGGER.debug("Default ReadValue called, returning error")
+        raise NotSupportedException()
+
+    def writeValueHandler(self, _value, _options=None):
+        _LOGGER.debug("Default WriteValue called, returning error")
+        raise NotSupportedException()
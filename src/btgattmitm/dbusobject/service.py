@@ -5,7 +5,7 @@
 #
 
 import logging
-from typing import List
+from typing import List, Any
 import pprint
 
 import dbus.service
@@ -22,15 +22,25 @@ _LOGGER = logging.getLogger(__name__)
 class Service(dbus.service.Object):
     PATH_BASE = "/org/bluez/btmitmapp/service"
 
-    def __init__(self, bus, index, uuid, primary):
-        self.path = self.PATH_BASE + str(index)
+    ## path_base - path prefix of service objects, by default 'PATH_BASE'
+    def __init__(self, bus, index, uuid, primary, path_base: str = None):
+        if path_base is None:
+            path_base = self.PATH_BASE
+        self.path = path_base + str(index)
         self.bus = bus
         self.uuid = uuid
         self.primary = primary
         self.characteristics: List[Characteristic] = []
+        ## precomputed properties and objects tree - rebuilt after characteristics change
+        self._properties = None
+        self._managed_objects = None
+        ## owning application (set by 'Application.add_service') - its objects tree contains tree of service
+        self.application: Any = None
         dbus.service.Object.__init__(self, bus, self.path)
 
     def get_properties(self):
+        if self._properties is not None:
+            return self._properties
         props = {
             GATT_SERVICE_IFACE: {
                 "UUID": self.uuid,
@@ -39,6 +49,7 @@ class Service(dbus.service.Object):
             }
         }
         #         print( "returning props:", props )
+        self._properties = props
         return props
 
     def get_path(self):
@@ -48,6 +59,28 @@ class Service(dbus.service.Object):
 
     def add_characteristic(self, characteristic: Characteristic):
         self.characteristics.append(characteristic)
+        self.invalidate_objects()
+
+    def invalidate_objects(self):
+        self._properties = None
+        self._managed_objects = None
+        if self.application is not None:
+            self.application.invalidate_objects()
+
+    ## returned dictionary is shared - do not modify it
+    def get_managed_objects(self):
+        if self._managed_objects is not None:
+            return self._managed_objects
+        response = {}
+        response[self.get_path()] = self.get_properties()
+        chrcs = self.get_characteristics()
+        for chrc in chrcs:
+            response[chrc.get_path()] = chrc.get_properties()
+            descs = chrc.get_descriptors()
+            for desc in descs:
+                response[desc.get_path()] = desc.get_properties()
+        self._managed_objects = response
+        return response
 
     def get_characteristic_paths(self):
         result = []
@@ -67,21 +100,13 @@ class Service(dbus.service.Object):
 
         props_dict = self.get_properties()
         props = props_dict[GATT_SERVICE_IFACE]
-        _LOGGER.info("returning service props:\n%s", pprint.pformat(props))
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("returning service props:\n%s", pprint.pformat(props))
         return props
 
     @dbus.service.method(DBUS_OM_IFACE, out_signature="a{oa{sa{sv}}}")
     def GetManagedObjects(self):
-        response = {}
-        #         print('GetManagedObjects')
-
-        response[self.get_path()] = self.get_properties()
-        chrcs = self.get_characteristics()
-        for chrc in chrcs:
-            response[chrc.get_path()] = chrc.get_properties()
-            descs = chrc.get_descriptors()
-            for desc in descs:
-                response[desc.get_path()] = desc.get_properties()
-        #         print( "returning objects:", response )
-        _LOGGER.info("returning characteristics:\n%s", pprint.pformat(response))
+        response = self.get_managed_objects()
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("returning characteristics:\n%s", pprint.pformat(response))
         return response
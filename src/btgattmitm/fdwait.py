@@ -0,0 +1,95 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import os
+import select
+import errno
+from typing import List
+
+
+class WakeupFd:
+    """Pipe based file descriptor allowing to interrupt blocking 'poll' from other thread."""
+
+    def __init__(self):
+        self._read_fd, self._write_fd = os.pipe()
+        self._closed = False
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+
+    def fileno(self) -> int:
+        return self._read_fd
+
+    def wake(self):
+        if self._closed:
+            ## prevent writing to reused descriptor
+            return
+        try:
+            os.write(self._write_fd, b"\x00")
+        except BlockingIOError:
+            ## pipe is full - reader is already woken up
+            pass
+        except OSError:
+            ## closed
+            pass
+
+    def clear(self):
+        try:
+            while os.read(self._read_fd, 512):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def wait(self, timeout: float = None) -> bool:
+        """Wait for wake up. Returns True if woken up, False on timeout."""
+        ready = wait_readable([self._read_fd], timeout)
+        self.clear()
+        return bool(ready)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for fd in (self._read_fd, self._write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+## returns list of descriptors ready to read
+## 'timeout' in seconds, None means infinite wait
+def wait_readable(fd_list: List[int], timeout: float = None) -> List[int]:
+    poller = select.poll()
+    for fd in fd_list:
+        poller.register(fd, select.POLLIN | select.POLLPRI)
+    timeout_ms = None
+    if timeout is not None:
+        timeout_ms = timeout * 1000.0
+    try:
+        events = poller.poll(timeout_ms)
+    except OSError as exc:
+        if exc.errno == errno.EINTR:
+            return []
+        raise
+    return [item[0] for item in events]
@@ -3,9 +3,10 @@
 ##
 
 import logging
+import threading
+from typing import Dict, List, Set
 
-import dbus
-
+from btgattmitm.synchronized import synchronized
 from btgattmitm.constants import DBUS_OM_IFACE
 from btgattmitm.constants import BLUEZ_SERVICE_NAME, GATT_MANAGER_IFACE, LE_ADVERTISING_MANAGER_IFACE
 
@@ -13,18 +14,17 @@ from btgattmitm.constants import BLUEZ_SERVICE_NAME, GATT_MANAGER_IFACE, LE_ADVE
 _LOGGER = logging.getLogger(__name__)
 
 
-def find_advertise_adapter(bus):
-    serviceObj = bus.get_object(BLUEZ_SERVICE_NAME, "/")
-    remote_om = dbus.Interface(serviceObj, DBUS_OM_IFACE)
-    objects = remote_om.GetManagedObjects()
-    return find_object_with_key_old(objects, LE_ADVERTISING_MANAGER_IFACE)
+BLUEZ_ROOT_PATH = "/org/bluez"
+ADAPTER_IFACE = "org.bluez.Adapter1"
+DEVICE_IFACE = "org.bluez.Device1"
+
 
+def find_advertise_adapter(bus, adapter: str = None):
+    return get_object_cache(bus).find_object(LE_ADVERTISING_MANAGER_IFACE, adapter)
 
-def find_gatt_adapter(bus):
-    serviceObj = bus.get_object(BLUEZ_SERVICE_NAME, "/")
-    remote_om = dbus.Interface(serviceObj, DBUS_OM_IFACE)
-    objects = remote_om.GetManagedObjects()
-    return find_object_with_key_old(objects, GATT_MANAGER_IFACE)
+
+def find_gatt_adapter(bus, adapter: str = None):
+    return get_object_cache(bus).find_object(GATT_MANAGER_IFACE, adapter)
 
 
 def find_object_with_key(objects, key):
@@ -41,3 +41,153 @@ def find_object_with_key_old(objects, key):
         if key in props:
             return obj
     return None
+
+
+## returns adapter path of given object (e.g. '/org/bluez/hci0' for '/org/bluez/hci0/dev_00_11_22_33_44_55')
+def get_adapter_path(object_path: str) -> str:
+    if not object_path.startswith(BLUEZ_ROOT_PATH + "/"):
+        return None
+    parts = object_path.split("/")
+    return "/".join(parts[:4])
+
+
+## =============================================================
+
+
+class BluezObjectCache:
+    """Copy of BlueZ objects tree.
+
+    Tree is received once and then updated by 'InterfacesAdded' and 'InterfacesRemoved' signals.
+    Objects are indexed by interface name and by adapter.
+    """
+
+    def __init__(self, bus):
+        self.bus = bus
+        ## object path -> interface name -> properties
+        self._objects: Dict[str, Dict[str, Dict]] = None
+        ## interface name -> object paths
+        self._by_interface: Dict[str, Set[str]] = {}
+        ## adapter path -> object paths
+        self._by_adapter: Dict[str, Set[str]] = {}
+        self._signal_matches = []
+        self._methods_lock = threading.RLock()
+
+    @synchronized
+    def initialize(self):
+        if self._objects is not None:
+            return
+        ## subscribe before receiving tree to not miss any change
+        for signal_name, handler in (
+            ("InterfacesAdded", self._interfaces_added),
+            ("InterfacesRemoved", self._interfaces_removed),
+        ):
+            match = self.bus.add_signal_receiver(
+                handler, signal_name=signal_name, dbus_interface=DBUS_OM_IFACE, bus_name=BLUEZ_SERVICE_NAME, path="/"
+            )
+            self._signal_matches.append(match)
+
+        service_obj = self.bus.get_object(BLUEZ_SERVICE_NAME, "/")
+        objects = service_obj.GetManagedObjects(dbus_interface=DBUS_OM_IFACE)
+        self._objects = {}
+        for object_path, interfaces in objects.items():
+            self._add_interfaces(str(object_path), interfaces)
+        _LOGGER.debug("received %s BlueZ objects", len(self._objects))
+
+    @synchronized
+    def close(self):
+        for match in self._signal_matches:
+            match.remove()
+        self._signal_matches = []
+        self._objects = None
+        self._by_interface = {}
+        self._by_adapter = {}
+
+    ## ======================================================
+
+    ## 'adapter' - name (e.g. hci0) or path of adapter, None means any adapter
+    @synchronized
+    def find_object(self, interface: str, adapter: str = None) -> str:
+        found_list = self.get_objects(interface, adapter)
+        if not found_list:
+            return None
+        return found_list[0]
+
+    @synchronized
+    def get_objects(self, interface: str, adapter: str = None) -> List[str]:
+        self.initialize()
+        found = self._by_interface.get(interface, set())
+        if adapter is not None:
+            if not adapter.startswith("/"):
+                adapter = f"{BLUEZ_ROOT_PATH}/{adapter}"
+            found = found & self._by_adapter.get(adapter, set())
+        return sorted(found)
+
+    @synchronized
+    def get_properties(self, object_path: str, interface: str) -> Dict:
+        self.initialize()
+        return self._objects.get(object_path, {}).get(interface)
+
+    def get_adapters(self) -> List[str]:
+        return self.get_objects(ADAPTER_IFACE)
+
+    def get_devices(self, adapter: str = None) -> List[str]:
+        return self.get_objects(DEVICE_IFACE, adapter)
+
+    ## ======================================================
+
+    @synchronized
+    def _interfaces_added(self, object_path, interfaces):
+        if self._objects is None:
+            return
+        _LOGGER.debug("interfaces added: %s %s", object_path, list(interfaces.keys()))
+        self._add_interfaces(str(object_path), interfaces)
+
+    @synchronized
+    def _interfaces_removed(self, object_path, interfaces):
+        if self._objects is None:
+            return
+        object_path = str(object_path)
+        _LOGGER.debug("interfaces removed: %s %s", object_path, list(interfaces))
+        object_interfaces = self._objects.get(object_path)
+        if object_interfaces is None:
+            return
+        for interface in interfaces:
+            interface = str(interface)
+            object_interfaces.pop(interface, None)
+            paths = self._by_interface.get(interface)
+            if paths is not None:
+                paths.discard(object_path)
+        if object_interfaces:
+            return
+        del self._objects[object_path]
+        adapter_path = get_adapter_path(object_path)
+        paths = self._by_adapter.get(adapter_path)
+        if paths is not None:
+            paths.discard(object_path)
+
+    def _add_interfaces(self, object_path: str, interfaces):
+        object_interfaces = self._objects.setdefault(object_path, {})
+        for interface, props in interfaces.items():
+            interface = str(interface)
+            object_interfaces[interface] = props
+            self._by_interface.setdefault(interface, set()).add(object_path)
+        adapter_path = get_adapter_path(object_path)
+        if adapter_path is not None:
+            self._by_adapter.setdefault(adapter_path, set()).add(object_path)
+
+
+## =============================================================
+
+
+_CACHES_LOCK = threading.Lock()
+_CACHES: Dict[object, BluezObjectCache] = {}
+
+
+## returns cache shared by all users of given bus
+def get_object_cache(bus) -> BluezObjectCache:
+    with _CACHES_LOCK:
+        cache = _CACHES.get(bus)
+        if cache is None:
+            cache = BluezObjectCache(bus)
+            _CACHES[bus] = cache
+        return cache
@@ -0,0 +1,148 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Persistent cache of discovered GATT database.
+
+Entry is stored per device address and address type in the same format as
+'services' section of device profile. Entry is invalidated by Service Changed
+indication or when Database Hash characteristic value differs from stored one.
+"""
+
+import logging
+from typing import List, Dict, Any
+
+import os
+import time
+
+from btgattmitm import dataio
+from btgattmitm.connector import AbstractConnector, ServiceData
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+SERVICE_CHANGED_UUID = "00002a05-0000-1000-8000-00805f9b34fb"
+DATABASE_HASH_UUID = "00002b2a-0000-1000-8000-00805f9b34fb"
+
+## version of entry format - entries of other versions are discovered again
+## version 2: descriptors of characteristics
+CACHE_VERSION = 2
+
+
+class GattCache:
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    ## connector not providing address type (None) is keyed by address only
+    @staticmethod
+    def get_address_type(connector: AbstractConnector) -> str:
+        try:
+            return connector.get_address_type()
+        except NotImplementedError:
+            return None
+
+    def get_path(self, address: str, address_type: str) -> str:
+        address_id = address.replace(":", "").upper()
+        if not address_type:
+            address_type = "unknown"
+        return os.path.join(self.cache_dir, f"{address_id}_{address_type}.yaml")
+
+    def load(self, address: str, address_type: str) -> Dict[str, Any]:
+        cache_path = self.get_path(address, address_type)
+        if not os.path.isfile(cache_path):
+            return None
+        try:
+            return dataio.load_from(cache_path)
+        except Exception as exc:  # pylint: disable=W0703
+            _LOGGER.warning("unable to load GATT cache %s: %s", cache_path, exc)
+            return None
+
+    def store(self, address: str, address_type: str, service_list: List[ServiceData], db_hash: bytes = None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_data: Dict[str, Any] = {}
+        cache_data["version"] = CACHE_VERSION
+        cache_data["address"] = address
+        cache_data["addrtype"] = address_type
+        cache_data["dbhash"] = db_hash.hex() if db_hash is not None else None
+        cache_data["services"] = ServiceData.dump_config(service_list)
+        cache_path = self.get_path(address, address_type)
+        try:
+            dataio.dump_to(cache_data, cache_path)
+        except Exception as exc:  # pylint: disable=W0703
+            _LOGGER.warning("unable to store GATT cache %s: %s", cache_path, exc)
+
+    def invalidate(self, address: str, address_type: str):
+        cache_path = self.get_path(address, address_type)
+        if os.path.isfile(cache_path):
+            _LOGGER.info("invalidating GATT cache %s", cache_path)
+            os.remove(cache_path)
+        dataio.remove_cache(cache_path)
+
+    def get_services(self, connector: AbstractConnector) -> List[ServiceData]:
+        """Return services from cache if valid, otherwise discover services and store them in cache."""
+        start_time = time.time()
+        if connector.connect() is None:
+            return None
+        address = connector.get_address()
+        address_type = self.get_address_type(connector)
+
+        cache_data = self.load(address, address_type)
+        if cache_data is not None and cache_data.get("version") != CACHE_VERSION:
+            _LOGGER.info("GATT cache of %s has old format", address)
+            cache_data = None
+        if cache_data is not None:
+            service_list = ServiceData.prepare_from_config(list(cache_data.get("services", {}).values()))
+            if self._is_valid(connector, service_list, cache_data.get("dbhash")):
+                _LOGGER.info("GATT services loaded from cache (warm start) in %.3fs", time.time() - start_time)
+                return service_list
+            _LOGGER.info("GATT cache of %s is outdated", address)
+
+        service_list = connector.get_services()
+        if service_list is None:
+            return None
+        db_hash = self._read_db_hash(connector, service_list)
+        self.store(address, address_type, service_list, db_hash)
+        _LOGGER.info("GATT services discovered (cold start) in %.3fs", time.time() - start_time)
+        return service_list
+
+    def _is_valid(self, connector: AbstractConnector, service_list: List[ServiceData], stored_hash: str) -> bool:
+        if not service_list:
+            return False
+        if stored_hash is None:
+            ## device does not provide hash - entry valid until Service Changed
+            return True
+        db_hash = self._read_db_hash(connector, service_list)
+        if db_hash is None:
+            return False
+        return db_hash.hex() == stored_hash
+
+    def _read_db_hash(self, connector: AbstractConnector, service_list: List[ServiceData]) -> bytes:
+        handle = ServiceData.find_characteristic_handle(service_list, DATABASE_HASH_UUID)
+        if handle is None:
+            return None
+        try:
+            return bytes(connector.read_characteristic(handle))
+        except Exception as exc:  # pylint: disable=W0703
+            _LOGGER.warning("unable to read database hash: %s", exc)
+            return None
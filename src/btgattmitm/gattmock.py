@@ -23,36 +23,83 @@
 #
 
 import logging
-from typing import List, Dict, Any
-import struct
+from typing import List, Dict, Any, Callable
 
 # try:
 #     from gi.repository import GObject
 # except ImportError:
 #     import gobject as GObject
 import dbus
+from gi.repository import GLib
 
 from btgattmitm.dbusobject.service import Service
 from btgattmitm.dbusobject.characteristic import Characteristic
+from btgattmitm.dbusobject.descriptor import Descriptor
 from btgattmitm.constants import GATT_CHRC_IFACE, BLUEZ_SERVICE_NAME, GATT_MANAGER_IFACE
-from btgattmitm.connector import ServiceData, ServiceConnector, CharacteristicData
+from btgattmitm.connector import ServiceData, ServiceConnector, CharacteristicData, DescriptorData
+from btgattmitm.connector import STATIC_DESCRIPTOR_UUIDS
 from btgattmitm.dbusobject.application import Application
 from btgattmitm.find_adapter import find_gatt_adapter
+from btgattmitm.valuecache import ValueCache
+from btgattmitm.writepipeline import WritePipeline, WriteRequest
+from btgattmitm.capture import (
+    TrafficRecorder,
+    LINK_DOWNSTREAM,
+    DIR_RX,
+    DIR_TX,
+    OP_READ_REQ,
+    OP_READ_RSP,
+    OP_WRITE_REQ,
+    OP_WRITE_CMD,
+    OP_NOTIFY,
+    OP_INDICATE,
+)
+from btgattmitm.dbusobject.exception import FailedException
+from btgattmitm.dbusobject.bytesconv import to_bytes, to_dbus_bytes, HexData
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def to_hex_string(data):
-    if isinstance(data, bytes):
-        return data.hex()
-    return " ".join("0x{:02X}".format(x) for x in data)
+class WriteReply:
+    """Deferred reply to client write request.
+
+    Reply is sent when write pipeline completes the write or when timeout occurs.
+    All methods are called on D-Bus main loop, so reply is sent exactly once.
+    """
+
+    def __init__(self, reply_handler, error_handler):
+        self.reply_handler = reply_handler
+        self.error_handler = error_handler
+        self.request: WriteRequest = None
+        self.timer_id = None
+        self.sent = False
+
+    def send(self, error: BaseException = None):
+        if self.sent:
+            return
+        self.sent = True
+        if self.timer_id is not None:
+            GLib.source_remove(self.timer_id)
+            self.timer_id = None
+        if error is None:
+            self.reply_handler()
+        else:
+            self.error_handler(FailedException(str(error)))
 
 
 class CharacteristicMock(Characteristic):
     ## service - dbus service
     def __init__(
-        self, btCharacteristic: CharacteristicData, bus, index: int, service: Service, connector: ServiceConnector
+        self,
+        btCharacteristic: CharacteristicData,
+        bus,
+        index: int,
+        service: Service,
+        connector: ServiceConnector,
+        value_cache: ValueCache = None,
+        write_pipeline: WritePipeline = None,
+        traffic_recorder: TrafficRecorder = None,
     ):
         btUuid = btCharacteristic.uuid
         chUuid = str(btUuid)
@@ -73,6 +120,15 @@ class CharacteristicMock(Characteristic):
         ## instance of BluepyConnector
         self.connector: ServiceConnector = connector
         self.handler = cHandler
+        self.value_cache: ValueCache = value_cache
+        if self.value_cache is not None:
+            self.value_cache.register(self.handler, chUuid)
+        self.write_pipeline: WritePipeline = write_pipeline
+        if self.write_pipeline is not None:
+            self.write_pipeline.register(self.handler, chUuid)
+        self.traffic_recorder: TrafficRecorder = traffic_recorder
+
+        self._mock_descriptors(btCharacteristic, bus)
 
         ## subscribe for notifications
         if self.connector:
@@ -88,30 +144,112 @@ class CharacteristicMock(Characteristic):
     #     data = bytearray(data)
     #     _LOGGER.debug("Received char %s notification data: [%s]", chUuid, to_hex_string(data))
 
+    ## static descriptors are served locally, other ones (e.g. CCCD) are handled by BlueZ
+    def _mock_descriptors(self, btCharacteristic: CharacteristicData, bus):
+        descIndex = 0
+        for btDesc in btCharacteristic.getDescriptors():
+            if btDesc.uuid not in STATIC_DESCRIPTOR_UUIDS or btDesc.value is None:
+                continue
+            self.add_descriptor(DescriptorMock(btDesc, bus, descIndex, self))
+            descIndex += 1
+
     def readValueHandler(self):
         _LOGGER.debug("Client read request from %s", self.uuid)
+        self._record(DIR_RX, OP_READ_REQ)
+        if self.value_cache is not None:
+            data = self.value_cache.get(self.handler)
+            if data is not None:
+                _LOGGER.debug("Client reads from %s: cached data hex: %s", self.uuid, HexData(data))
+                self._record(DIR_TX, OP_READ_RSP, data)
+                return to_dbus_bytes(data)
         if self.connector is None:
             return None
         data = self.connector.read_characteristic(self.handler)
         # _LOGGER.debug("Got raw data: %s %s", data, type(data))
         # data = self._convert_data(data)
-        if isinstance(data, int):
-            data = [data]
-        _LOGGER.debug("Client reads from %s: data: %s hex: %s", self.uuid, repr(data), to_hex_string(data))
+        data = to_bytes(data)
+        if self.value_cache is not None:
+            self.value_cache.put(self.handler, data)
+        _LOGGER.debug("Client reads from %s: data: %r hex: %s", self.uuid, data, HexData(data))
+        self._record(DIR_TX, OP_READ_RSP, data)
+        return to_dbus_bytes(data)
+
+    ## write request is answered when device confirms it - D-Bus main loop does not wait meanwhile
+    def writeValueAsyncHandler(self, value, options, reply_handler, error_handler):
+        if self.write_pipeline is None or self._is_write_command(options):
+            super().writeValueAsyncHandler(value, options, reply_handler, error_handler)
+            return
+        data = self._receive_write(value, False)
+        reply = WriteReply(reply_handler, error_handler)
+
+        def write_completed(error):
+            ## called by pipeline thread
+            GLib.idle_add(self._write_completed, reply, error)
+
+        try:
+            reply.request = self.write_pipeline.submit_request(self.handler, data, write_completed)
+        except Exception as exc:
+            _LOGGER.error("unable to forward write to %s [%#x]: %s", self.uuid, self.handler, exc)
+            raise FailedException(str(exc)) from exc
+        timeout_ms = int(self.write_pipeline.timeout * 1000)
+        reply.timer_id = GLib.timeout_add(timeout_ms, self._write_timeout, reply)
+
+    def _write_completed(self, reply: WriteReply, error: BaseException):
+        if reply.sent:
+            ## client already got timeout error
+            return False
+        if error is not None:
+            _LOGGER.error("unable to forward write to %s [%#x]: %s", self.uuid, self.handler, error)
+        reply.send(error)
+        ## remove idle source
+        return False
+
+    def _write_timeout(self, reply: WriteReply):
+        ## source is removed by returning False
+        reply.timer_id = None
+        self.write_pipeline.cancel_request(reply.request)
+        _LOGGER.error("unable to forward write to %s [%#x]: timed out", self.uuid, self.handler)
+        reply.send(TimeoutError(f"write to handle {self.handler:#x} timed out"))
+        return False
+
+    def writeValueHandler(self, value, options=None):
+        write_command = self._is_write_command(options)
+        data = self._receive_write(value, write_command)
+        if self.write_pipeline is None:
+            return
+        try:
+            if write_command:
+                self.write_pipeline.write_command(self.handler, data)
+            else:
+                self.write_pipeline.write_request(self.handler, data)
+        except Exception as exc:
+            _LOGGER.error("unable to forward write to %s [%#x]: %s", self.uuid, self.handler, exc)
+            raise FailedException(str(exc)) from exc
+
+    ## records received write and returns its data
+    def _receive_write(self, value, write_command: bool) -> bytes:
+        ## value is received as 'dbus.ByteArray' - no conversion needed
+        data = to_bytes(value)
+        _LOGGER.debug("Client writes to %s [%#x]: data: %r hex: %s", self.uuid, self.handler, data, HexData(data))
+        self._record(DIR_RX, OP_WRITE_CMD if write_command else OP_WRITE_REQ, data)
+        if self.value_cache is not None:
+            self.value_cache.invalidate(self.handler)
         return data
 
-    def writeValueHandler(self, value):
-        ## convert 'dbus.Array' to bytes
-        data = bytes()
-        for val in value:
-            data += struct.pack("B", val)
-        _LOGGER.debug(
-            "Client writes to %s [%#x]: data: %s hex: %s", self.uuid, self.handler, repr(data), to_hex_string(data)
-        )
-        # TODO: implement write without return
+    def _is_write_command(self, options) -> bool:
+        write_type = None
+        if options:
+            write_type = options.get("type")
+        if write_type == "command":
+            return True
+        if write_type in ("request", "reliable"):
+            return False
+        ## type not given by BlueZ - deduce from characteristic flags
+        return "write" not in self.prop_flags and "write-without-response" in self.prop_flags
 
     def startNotifyHandler(self):
         ## notify has priority over indicate
+        ## upstream subscription is reference counted by connector, so CCCD is not written again
         if "notify" in self.prop_flags:
             _LOGGER.debug("Client registering for notifications on %s [%#x]", self.uuid, self.handler)
             if not self.connector:
@@ -121,31 +259,43 @@ class CharacteristicMock(Characteristic):
             _LOGGER.debug("Client registering for indications on %s [%#x]", self.uuid, self.handler)
             if not self.connector:
                 return
-            self.connector.subscribe_for_indication(self.handler, self.notification_callback)
+            self.connector.subscribe_for_indication(self.handler, self.indication_callback)
 
     def stopNotifyHandler(self):
-        if self.connector:
+        if not self.connector:
+            _LOGGER.debug("Client unregistered from notifications on %s [%#x]", self.uuid, self.handler)
+            return
+        if "notify" in self.prop_flags:
             ret = self.connector.unsubscribe_from_notification(self.handler, self.notification_callback)
-            _LOGGER.debug("Client unregistered from notifications on %s [%#x] %s", self.uuid, self.handler, ret)
         else:
-            _LOGGER.debug("Client unregistered from notifications on %s [%#x]", self.uuid, self.handler)
+            ret = self.connector.unsubscribe_from_indication(self.handler, self.indication_callback)
+        _LOGGER.debug("Client unregistered from notifications on %s [%#x] %s", self.uuid, self.handler, ret)
 
     def notification_callback(self, value):
-        _LOGGER.debug("Notification callback to client on %s data: %s", self.uuid, repr(value))
-        self.send_notification(value)
+        data = to_bytes(value)
+        _LOGGER.debug("Notification callback to client on %s data: %r", self.uuid, data)
+        if self.value_cache is not None:
+            self.value_cache.put(self.handler, data)
+        self._record(DIR_TX, OP_NOTIFY, data)
+        self.send_notification(data)
 
     def indication_callback(self, value):
-        _LOGGER.debug("Indication callback to client on %s data: %s", self.uuid, repr(value))
-        self.send_notification(value)
+        data = to_bytes(value)
+        _LOGGER.debug("Indication callback to client on %s data: %r", self.uuid, data)
+        if self.value_cache is not None:
+            self.value_cache.put(self.handler, data)
+        self._record(DIR_TX, OP_INDICATE, data)
+        self.send_notification(data)
 
     def send_notification(self, value):
-        vallist = []
-        for x in value:
-            vallist.append(dbus.Byte(x))
-        if not vallist:
+        if not value:
             _LOGGER.debug("Unable to notify empty list")
             return
-        self.PropertiesChanged(GATT_CHRC_IFACE, {"Value": vallist}, [])
+        self.PropertiesChanged(GATT_CHRC_IFACE, {"Value": to_dbus_bytes(value)}, [])
+
+    def _record(self, direction: int, opcode: int, data: bytes = None):
+        if self.traffic_recorder is not None:
+            self.traffic_recorder.record(LINK_DOWNSTREAM, direction, opcode, self.handler, data)
 
     def _convert_data(self, data):
         if isinstance(data, str):
@@ -154,22 +304,59 @@ class CharacteristicMock(Characteristic):
         return data
 
 
+class DescriptorMock(Descriptor):
+    def __init__(self, btDescriptor: DescriptorData, bus, index: int, characteristic: Characteristic):
+        _LOGGER.debug(
+            "Creating descriptor: %s[%s] h:%#x index:%#x",
+            btDescriptor.uuid,
+            btDescriptor.getCommonName(),
+            btDescriptor.getHandle(),
+            index,
+        )
+        Descriptor.__init__(self, bus, index, btDescriptor.uuid, ["read"], characteristic)
+        self.value: bytes = btDescriptor.value
+
+    def readValueHandler(self):
+        _LOGGER.debug("Client reads descriptor %s: data hex: %s", self.uuid, HexData(self.value))
+        return to_dbus_bytes(self.value)
+
+
 class ServiceMock(Service):
-    def __init__(self, btService: ServiceData, bus, index, connector: ServiceConnector):
+    def __init__(
+        self,
+        btService: ServiceData,
+        bus,
+        index,
+        connector: ServiceConnector,
+        value_cache: ValueCache = None,
+        write_pipeline: WritePipeline = None,
+        traffic_recorder: TrafficRecorder = None,
+        path_base: str = None,
+    ):
         btUuid = btService.uuid
         serviceUuid = str(btUuid)
 
         _LOGGER.debug("Creating service: %s[%s]", serviceUuid, btService.getCommonName())
 
-        Service.__init__(self, bus, index, serviceUuid, True)
+        Service.__init__(self, bus, index, serviceUuid, True, path_base)
 
-        self._mock_characteristics(btService, bus, connector)
+        self._mock_characteristics(btService, bus, connector, value_cache, write_pipeline, traffic_recorder)
 
-    def _mock_characteristics(self, btService: ServiceData, bus, connector: ServiceConnector):
+    def _mock_characteristics(
+        self,
+        btService: ServiceData,
+        bus,
+        connector: ServiceConnector,
+        value_cache: ValueCache = None,
+        write_pipeline: WritePipeline = None,
+        traffic_recorder: TrafficRecorder = None,
+    ):
         charsList: List[CharacteristicData] = btService.getCharacteristics()
         charIndex = 0
         for btCh in charsList:
-            char = CharacteristicMock(btCh, bus, charIndex, self, connector)
+            char = CharacteristicMock(
+                btCh, bus, charIndex, self, connector, value_cache, write_pipeline, traffic_recorder
+            )
             self.add_characteristic(char)
             charIndex += 1
 
@@ -217,16 +404,22 @@ class ServiceMock(Service):
 
 
 class ApplicationMock(Application):
-    def __init__(self, bus):
+    ## path - D-Bus path of application (see 'get_session_path')
+    ## adapter - name of adapter to register application on (e.g. hci0), None means any adapter
+    def __init__(self, bus, path: str = None, adapter: str = None):
         self.bus = bus
+        self.adapter = adapter
         self.gattManager = None
+        ## called when device indicates change of services
+        self.service_changed_handler: Callable[[], None] = None
 
-        Application.__init__(self, self.bus)
-
-        self._initManager()
+        Application.__init__(self, self.bus, path)
 
-    def _initManager(self):
-        gatt_adapter = find_gatt_adapter(self.bus)
+    ## find GATT manager of adapter
+    def initialize(self):
+        if self.gattManager is not None:
+            return
+        gatt_adapter = find_gatt_adapter(self.bus, self.adapter)
         if not gatt_adapter:
             _LOGGER.error("GattManager1 interface not found")
             return
@@ -234,12 +427,22 @@ class ApplicationMock(Application):
         gattObj = self.bus.get_object(BLUEZ_SERVICE_NAME, gatt_adapter)
         self.gattManager = dbus.Interface(gattObj, GATT_MANAGER_IFACE)
 
-    def configure_services(self, service_list: List[ServiceData], connector: ServiceConnector):
+    def configure_services(
+        self,
+        service_list: List[ServiceData],
+        connector: ServiceConnector,
+        value_cache: ValueCache = None,
+        write_pipeline: WritePipeline = None,
+        traffic_recorder: TrafficRecorder = None,
+    ):
         _LOGGER.info("Mocking services")
         if service_list is None:
             _LOGGER.warning("Could not get list of services")
             return False
 
+        if connector:
+            connector.set_services(service_list)
+
         serviceIndex = -1
         for serv in service_list:
             uuid = serv.uuid
@@ -251,7 +454,16 @@ class ApplicationMock(Application):
                 _LOGGER.debug("Skipping service: %s", uuid)
                 continue
             serviceIndex += 1
-            service = ServiceMock(serv, self.bus, serviceIndex, connector)
+            service = ServiceMock(
+                serv,
+                self.bus,
+                serviceIndex,
+                connector,
+                value_cache,
+                write_pipeline,
+                traffic_recorder,
+                path_base=self.path + "/service",
+            )
             self.add_service(service)
 
         ## subscribing for "Service Changed" indication
@@ -265,10 +477,13 @@ class ApplicationMock(Application):
 
         return True
 
-    def _service_changed_callback(self):
+    def _service_changed_callback(self, _data=None):
         _LOGGER.info("Service changed!!!")
+        if self.service_changed_handler is not None:
+            self.service_changed_handler()
 
     def register(self):
+        self.initialize()
         if self.gattManager is None:
             return
         _LOGGER.info("Registering application")
@@ -30,6 +30,8 @@ import re
 
 from btgattmitm.connector import AdvertisementData
 from btgattmitm.advertisementmanager import AdvertisementManager
+from btgattmitm.hcitool.hcisocket import HciSocket, hex_list_to_bytes, get_status_name
+from btgattmitm.adapters import get_inventory
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -65,42 +67,20 @@ def get_hci_ifaces() -> List[List[str]]:
 
 ## get device name (eg. hci0) using MAC address
 def find_hci_iface_by_mac(mac_address) -> str:
-    name_mac_list: List[List[str]] = get_hci_ifaces()
-    if len(name_mac_list) < 1:
-        _LOGGER.warning("no devices found")
+    adapter = get_inventory().find_by_address(mac_address)
+    if adapter is None:
+        _LOGGER.warning("unable to find device by MAC")
         return None
-
-    mac_address = mac_address.replace("-", ":")
-
-    for item in name_mac_list:
-        if not item:
-            continue
-        if item[1] == mac_address:
-            return item[0]
-
-    _LOGGER.warning("unable to find device by MAC")
-    return None
+    return adapter.name
 
 
 ## get MAC address using device name (eg. 0 for hci0)
 def find_mac_by_hci_iface(hci_iface_index: int) -> str:
-    name_mac_list: List[List[str]] = get_hci_ifaces()
-    if len(name_mac_list) < 1:
-        _LOGGER.warning("no devices found")
+    adapter = get_inventory().get_adapter(hci_iface_index)
+    if adapter is None or adapter.address is None:
+        _LOGGER.warning("unable to find device by hci name")
         return None
-
-    dev_name = f"hci{hci_iface_index}"
-
-    for item in name_mac_list:
-        if not item:
-            continue
-        if item[0] == dev_name:
-            found_mac = item[1]
-            found_mac = found_mac.replace("-", ":")
-            return found_mac
-
-    _LOGGER.warning("unable to find device by hci name")
-    return None
+    return adapter.address
 
 
 def parse_hcitool_output_status(output: str):
@@ -134,14 +114,18 @@ def parse_hcitool_output_status(output: str):
 class Advertiser:
 
     def __init__(self, hci_iface_index: int):
+        self.iface_index = hci_iface_index
         self.iface = f"hci{hci_iface_index}"
         self.adv_data = AdvertisementData()
         self.scanresp_data = AdvertisementData()
         self.sudo_mode = False
+        ## native HCI socket, if not available then 'hcitool' is used
+        self.hci: HciSocket = None
 
     def advertise(self) -> bool:
         try:
             _LOGGER.info("Starting advertisement")
+            self._open_hci()
 
             ### causes disconnection from device
             # cmd_list = []
@@ -205,6 +189,13 @@ class Advertiser:
 
     def stop(self):
         try:
+            ## disable advertisement
+            try:
+                self._run_hcitool_cmd(["0x08", "0x000A"], ["00"])
+            except (RuntimeError, OSError, subprocess.CalledProcessError) as exc:
+                ## e.g. advertisement already disabled
+                _LOGGER.warning("unable to disable advertisement: %s", exc)
+
             # Stop advertising
             cmd_list = []
             if self.sudo_mode:
@@ -229,12 +220,49 @@ class Advertiser:
             _LOGGER.exception("exception occur during advertisement stop")
             return False
 
+        finally:
+            ## socket is used by stop commands
+            if self.hci is not None:
+                self.hci.close()
+                self.hci = None
+
+    def _open_hci(self) -> bool:
+        if self.hci is not None:
+            return True
+        hci = HciSocket(self.iface_index)
+        try:
+            hci.open()
+        except OSError as exc:
+            _LOGGER.info("unable to open HCI socket (%s), using 'hcitool'", exc)
+            return False
+        self.hci = hci
+        return True
+
     def _run_hcitool_cmd(self, cmd_bytes, data_list: List[str] = None) -> bool:
         if data_list is None:
             data_list = []
 
-        status_byte = None
+        if self.hci is not None:
+            ogf = int(cmd_bytes[0], 16)
+            ocf = int(cmd_bytes[1], 16)
+            _LOGGER.info("sending HCI command: %s %s", " ".join(cmd_bytes), " ".join(data_list))
+            response = self.hci.send_command(ogf, ocf, hex_list_to_bytes(data_list))
+            status = response.status
+        else:
+            status = self._run_hcitool_process(cmd_bytes, data_list)
+            if status is None:
+                return False
 
+        if status == 0x00:
+            _LOGGER.info("got status: %s 0x%02X", get_status_name(status), status)
+        else:
+            _LOGGER.error("got status: %s 0x%02X", get_status_name(status), status)
+            raise RuntimeError(f"command failed with status: 0x{status:02X}")
+
+        return True
+
+    ## returns status of command or None if status could not be read
+    def _run_hcitool_process(self, cmd_bytes, data_list: List[str]) -> int:
         try:
             cmd_list = []
             if self.sudo_mode:
@@ -251,38 +279,16 @@ class Advertiser:
                 check=True,
             )
 
-            status_byte = parse_hcitool_output_status(result.stdout)
-            if status_byte is None:
-                return False
-
         except subprocess.CalledProcessError as exc:
             message = exc.stderr.strip()
             _LOGGER.error("error while running command: %s, reason: %s", cmd_list, message)
             _LOGGER.warning("in case of lack of privileges try running program with --sudo option")
             raise
 
-        status = int(status_byte, 16)
-
-        meaning = ""
-        if status == 0x00:
-            meaning = "Success"
-        elif status == 0x0C:
-            meaning = "Command Disallowed"
-
-        if status == 0x00:
-            if meaning:
-                _LOGGER.info("got status: %s 0x%s", meaning, status_byte)
-            else:
-                _LOGGER.info("got status: 0x%s", status_byte)
-        else:
-            if meaning:
-                _LOGGER.error("got status: %s 0x%s", meaning, status_byte)
-            else:
-                _LOGGER.error("got status: 0x%s", status_byte)
-
-            raise RuntimeError(f"command failed with status: 0x{status_byte}")
-
-        return True
+        status_byte = parse_hcitool_output_status(result.stdout)
+        if status_byte is None:
+            return None
+        return int(status_byte, 16)
 
 
 class AdvertisementDataBuilder:
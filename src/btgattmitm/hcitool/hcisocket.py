@@ -0,0 +1,237 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Raw HCI command channel (the same interface used by 'hcitool cmd').
+
+Commands are sent as binary packets over AF_BLUETOOTH socket bound to HCI_CHANNEL_RAW
+of given adapter. Socket filter passes only Command Complete and Command Status events.
+Sending commands requires CAP_NET_RAW capability.
+"""
+
+import logging
+import socket
+import struct
+import threading
+import time
+from typing import List
+
+from btgattmitm.synchronized import synchronized
+from btgattmitm.btmgmt.mgmtsocket import AF_BLUETOOTH, BTPROTO_HCI, bind_hci_channel, mac_to_bytes
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+HCI_CHANNEL_RAW = 0
+
+SOL_HCI = 0
+HCI_FILTER = 2
+
+HCI_COMMAND_PKT = 0x01
+HCI_EVENT_PKT = 0x04
+
+HCI_EV_CMD_COMPLETE = 0x0E
+HCI_EV_CMD_STATUS = 0x0F
+
+## LE controller commands
+OGF_LE_CTL = 0x08
+OCF_LE_SET_ADVERTISING_PARAMETERS = 0x0006
+OCF_LE_SET_ADVERTISING_DATA = 0x0008
+OCF_LE_SET_SCAN_RESPONSE_DATA = 0x0009
+OCF_LE_SET_ADVERTISE_ENABLE = 0x000A
+OCF_LE_SET_ADVERTISING_SET_RANDOM_ADDRESS = 0x0035
+
+HCI_STATUS_SUCCESS = 0x00
+
+HCI_STATUS_NAMES = {
+    0x00: "Success",
+    0x01: "Unknown HCI Command",
+    0x02: "Unknown Connection Identifier",
+    0x03: "Hardware Failure",
+    0x07: "Memory Capacity Exceeded",
+    0x0C: "Command Disallowed",
+    0x11: "Unsupported Feature or Parameter Value",
+    0x12: "Invalid HCI Command Parameters",
+}
+
+
+def get_status_name(status: int) -> str:
+    return HCI_STATUS_NAMES.get(status, f"0x{status:02X}")
+
+
+def make_opcode(ogf: int, ocf: int) -> int:
+    return (ogf << 10) | ocf
+
+
+## convert list of hex strings (as passed to 'hcitool cmd', e.g. ["0x1F", "02", "01"]) to bytes
+def hex_list_to_bytes(data_list: List[str]) -> bytes:
+    return bytes(int(item, 16) for item in data_list)
+
+
+## =============================================================
+
+
+class HciError(Exception):
+    def __init__(self, opcode: int, status: int):
+        super().__init__(f"HCI command 0x{opcode:04X} failed with status: {get_status_name(status)}")
+        self.opcode = opcode
+        self.status = status
+
+
+class HciResponse:
+    def __init__(self, event: int, opcode: int, status: int, data: bytes = b""):
+        self.event = event  ## HCI_EV_CMD_COMPLETE or HCI_EV_CMD_STATUS
+        self.opcode = opcode
+        self.status = status
+        self.data = data  ## return parameters following status byte
+
+    def is_success(self) -> bool:
+        return self.status == HCI_STATUS_SUCCESS
+
+    def __repr__(self):
+        return (
+            f"HciResponse(event=0x{self.event:02X}, opcode=0x{self.opcode:04X},"
+            f" status={get_status_name(self.status)}, data={self.data.hex()})"
+        )
+
+
+class HciSocket:
+    """Persistent raw HCI socket of single adapter."""
+
+    def __init__(self, dev_index: int, sock=None, timeout: float = 5.0):
+        self.dev_index = dev_index
+        ## 'sock' allows to pass already opened socket (or fake one in tests)
+        self._sock = sock
+        self.timeout = timeout
+        self._methods_lock = threading.RLock()
+
+    def open(self):
+        if self._sock is not None:
+            return
+        sock = socket.socket(AF_BLUETOOTH, socket.SOCK_RAW | socket.SOCK_CLOEXEC, BTPROTO_HCI)
+        try:
+            ## hci_ufilter: type mask, event mask, opcode
+            event_mask = (1 << HCI_EV_CMD_COMPLETE) | (1 << HCI_EV_CMD_STATUS)
+            hci_filter = struct.pack("<IIIH", 1 << HCI_EVENT_PKT, event_mask, 0, 0)
+            sock.setsockopt(SOL_HCI, HCI_FILTER, hci_filter)
+            bind_hci_channel(sock, self.dev_index, HCI_CHANNEL_RAW)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def close(self):
+        if self._sock is None:
+            return
+        self._sock.close()
+        self._sock = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    ## ======================================================
+
+    def le_set_advertising_parameters(self, params: bytes):
+        return self.execute(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_PARAMETERS, params)
+
+    ## 'data' contains advertising structures (without length prefix)
+    def le_set_advertising_data(self, data: bytes):
+        return self.execute(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_DATA, _pad_adv_data(data))
+
+    def le_set_scan_response_data(self, data: bytes):
+        return self.execute(OGF_LE_CTL, OCF_LE_SET_SCAN_RESPONSE_DATA, _pad_adv_data(data))
+
+    def le_set_advertise_enable(self, enabled: bool):
+        return self.execute(OGF_LE_CTL, OCF_LE_SET_ADVERTISE_ENABLE, struct.pack("<B", int(enabled)))
+
+    def le_set_advertising_set_random_address(self, adv_handle: int, mac_address: str):
+        params = struct.pack("<B", adv_handle) + mac_to_bytes(mac_address)
+        return self.execute(OGF_LE_CTL, OCF_LE_SET_ADVERTISING_SET_RANDOM_ADDRESS, params)
+
+    ## ======================================================
+
+    ## send command and raise HciError if command failed
+    def execute(self, ogf: int, ocf: int, params: bytes = b"") -> HciResponse:
+        response = self.send_command(ogf, ocf, params)
+        if not response.is_success():
+            raise HciError(response.opcode, response.status)
+        return response
+
+    @synchronized
+    def send_command(self, ogf: int, ocf: int, params: bytes = b"") -> HciResponse:
+        if self._sock is None:
+            raise ConnectionError("HCI socket is not opened")
+        opcode = make_opcode(ogf, ocf)
+        packet = struct.pack("<BHB", HCI_COMMAND_PKT, opcode, len(params)) + params
+        _LOGGER.debug("HCI command: 0x%04X params: %s", opcode, params.hex())
+        self._sock.send(packet)
+        return self._wait_response(opcode)
+
+    def _wait_response(self, opcode: int) -> HciResponse:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"no response for HCI command 0x{opcode:04X}")
+            self._sock.settimeout(remaining)
+            try:
+                packet = self._sock.recv(260)
+            except socket.timeout as exc:
+                raise TimeoutError(f"no response for HCI command 0x{opcode:04X}") from exc
+            response = parse_event(packet)
+            if response is None:
+                continue
+            if response.opcode == opcode:
+                _LOGGER.debug("HCI response: %s", response)
+                return response
+            ## response of command sent by other process (e.g. bluetoothd)
+            _LOGGER.debug("skipping HCI response: %s", response)
+
+
+## returns response or None if packet is not Command Complete nor Command Status event
+def parse_event(packet: bytes) -> HciResponse:
+    if len(packet) < 3 or packet[0] != HCI_EVENT_PKT:
+        return None
+    event = packet[1]
+    params = packet[3 : 3 + packet[2]]
+    if event == HCI_EV_CMD_COMPLETE and len(params) >= 4:
+        ## number of allowed packets, opcode, return parameters (starting with status)
+        (opcode,) = struct.unpack_from("<H", params, 1)
+        return HciResponse(event, opcode, params[3], params[4:])
+    if event == HCI_EV_CMD_STATUS and len(params) >= 4:
+        ## status, number of allowed packets, opcode
+        (opcode,) = struct.unpack_from("<H", params, 2)
+        return HciResponse(event, opcode, params[0])
+    return None
+
+
+## advertising data parameter: significant length followed by 31 bytes of data
+def _pad_adv_data(data: bytes) -> bytes:
+    if len(data) > 31:
+        raise ValueError(f"advertising data too long: {len(data)}")
+    return struct.pack("<B", len(data)) + data.ljust(31, b"\0")
@@ -0,0 +1,193 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Logging configuration.
+
+In queue mode logging threads only put records to bounded queue. Formatting and
+writing to console and file is done by listener thread. When queue is full
+records are dropped (and counted) instead of blocking the caller.
+"""
+
+import logging
+import logging.handlers
+from typing import Dict, List
+
+import sys
+import queue
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+LOG_FORMAT = "%(asctime)s,%(msecs)-3d %(levelname)-8s %(threadName)s [%(filename)s:%(lineno)d] %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+## loggers belonging to subsystems, more specific loggers have to be placed later
+SUBSYSTEM_LOGGERS: Dict[str, List[str]] = {
+    "connector": [
+        "btgattmitm.connector",
+        "btgattmitm.bluepyconnector",
+        "btgattmitm.bleakconnector",
+        "btgattmitm.upstream",
+        "btgattmitm.writepipeline",
+        "bleak",
+    ],
+    "gattmock": [
+        "btgattmitm.gattmock",
+        "btgattmitm.valuecache",
+        "btgattmitm.dbusobject",
+    ],
+    "advertisement": [
+        "btgattmitm.advertisementmanager",
+        "btgattmitm.btmgmt",
+        "btgattmitm.hcitool",
+        "btgattmitm.dbusobject.advertisement",
+    ],
+}
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler never blocking the caller.
+
+    Message is formatted by listener thread, so arguments passed to logger have to be
+    immutable (or not modified after logging).
+    """
+
+    def __init__(self, max_size: int = 10000):
+        super().__init__(queue.Queue(max_size))
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord):
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Handlers of root logger."""
+
+    def __init__(self, handlers: List[logging.Handler], queue_size: int = 0):
+        self.handlers = handlers
+        self.queue_handler: BoundedQueueHandler = None
+        self.listener: logging.handlers.QueueListener = None
+        if queue_size > 0:
+            self.queue_handler = BoundedQueueHandler(queue_size)
+            self.listener = logging.handlers.QueueListener(
+                self.queue_handler.queue, *self.handlers, respect_handler_level=True
+            )
+
+    def get_root_handlers(self) -> List[logging.Handler]:
+        if self.queue_handler is not None:
+            return [self.queue_handler]
+        return self.handlers
+
+    def get_dropped(self) -> int:
+        if self.queue_handler is None:
+            return 0
+        return self.queue_handler.dropped
+
+    def start(self):
+        if self.listener is not None:
+            self.listener.start()
+
+    def stop(self):
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.listener = None
+        dropped = self.get_dropped()
+        if dropped > 0:
+            ## listener is stopped - pass directly to handlers
+            record = logging.LogRecord(
+                __name__, logging.WARNING, __file__, 0, "dropped log records: %s", (dropped,), None
+            )
+            for handler in self.handlers:
+                handler.handle(record)
+
+
+def parse_levels(levels_list: List[str]) -> Dict[str, int]:
+    """Convert list of 'subsystem=LEVEL' items to dict."""
+    ret_dict: Dict[str, int] = {}
+    if not levels_list:
+        return ret_dict
+    for item in levels_list:
+        subsystem, _, level_name = item.partition("=")
+        subsystem = subsystem.strip()
+        if subsystem not in SUBSYSTEM_LOGGERS:
+            raise ValueError(f"unknown logging subsystem: {subsystem}")
+        level = logging.getLevelName(level_name.strip().upper())
+        if not isinstance(level, int):
+            raise ValueError(f"invalid logging level: {item}")
+        ret_dict[subsystem] = level
+    return ret_dict
+
+
+def set_subsystem_levels(levels_dict: Dict[str, int]):
+    for subsystem, loggers_list in SUBSYSTEM_LOGGERS.items():
+        level = levels_dict.get(subsystem)
+        if level is None:
+            continue
+        for logger_name in loggers_list:
+            logging.getLogger(logger_name).setLevel(level)
+
+
+def configure_logging(
+    log_file: str,
+    max_bytes: int = 16 * 1024 * 1024,
+    backup_count: int = 5,
+    queue_size: int = 10000,
+    levels_dict: Dict[str, int] = None,
+) -> LogPipeline:
+    """Configure root logger. 'queue_size' equal 0 enables synchronous logging."""
+    formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
+
+    stream_handler = logging.StreamHandler(stream=sys.stdout)
+    stream_handler.setFormatter(formatter)
+    handlers: List[logging.Handler] = [stream_handler]
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            filename=log_file, maxBytes=max_bytes, backupCount=backup_count
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    pipeline = LogPipeline(handlers, queue_size)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.NOTSET)
+    for handler in pipeline.get_root_handlers():
+        root_logger.addHandler(handler)
+
+    logging.getLogger("asyncio").setLevel(logging.INFO)
+    logging.getLogger("bleak").setLevel(logging.INFO)
+    if levels_dict:
+        set_subsystem_levels(levels_dict)
+
+    pipeline.start()
+    return pipeline
@@ -22,7 +22,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 #
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple, Callable
 
 try:
     ## following import success only when file is directly executed from command line
@@ -39,17 +39,18 @@ import os
 import pprint
 
 import argparse
-import logging.handlers
+import logging
+import functools
 
-from btgattmitm import dataio
+from btgattmitm.logconfig import configure_logging, parse_levels, SUBSYSTEM_LOGGERS
 from btgattmitm.connector import AbstractConnector, ServiceData
+from btgattmitm.backends import CONNECTORS, ADVERTISERS, create_connector
+from btgattmitm.capture import TrafficRecorder, TrafficRecorderList, TrafficRing
+from btgattmitm.btsnoop import BtsnoopWriter
 
-# from btgattmitm.bleakconnector import BleakConnector
-from btgattmitm.bluepyconnector import BluepyConnector
-
-from btgattmitm.mitmmanager import MitmManager
-
-from btgattmitm.hcitool.advertisement import is_mac_address, find_hci_iface_by_mac, get_hci_ifaces
+from btgattmitm.hcitool.advertisement import is_mac_address, find_hci_iface_by_mac
+from btgattmitm.adapters import AdapterInfo, get_inventory
+from btgattmitm.supervisor import Supervisor, WorkerShard, parse_session_target, distribute_targets, make_shards
 
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -57,51 +58,27 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 _LOGGER = logging.getLogger(__name__)
 
 
-def configure_logger(logFile):
-    loggerFormat = "%(asctime)s,%(msecs)-3d %(levelname)-8s %(threadName)s [%(filename)s:%(lineno)d] %(message)s"
-    loggerDate = "%Y-%m-%d %H:%M:%S"
-
-    streamHandler = logging.StreamHandler(stream=sys.stdout)
-    fileHandler = logging.handlers.RotatingFileHandler(filename=logFile, maxBytes=1024 * 1024, backupCount=5)
-
-    if sys.version_info >= (3, 3):
-        #### for Python 3.3
-        logging.basicConfig(
-            format=loggerFormat, datefmt=loggerDate, level=logging.NOTSET, handlers=[streamHandler, fileHandler]
-        )
-    else:
-        #### for Python 2
-        rootLogger = logging.getLogger()
-        rootLogger.setLevel(logging.NOTSET)
-
-        logFormatter = logging.Formatter(loggerFormat, loggerDate)
-
-        streamHandler.setLevel(logging.NOTSET)
-        streamHandler.setFormatter(logFormatter)
-        rootLogger.addHandler(streamHandler)
-
-        fileHandler.setLevel(logging.NOTSET)
-        fileHandler.setFormatter(logFormatter)
-        rootLogger.addHandler(fileHandler)
-
-    asyncio_logger = logging.getLogger("asyncio")
-    asyncio_logger.setLevel(logging.INFO)
-
-    bleak_logger = logging.getLogger("bleak")
-    bleak_logger.setLevel(logging.INFO)
-
-
 def start_mitm(args: Dict[str, Any]):
     iface: int = args["iface"]  ## interface index of local device
     connectto: str = args["connectto"]  ## mac of device to connect to
     noconnect: bool = args["noconnect"]
     addrtype: str = args["addrtype"]  ## 'public' or 'random'
+    scantimeout: float = args["scantimeout"]
+    backend: str = args["backend"]
+    advertiser: str = args["advertiser"]
     advname: str = args["advname"]
     advserviceuuids: List[str] = args["advserviceuuids"]
     sudo_mode: bool = args["sudo"]
     change_mac: str = args["changemac"]
     devicestorepath: str = args["devicestorepath"]
     deviceloadpath: str = args["deviceloadpath"]
+    gattcachedir: str = args["gattcachedir"]
+
+    ## imported here - loads YAML, GLib and D-Bus
+    # pylint: disable=C0415
+    from btgattmitm import dataio
+    from btgattmitm.gattcache import GattCache
+    from btgattmitm.mitmmanager import MitmManager
 
     connection: AbstractConnector = None
     mitm_service: MitmManager = None
@@ -118,13 +95,23 @@ def start_mitm(args: Dict[str, Any]):
         elif change_mac == "True":
             change_mac = connectto
 
-        mitm_service = MitmManager(iface_index=iface, sudo_mode=sudo_mode, change_mac=change_mac)
+        mitm_service = MitmManager(
+            iface_index=iface, sudo_mode=sudo_mode, change_mac=change_mac, advertiser=advertiser
+        )
+
+        if gattcachedir:
+            mitm_service.set_gatt_cache(GattCache(gattcachedir))
+
+        traffic_recorder = create_traffic_recorder(args)
+        if traffic_recorder is not None:
+            mitm_service.set_traffic_recorder(traffic_recorder)
 
         if noconnect is False and connectto is not None:
             if addrtype is None:
                 addrtype = device_config.get("addrtype")
-            # connection = BleakConnector(btServiceAddress)
-            connection = BluepyConnector(connectto, iface=iface, address_type=addrtype)
+            connection = create_connector(
+                backend, connectto, iface=iface, address_type=addrtype, scan_timeout=scantimeout
+            )
         else:
             _LOGGER.info("Device connection skipped")
 
@@ -176,6 +163,155 @@ def start_mitm(args: Dict[str, Any]):
     return True
 
 
+## stats_handler - receives periodically statistics of sessions
+def start_sessions(args: Dict[str, Any], stats_handler: Callable[[Dict[str, Any]], None] = None):
+    iface: int = args["iface"]  ## default interface index
+    sessions: List[str] = args["sessions"]
+    scantimeout: float = args["scantimeout"]
+    backend: str = args["backend"]
+    advertiser: str = args["advertiser"]
+    sudo_mode: bool = args["sudo"]
+    gattcachedir: str = args["gattcachedir"]
+
+    ## imported here - loads YAML, GLib and D-Bus
+    # pylint: disable=C0415
+    from btgattmitm import dataio
+    from btgattmitm.gattcache import GattCache
+    from btgattmitm.multisession import MultiSessionManager
+
+    manager: MultiSessionManager = None
+    try:
+        manager = MultiSessionManager(sudo_mode=sudo_mode, advertiser=advertiser)
+        manager.stats_handler = stats_handler
+        if gattcachedir:
+            manager.set_gatt_cache(GattCache(gattcachedir))
+        traffic_recorder = create_traffic_recorder(args)
+        if traffic_recorder is not None:
+            manager.set_traffic_recorder(traffic_recorder)
+
+        for session_item in sessions:
+            target, session_iface = parse_session_target(session_item)
+            if session_iface is None:
+                session_iface = iface
+            else:
+                session_iface = find_iface_index(session_iface)
+                if session_iface is None:
+                    _LOGGER.error("unable to found adapter of session %s", session_item)
+                    return False
+
+            device_config: Dict[str, Any] = {}
+            if is_mac_address(target):
+                connectto = target
+            else:
+                device_config = dataio.load_from(target)
+                connectto = device_config.get("connectto")
+
+            connection: AbstractConnector = None
+            if connectto is not None:
+                connection = create_connector(
+                    backend,
+                    connectto,
+                    iface=session_iface,
+                    address_type=device_config.get("addrtype"),
+                    scan_timeout=scantimeout,
+                )
+            session = manager.add_session(target, session_iface, connection, device_config)
+            advname = device_config.get("advname")
+            if advname and session.manager.advertisement:
+                session.manager.advertisement.set_local_name(advname)
+
+        valid = manager.configure()
+        if valid is False:
+            _LOGGER.error("unable to configure sessions")
+            return False
+
+        ## start advertisement and notification listening
+        manager.start()
+
+    finally:
+        _LOGGER.info("disconnecting sessions")
+        if manager is not None:
+            manager.stop()
+        _LOGGER.info("application end")
+
+    return True
+
+
+def start_supervisor(args: Dict[str, Any]):
+    sessions: List[str] = args["sessions"]
+    sessionsperworker: int = args["sessionsperworker"]
+
+    targets: List[Tuple[str, int]] = []
+    for session_item in sessions:
+        target, iface_data = parse_session_target(session_item)
+        session_iface = None
+        if iface_data is not None:
+            session_iface = find_iface_index(iface_data)
+            if session_iface is None:
+                _LOGGER.error("unable to found adapter of session %s", session_item)
+                return False
+        targets.append((target, session_iface))
+
+    adapters = [adapter.index for adapter in get_inventory().get_adapters() if adapter.is_le_supported()]
+    try:
+        targets_dict = distribute_targets(targets, adapters)
+    except ValueError as exc:
+        _LOGGER.error("unable to distribute sessions: %s", exc)
+        return False
+    shards = make_shards(targets_dict, sessionsperworker)
+
+    supervisor = Supervisor(
+        functools.partial(start_worker_sessions, args),
+        shards,
+        log_dir=os.getcwd(),
+        levels_dict=parse_levels(args["loglevel"]),
+    )
+    supervisor.start()
+    try:
+        supervisor.run()
+    finally:
+        supervisor.stop()
+    return True
+
+
+## executed in worker process of supervisor
+def start_worker_sessions(args: Dict[str, Any], shard: WorkerShard, stats_handler):
+    worker_args = dict(args)
+    worker_args["iface"] = shard.adapter_index
+    worker_args["sessions"] = [f"{target}@{shard.adapter_index}" for target in shard.targets]
+    ## separate capture files for each worker
+    for capture_arg in ("capturefile", "btsnoopfile"):
+        if worker_args.get(capture_arg):
+            worker_args[capture_arg] = f"{worker_args[capture_arg]}.{shard.name}"
+    return start_sessions(worker_args, stats_handler=stats_handler)
+
+
+## returns recorder of traffic capture or None if capture is disabled
+def create_traffic_recorder(args: Dict[str, Any]) -> TrafficRecorder:
+    capturefile: str = args["capturefile"]
+    capturesize: int = args["capturesize"]
+    btsnoopfile: str = args["btsnoopfile"]
+    btsnoopmaxsize: int = args["btsnoopmaxsize"]
+    btsnoopinterval: float = args["btsnoopinterval"]
+
+    recorders: List[TrafficRecorder] = []
+    if capturefile:
+        _LOGGER.info("Capturing traffic to %s", capturefile)
+        recorders.append(TrafficRing(capacity=capturesize, spill_path=capturefile))
+    if btsnoopfile:
+        _LOGGER.info("Writing btsnoop capture to %s", btsnoopfile)
+        btsnoop_writer = BtsnoopWriter(
+            btsnoopfile, max_bytes=btsnoopmaxsize * 1024 * 1024, rotate_interval=btsnoopinterval
+        )
+        btsnoop_writer.start()
+        recorders.append(btsnoop_writer)
+    if not recorders:
+        return None
+    if len(recorders) == 1:
+        return recorders[0]
+    return TrafficRecorderList(recorders)
+
+
 ## ========================================================================
 
 
@@ -208,6 +344,18 @@ def main():
         default="hci0",
         help="Local adapter to use: integer (eg. 0), device name (eg. hci0) or MAC address (eg. 00:11:22:33:44:55)",
     )
+    parser.add_argument(
+        "--backend",
+        choices=list(CONNECTORS.keys()),
+        default=list(CONNECTORS.keys())[0],
+        help="Library used to connect to device",
+    )
+    parser.add_argument(
+        "--advertiser",
+        choices=list(ADVERTISERS.keys()),
+        default=list(ADVERTISERS.keys())[0],
+        help="Method of advertising",
+    )
     parser.add_argument("--connectto", action="store", required=False, help="BT address to connect to")
     parser.add_argument(
         "--noconnect", action="store_const", const=True, default=False, help="Do not connect even if 'connectto' passed"
@@ -215,6 +363,12 @@ def main():
     parser.add_argument(
         "--addrtype", action="store", required=False, help="Address type to connect ('public' or 'random'"
     )
+    parser.add_argument(
+        "--scantimeout",
+        type=float,
+        default=10.0,
+        help="Maximum time in seconds of scanning device advertisement (scan stops earlier when data is received)",
+    )
     parser.add_argument("--advname", action="store", required=False, help="Device name to advertise (override device)")
     parser.add_argument(
         "--advserviceuuids",
@@ -240,13 +394,83 @@ def main():
         required=False,
         help="Load device configuration from file",
     )
+    parser.add_argument(
+        "--gattcachedir",
+        action="store",
+        required=False,
+        help="Directory of GATT services cache (skip services discovery on subsequent connections)",
+    )
+    parser.add_argument(
+        "--sessions",
+        nargs="+",
+        action="store",
+        required=False,
+        help="Proxy multiple devices in one process. Each item is device profile path or device address,"
+        " optionally followed by '@' and adapter (eg. profile.yaml@hci1)",
+    )
+    parser.add_argument(
+        "--supervise",
+        action="store_const",
+        const=True,
+        default=False,
+        help="Distribute sessions across available adapters and run them in worker processes",
+    )
+    parser.add_argument(
+        "--sessionsperworker",
+        type=int,
+        default=0,
+        help="Maximum number of sessions handled by single worker process (0 for no limit)",
+    )
+    parser.add_argument("--capturefile", action="store", required=False, help="Capture GATT traffic to file")
+    parser.add_argument(
+        "--capturesize",
+        type=int,
+        default=65536,
+        help="Number of records buffered in memory before writing to capture file",
+    )
+    parser.add_argument(
+        "--btsnoopfile", action="store", required=False, help="Write GATT traffic to btsnoop file (e.g. for Wireshark)"
+    )
+    parser.add_argument(
+        "--btsnoopmaxsize", type=int, default=64, help="Size in MB of btsnoop file triggering rotation (0 to disable)"
+    )
+    parser.add_argument(
+        "--btsnoopinterval", type=float, default=0, help="Time in seconds of btsnoop file rotation (0 to disable)"
+    )
+
+    parser.add_argument(
+        "--logqueuesize",
+        type=int,
+        default=10000,
+        help="Size of log records queue processed by background thread (0 for synchronous logging)",
+    )
+    parser.add_argument("--logmaxsize", type=int, default=16, help="Size in MB of log file triggering rotation")
+    parser.add_argument("--logbackups", type=int, default=5, help="Number of rotated log files to keep")
+    parser.add_argument(
+        "--loglevel",
+        nargs="*",
+        action="store",
+        required=False,
+        help=f"Log level of subsystems in form 'subsystem=LEVEL', subsystems: {', '.join(SUBSYSTEM_LOGGERS)}",
+    )
 
     args = parser.parse_args()
 
     logDir = os.getcwd()
     log_file = os.path.join(logDir, "log.txt")
 
-    configure_logger(log_file)
+    try:
+        levels_dict = parse_levels(args.loglevel)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    log_pipeline = configure_logging(
+        log_file,
+        max_bytes=args.logmaxsize * 1024 * 1024,
+        backup_count=args.logbackups,
+        queue_size=args.logqueuesize,
+        levels_dict=levels_dict,
+    )
 
     _LOGGER.debug("Starting the application")
     _LOGGER.debug("Logger log file: %s", log_file)
@@ -254,10 +478,9 @@ def main():
     exitCode = 0
 
     try:
-        name_mac_list: List[List[str]] = get_hci_ifaces()
-        if len(name_mac_list) == 1:
-            args.iface = name_mac_list[0][0]
-            args.iface = args.iface[3:]
+        adapter_list: List[AdapterInfo] = get_inventory().get_adapters()
+        if len(adapter_list) == 1:
+            args.iface = adapter_list[0].index
         else:
             args.iface = find_iface_index(args.iface)
             if args.iface is None:
@@ -267,7 +490,12 @@ def main():
         _LOGGER.info("Found adapter index: %s", args.iface)
 
         args_dict = vars(args)
-        valid = start_mitm(args_dict)
+        if args.sessions and args.supervise:
+            valid = start_supervisor(args_dict)
+        elif args.sessions:
+            valid = start_sessions(args_dict)
+        else:
+            valid = start_mitm(args_dict)
         if valid is False:
             exitCode = 1
 
@@ -278,6 +506,9 @@ def main():
         _LOGGER.error("Exception occured")
         raise
 
+    finally:
+        log_pipeline.stop()
+
     sys.exit(exitCode)
 
 
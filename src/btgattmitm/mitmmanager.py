@@ -16,11 +16,15 @@ import dbus.mainloop.glib
 
 from btgattmitm.connector import NotificationHandler, AbstractConnector, AdvertisementData, ServiceData
 from btgattmitm.gattmock import ApplicationMock
+from btgattmitm.dbusobject.application import get_session_path
 from btgattmitm.advertisementmanager import AdvertisementManager
-
-# from btgattmitm.dbusobject.advertisement import DBusAdvertisementManager
-# from btgattmitm.hcitool.advertisement import HciToolAdvertisementManager
-from btgattmitm.btmgmt.advertisement import BtmgmtAdvertisementManager
+from btgattmitm.valuecache import ValueCache
+from btgattmitm.writepipeline import WritePipeline
+from btgattmitm.capture import TrafficRecorder
+from btgattmitm.gattcache import GattCache
+from btgattmitm.startup import StartupPipeline
+from btgattmitm.backends import create_advertiser
+from btgattmitm.find_adapter import get_object_cache
 
 # from btgattmitm.dbusobject.agent import AgentManager
 
@@ -28,92 +32,131 @@ from btgattmitm.btmgmt.advertisement import BtmgmtAdvertisementManager
 _LOGGER = logging.getLogger(__name__)
 
 
-class MitmManager:
-    def __init__(self, iface_index: int = 0, sudo_mode=False, change_mac: str = None):
-        ## required for Python threading to work
-        GObject.threads_init()
-        dbus.mainloop.glib.threads_init()
-        dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+## prepare GLib main loop integration and connect to system bus
+def create_system_bus():
+    ## required for Python threading to work
+    GObject.threads_init()
+    dbus.mainloop.glib.threads_init()
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    return dbus.SystemBus()
+
 
+class MitmManager:
+    ## timeouts of startup stages in seconds
+    ## advertisement and services stages are extended by scan and connect timeouts of connector
+    APPLICATION_TIMEOUT = 10.0
+    ADVERTISEMENT_TIMEOUT = 20.0
+    SERVICES_TIMEOUT = 60.0
+
+    ## advertiser - name of advertiser backend (see 'backends.ADVERTISERS')
+    ## bus - shared bus connection (see 'create_system_bus'), if None then new connection is made
+    ## session_index - index of MITM session, sessions sharing the bus have to use different indexes
+    def __init__(
+        self,
+        iface_index: int = 0,
+        sudo_mode=False,
+        change_mac: str = None,
+        advertiser: str = "btmgmt",
+        bus=None,
+        session_index: int = 0,
+    ):
         _LOGGER.info("Initializing MITM manager")
 
         self.mainloop = None
 
-        self.bus = dbus.SystemBus()
+        self._own_bus = bus is None
+        if bus is None:
+            bus = create_system_bus()
+        self.bus = bus
 
         self._notificationHandler: NotificationHandler = None
 
-        self.gatt_application = ApplicationMock(self.bus)
+        self.gatt_application = ApplicationMock(
+            self.bus, path=get_session_path(session_index), adapter=f"hci{iface_index}"
+        )
+        self.value_cache: ValueCache = None
+        self.write_pipeline: WritePipeline = None
+        self.traffic_recorder: TrafficRecorder = None
+        self.gatt_cache: GattCache = None
+        self._connector: AbstractConnector = None
 
         self.advertisement: AdvertisementManager = None
-        self.advertisement = BtmgmtAdvertisementManager(iface_index, sudo_mode=sudo_mode, change_mac=change_mac)
-        # self.advertisement = HciToolAdvertisementManager(iface_index, sudo_mode=sudo_mode)
-        # self.advertisement = DBusAdvertisementManager(self.bus, iface_index)
+        self.advertisement = create_advertiser(
+            advertiser, self.bus, iface_index, sudo_mode=sudo_mode, change_mac=change_mac, session_index=session_index
+        )
 
         self.agent = None
         # self.agent = AgentManager(self.bus)
 
+    ## recorder have to be set before 'configure'
+    def set_traffic_recorder(self, recorder: TrafficRecorder):
+        self.traffic_recorder = recorder
+
+    ## cache have to be set before 'configure'
+    def set_gatt_cache(self, gatt_cache: GattCache):
+        self.gatt_cache = gatt_cache
+
+    ## timeouts of startup stages adjusted to time needed to scan and connect to device
+    def get_stage_timeouts(self, connector: AbstractConnector) -> Dict[str, float]:
+        scan_timeout = 0.0
+        connect_timeout = 0.0
+        if connector:
+            scan_timeout = connector.get_scan_timeout()
+            connect_timeout = connector.get_connect_timeout()
+        return {
+            "application": self.APPLICATION_TIMEOUT,
+            "advertisement": self.ADVERTISEMENT_TIMEOUT + scan_timeout,
+            "services": self.SERVICES_TIMEOUT + connect_timeout,
+        }
+
     def configure(self, connector: AbstractConnector, device_config: Dict[str, Any]):
-        """Configure MITM service."""
+        """Configure MITM service.
+
+        Advertisement, D-Bus application and GATT services are configured concurrently.
+        """
         _LOGGER.info("Configuring MITM")
+        self._connector = connector
+        timeouts = self.get_stage_timeouts(connector)
 
-        ## register advertisement
+        pipeline = StartupPipeline()
+        if self.gatt_application is not None:
+            pipeline.add_stage("application", self.gatt_application.initialize, timeouts["application"])
+
+        services_depends = []
         if self.advertisement is not None:
-            adv_data: AdvertisementData = None
-            scanresp_data: AdvertisementData = None
-            if device_config:
-                _LOGGER.info("Reading advertisement data from config")
-                adv_dict = device_config.get("advertisement", {})
-                adv_data = AdvertisementData(adv_dict)
-                self._configure_advertisement(adv_data)
-                scanresp_dict = device_config.get("scanresponse", {})
-                scanresp_data = AdvertisementData(scanresp_dict)
-                self._configure_scanresponse(scanresp_data)
-            elif connector:
-                _LOGGER.info("Reading advertisement data from device")
-                adv_props_dict: Dict[str, AdvertisementData] = connector.get_advertisement_data()
-                if adv_props_dict is not None:
-                    adv_data = adv_props_dict["adv"]
-                    _LOGGER.debug("Found advertisement data: %s", adv_data.get_props())
-                    self._configure_advertisement(adv_data)
-
-                    scanresp_data = adv_props_dict["scan"]
-                    _LOGGER.debug("Found scan response data: %s", scanresp_data.get_props())
-                    self._configure_scanresponse(scanresp_data)
-                else:
-                    _LOGGER.warning("Unable to configure advertisement - missing device properties")
-            else:
-                _LOGGER.warning("Unable to configure advertisement")
+            pipeline.add_stage(
+                "advertisement",
+                lambda: self._configure_advertising(connector, device_config),
+                timeouts["advertisement"],
+            )
+            if not device_config and connector:
+                ## device usually stops advertising when connected - connect after scan
+                services_depends.append("advertisement")
         else:
             _LOGGER.warning("Skipping advertisement")
 
-        ## register services
         if self.gatt_application is not None:
-            service_list: List[ServiceData] = None
-            if device_config:
-                _LOGGER.info("Reading GATT services data from config")
-                services_dict = device_config.get("services", {})
-                services_data = services_dict.values()
-                services_data = list(services_data)
-                service_list = ServiceData.prepare_from_config(services_data)
-                if connector:
-                    connector.connect()
-                valid = self.gatt_application.configure_services(service_list, connector)
-                if valid is False:
-                    _LOGGER.warning("unable to configure services")
-                    return False
-            elif connector:
-                _LOGGER.info("Reading GATT services data from device")
-                service_list = connector.get_services()
-                valid = self.gatt_application.configure_services(service_list, connector)
-                if valid is False:
-                    _LOGGER.warning("unable to connect to device")
-                    return False
-            else:
-                _LOGGER.warning("Unable to configure GATT services")
+            pipeline.add_stage(
+                "services",
+                lambda: self._configure_services(connector, device_config),
+                timeouts["services"],
+                depends=services_depends,
+            )
         else:
             _LOGGER.warning("Skipping GATT services")
 
+        pipeline.run()
+        pipeline.print_summary()
+
+        for stage_name in pipeline.stages:
+            try:
+                valid = pipeline.get_result(stage_name)
+            except Exception as exc:  # pylint: disable=W0703
+                _LOGGER.error("startup stage '%s' failed: %s", stage_name, exc)
+                return False
+            if valid is False:
+                return False
+
         ## configuring notification handler
         if self._notificationHandler is not None:
             self._notificationHandler.stop()
@@ -125,6 +168,85 @@ class MitmManager:
 
         return True
 
+    def _configure_advertising(self, connector: AbstractConnector, device_config: Dict[str, Any]):
+        adv_data: AdvertisementData = None
+        scanresp_data: AdvertisementData = None
+        if device_config:
+            _LOGGER.info("Reading advertisement data from config")
+            adv_dict = device_config.get("advertisement", {})
+            adv_data = AdvertisementData(adv_dict)
+            self._configure_advertisement(adv_data)
+            scanresp_dict = device_config.get("scanresponse", {})
+            scanresp_data = AdvertisementData(scanresp_dict)
+            self._configure_scanresponse(scanresp_data)
+        elif connector:
+            _LOGGER.info("Reading advertisement data from device")
+            adv_props_dict: Dict[str, AdvertisementData] = connector.get_advertisement_data()
+            if adv_props_dict is not None:
+                adv_data = adv_props_dict["adv"]
+                _LOGGER.debug("Found advertisement data: %s", adv_data.get_props())
+                self._configure_advertisement(adv_data)
+
+                scanresp_data = adv_props_dict["scan"]
+                _LOGGER.debug("Found scan response data: %s", scanresp_data.get_props())
+                self._configure_scanresponse(scanresp_data)
+            else:
+                _LOGGER.warning("Unable to configure advertisement - missing device properties")
+        else:
+            _LOGGER.warning("Unable to configure advertisement")
+        return True
+
+    def _configure_services(self, connector: AbstractConnector, device_config: Dict[str, Any]):
+        self.value_cache = ValueCache.from_config(device_config.get("readcache"))
+        if self.value_cache is not None:
+            _LOGGER.info("Characteristic read cache enabled")
+        if self.write_pipeline is not None:
+            self.write_pipeline.stop()
+            self.write_pipeline = None
+        if connector:
+            connector.set_traffic_recorder(self.traffic_recorder)
+            self.write_pipeline = WritePipeline.from_config(connector, device_config.get("writepipeline"))
+        service_list: List[ServiceData] = None
+        if device_config:
+            _LOGGER.info("Reading GATT services data from config")
+            services_dict = device_config.get("services", {})
+            services_data = services_dict.values()
+            services_data = list(services_data)
+            service_list = ServiceData.prepare_from_config(services_data)
+            if connector:
+                connector.connect()
+            valid = self.gatt_application.configure_services(
+                service_list, connector, self.value_cache, self.write_pipeline, self.traffic_recorder
+            )
+            if valid is False:
+                _LOGGER.warning("unable to configure services")
+                return False
+        elif connector:
+            _LOGGER.info("Reading GATT services data from device")
+            service_list = self._get_device_services(connector)
+            valid = self.gatt_application.configure_services(
+                service_list, connector, self.value_cache, self.write_pipeline, self.traffic_recorder
+            )
+            if valid is False:
+                _LOGGER.warning("unable to connect to device")
+                return False
+        else:
+            _LOGGER.warning("Unable to configure GATT services")
+        return True
+
+    def _get_device_services(self, connector: AbstractConnector) -> List[ServiceData]:
+        if self.gatt_cache is None:
+            return connector.get_services()
+        self.gatt_application.service_changed_handler = self._service_changed
+        return self.gatt_cache.get_services(connector)
+
+    def _service_changed(self):
+        if self.gatt_cache is None or self._connector is None:
+            return
+        ## cached services are outdated - will be discovered on next start
+        address_type = self.gatt_cache.get_address_type(self._connector)
+        self.gatt_cache.invalidate(self._connector.get_address(), address_type)
+
     def _configure_advertisement(self, adv_data: AdvertisementData):
         ## register advertisement
         if self.advertisement is None:
@@ -139,6 +261,14 @@ class MitmManager:
 
     ## configure services and start main loop
     def start(self):
+        self.register()
+
+        _LOGGER.debug("Starting main loop")
+        self.mainloop = GObject.MainLoop()
+        self.mainloop.run()
+
+    ## start advertisement and services without running main loop
+    def register(self):
         ## register advertisement
         if self.advertisement is not None:
             self.advertisement.initialize()
@@ -154,9 +284,8 @@ class MitmManager:
             _LOGGER.debug("Starting notification handler")
             self._notificationHandler.start()
 
-        _LOGGER.debug("Starting main loop")
-        self.mainloop = GObject.MainLoop()
-        self.mainloop.run()
+        if self.write_pipeline is not None:
+            self.write_pipeline.start()
 
     def stop(self):
         _LOGGER.debug("Stopping MITM")
@@ -169,6 +298,19 @@ class MitmManager:
         if self.gatt_application is not None:
             self.gatt_application.unregister()
 
+        if self._own_bus:
+            get_object_cache(self.bus).close()
+
+        if self.write_pipeline is not None:
+            self.write_pipeline.stop()
+            self.write_pipeline.print_stats()
+
+        if self.value_cache is not None:
+            self.value_cache.print_stats()
+
+        if self.traffic_recorder is not None:
+            self.traffic_recorder.close()
+
         self.mainloop = None
 
     def get_adv_config(self) -> Dict[int, Any]:
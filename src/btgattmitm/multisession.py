@@ -0,0 +1,219 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Multiple MITM sessions (proxied devices) in one process.
+
+Each session has own connector, D-Bus application and advertisement under namespaced
+paths. Bus connection, main loop and traffic capture are shared.
+"""
+
+import logging
+import threading
+import resource
+import functools
+from typing import Dict, Any, List, Callable
+
+from gi.repository import GObject, GLib
+
+from btgattmitm.connector import AbstractConnector
+from btgattmitm.mitmmanager import MitmManager, create_system_bus
+from btgattmitm.capture import TrafficRecorder, TrafficRecorderList, TrafficCounter, SessionRecorder
+from btgattmitm.gattcache import GattCache
+from btgattmitm.startup import StartupPipeline
+from btgattmitm.find_adapter import get_object_cache
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MitmSession:
+    def __init__(self, name: str, index: int, manager: MitmManager, connector: AbstractConnector, device_config):
+        self.name = name
+        self.index = index
+        self.manager = manager
+        self.connector = connector
+        self.device_config: Dict[str, Any] = device_config
+        self.counter = TrafficCounter()
+
+    def get_stats(self) -> Dict[str, Any]:
+        ret_stats = self.counter.get_stats()
+        if self.manager.write_pipeline is not None:
+            ret_stats["writepipeline"] = self.manager.write_pipeline.get_stats()
+        if self.manager.value_cache is not None:
+            ret_stats["readcache"] = self.manager.value_cache.get_stats()
+        return ret_stats
+
+
+class MultiSessionManager:
+    ## minimal timeout of configuring single session in seconds
+    SESSION_TIMEOUT = 120.0
+    ## interval in seconds of passing statistics to 'stats_handler'
+    STATS_INTERVAL = 10
+
+    def __init__(self, sudo_mode=False, advertiser: str = "btmgmt"):
+        _LOGGER.info("Initializing multi-session manager")
+        self.sudo_mode = sudo_mode
+        self.advertiser = advertiser
+        self.bus = create_system_bus()
+        self.mainloop = None
+        self.sessions: List[MitmSession] = []
+        ## shared by all sessions
+        self.traffic_recorder: TrafficRecorder = None
+        self.gatt_cache: GattCache = None
+        ## receives periodically result of 'get_stats' (e.g. to pass it to supervisor)
+        self.stats_handler: Callable[[Dict[str, Any]], None] = None
+
+    ## recorder have to be set before adding sessions
+    def set_traffic_recorder(self, recorder: TrafficRecorder):
+        self.traffic_recorder = recorder
+
+    ## cache have to be set before adding sessions
+    def set_gatt_cache(self, gatt_cache: GattCache):
+        self.gatt_cache = gatt_cache
+
+    def add_session(
+        self,
+        name: str,
+        iface_index: int,
+        connector: AbstractConnector,
+        device_config: Dict[str, Any],
+        change_mac: str = None,
+    ) -> MitmSession:
+        """Add proxied device.
+
+        Sessions on the same adapter share GATT database of the adapter, so clients connected
+        to any of them see services of all of them. Use separate adapters to isolate devices.
+        """
+        session_index = len(self.sessions)
+        manager = MitmManager(
+            iface_index=iface_index,
+            sudo_mode=self.sudo_mode,
+            change_mac=change_mac,
+            advertiser=self.advertiser,
+            bus=self.bus,
+            session_index=session_index,
+        )
+        session = MitmSession(name, session_index, manager, connector, device_config)
+        recorders: List[TrafficRecorder] = [session.counter]
+        if self.traffic_recorder is not None:
+            recorders.append(SessionRecorder(self.traffic_recorder, session_index))
+        manager.set_traffic_recorder(TrafficRecorderList(recorders))
+        if self.gatt_cache is not None:
+            manager.set_gatt_cache(self.gatt_cache)
+        self.sessions.append(session)
+        _LOGGER.info("Added session %s: %s on hci%s", session_index, name, iface_index)
+        return session
+
+    ## configure all sessions concurrently, returns False if any session failed
+    def configure(self) -> bool:
+        pipeline = StartupPipeline()
+        for session in self.sessions:
+            pipeline.add_stage(
+                session.name,
+                functools.partial(session.manager.configure, session.connector, session.device_config),
+                self._get_session_timeout(session),
+            )
+        pipeline.run()
+        pipeline.print_summary()
+
+        valid = True
+        for session in self.sessions:
+            try:
+                if pipeline.get_result(session.name) is False:
+                    _LOGGER.error("unable to configure session %s", session.name)
+                    valid = False
+            except Exception as exc:  # pylint: disable=W0703
+                _LOGGER.error("unable to configure session %s: %s", session.name, exc)
+                valid = False
+        return valid
+
+    ## register all sessions and run shared main loop
+    def start(self):
+        for session in self.sessions:
+            _LOGGER.info("Starting session %s", session.name)
+            session.manager.register()
+
+        if self.stats_handler is not None:
+            GLib.timeout_add_seconds(self.STATS_INTERVAL, self._send_stats)
+
+        _LOGGER.debug("Starting main loop")
+        self.mainloop = GObject.MainLoop()
+        self.mainloop.run()
+
+    def stop(self):
+        _LOGGER.debug("Stopping sessions")
+        for session in self.sessions:
+            session.manager.stop()
+            if session.connector is not None:
+                session.connector.disconnect()
+        self.print_stats()
+        self._send_stats()
+        get_object_cache(self.bus).close()
+        if self.traffic_recorder is not None:
+            self.traffic_recorder.close()
+        self.mainloop = None
+
+    ## ======================================================
+
+    def get_stats(self) -> Dict[str, Any]:
+        sessions_stats = {session.name: session.get_stats() for session in self.sessions}
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        process_stats = {
+            "sessions": len(self.sessions),
+            "threads": threading.active_count(),
+            "maxrss_kb": usage.ru_maxrss,
+            "cpu_time": usage.ru_utime + usage.ru_stime,
+        }
+        return {"sessions": sessions_stats, "process": process_stats}
+
+    ## session stages run concurrently, so sum of stage timeouts is upper bound of configuration time
+    def _get_session_timeout(self, session: MitmSession) -> float:
+        stage_timeouts = session.manager.get_stage_timeouts(session.connector)
+        return max(self.SESSION_TIMEOUT, sum(stage_timeouts.values()))
+
+    def _send_stats(self):
+        if self.stats_handler is not None:
+            self.stats_handler(self.get_stats())
+        ## keep GLib timer active
+        return True
+
+    def print_stats(self):
+        stats = self.get_stats()
+        for name, session_stats in stats["sessions"].items():
+            _LOGGER.info(
+                "session %s: records: %s bytes: %s throughput: %.1f B/s duration: %.1fs",
+                name,
+                session_stats["records"],
+                session_stats["bytes"],
+                session_stats["throughput"],
+                session_stats["duration"],
+            )
+        process_stats = stats["process"]
+        _LOGGER.info(
+            "process: sessions: %s threads: %s max RSS: %s kB CPU time: %.2fs",
+            process_stats["sessions"],
+            process_stats["threads"],
+            process_stats["maxrss_kb"],
+            process_stats["cpu_time"],
+        )
@@ -0,0 +1,137 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Concurrent execution of startup stages.
+
+Each stage runs in separate thread as soon as stages it depends on are finished
+(dependency only orders execution, failure of dependency does not cancel the stage).
+Each stage has own timeout counted from its start.
+"""
+
+import logging
+from typing import List, Dict, Any, Callable
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+
+import time
+import threading
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StartupStage:
+    def __init__(self, name: str, function: Callable[[], Any], timeout: float, depends: List[str]):
+        self.name = name
+        self.function = function
+        self.timeout = timeout
+        self.depends: List[str] = depends
+        self.future: Future = None
+        self.started: float = None
+        self.duration: float = None
+        self.finished = threading.Event()
+        self.timed_out = False
+
+
+class StartupPipeline:
+    def __init__(self):
+        self.stages: Dict[str, StartupStage] = {}
+        self.duration: float = None
+
+    def add_stage(self, name: str, function: Callable[[], Any], timeout: float, depends: List[str] = None):
+        if depends is None:
+            depends = []
+        for dependency in depends:
+            if dependency not in self.stages:
+                raise ValueError(f"unknown stage dependency: {dependency}")
+        self.stages[name] = StartupStage(name, function, timeout, depends)
+
+    def run(self):
+        """Execute stages and wait until all of them finish or time out."""
+        start_time = time.time()
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self.stages)), thread_name_prefix="Startup")
+        try:
+            for stage in self.stages.values():
+                stage.future = executor.submit(self._execute, stage)
+            self._wait_stages()
+        finally:
+            ## do not wait for timed out stages
+            executor.shutdown(wait=False)
+        self.duration = time.time() - start_time
+
+    def get_result(self, name: str) -> Any:
+        """Return result of stage. Raise exception thrown by stage or TimeoutError."""
+        stage = self.stages[name]
+        if stage.timed_out:
+            raise TimeoutError(f"startup stage '{name}' timed out after {stage.timeout}s")
+        return stage.future.result(timeout=0)
+
+    def print_summary(self):
+        for stage in self.stages.values():
+            if stage.timed_out:
+                _LOGGER.warning("startup stage '%s' timed out", stage.name)
+            elif stage.duration is not None:
+                _LOGGER.info("startup stage '%s' took %.3fs", stage.name, stage.duration)
+        if self.duration is not None:
+            _LOGGER.info("startup took %.3fs", self.duration)
+
+    ## =====================================================
+
+    def _execute(self, stage: StartupStage):
+        try:
+            for dependency in stage.depends:
+                self.stages[dependency].finished.wait()
+            stage.started = time.time()
+            _LOGGER.debug("starting startup stage '%s'", stage.name)
+            return stage.function()
+        finally:
+            if stage.started is not None:
+                stage.duration = time.time() - stage.started
+            stage.finished.set()
+
+    def _wait_stages(self):
+        pending = {stage.future: stage for stage in self.stages.values()}
+        while pending:
+            now = time.time()
+            next_deadline = None
+            for future, stage in list(pending.items()):
+                if future.done():
+                    del pending[future]
+                    continue
+                if stage.started is None:
+                    continue
+                deadline = stage.started + stage.timeout
+                if now >= deadline:
+                    stage.timed_out = True
+                    del pending[future]
+                    ## let dependent stages continue
+                    stage.finished.set()
+                    continue
+                if next_deadline is None or deadline < next_deadline:
+                    next_deadline = deadline
+            if not pending:
+                break
+            wait_time = 0.1
+            if next_deadline is not None:
+                wait_time = min(wait_time, max(0.0, next_deadline - now))
+            wait(list(pending.keys()), timeout=wait_time, return_when=FIRST_COMPLETED)
@@ -0,0 +1,339 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Supervisor of worker processes proxying devices on multiple adapters.
+
+Targets are distributed across adapters balancing number of connections and each group
+of targets (shard) is handled by separate worker process. Crashed workers are restarted
+and statistics of workers are passed to the supervisor over a pipe.
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.process
+from typing import Dict, Any, List, Tuple, Callable, Optional
+
+from btgattmitm.logconfig import configure_logging
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+## session_data - device profile path or device MAC address, optionally followed by '@' and adapter
+## returns pair: target, adapter (None if not given)
+def parse_session_target(session_data: str):
+    target, separator, iface_data = session_data.rpartition("@")
+    if not separator:
+        return session_data, None
+    return target, iface_data
+
+
+def distribute_targets(targets: List[Tuple[str, int]], adapters: List[int]) -> Dict[int, List[str]]:
+    """Assign targets to adapters.
+
+    'targets' is list of pairs: target and adapter index (None if any adapter can be used).
+    Targets with adapter keep it, remaining ones are assigned to adapter with the least connections.
+    """
+    ret_dict: Dict[int, List[str]] = {index: [] for index in adapters}
+    free_targets = []
+    for target, adapter_index in targets:
+        if adapter_index is None:
+            free_targets.append(target)
+            continue
+        ret_dict.setdefault(adapter_index, []).append(target)
+    if free_targets and not adapters:
+        raise ValueError("no adapters available")
+    for target in free_targets:
+        adapter_index = min(adapters, key=lambda index: (len(ret_dict[index]), index))
+        ret_dict[adapter_index].append(target)
+    return {index: items for index, items in ret_dict.items() if items}
+
+
+class WorkerShard:
+    def __init__(self, name: str, adapter_index: int, targets: List[str]):
+        self.name = name
+        self.adapter_index = adapter_index
+        self.targets = targets
+
+    def __repr__(self):
+        return f"WorkerShard({self.name}, hci{self.adapter_index}, {self.targets})"
+
+
+## sessions_per_worker - maximum number of targets handled by single worker (0 means no limit)
+def make_shards(targets_dict: Dict[int, List[str]], sessions_per_worker: int = 0) -> List[WorkerShard]:
+    ret_list = []
+    for adapter_index in sorted(targets_dict):
+        targets = targets_dict[adapter_index]
+        chunk_size = sessions_per_worker if sessions_per_worker > 0 else len(targets)
+        for chunk_index, offset in enumerate(range(0, len(targets), chunk_size)):
+            name = f"hci{adapter_index}-{chunk_index}"
+            ret_list.append(WorkerShard(name, adapter_index, targets[offset : offset + chunk_size]))
+    return ret_list
+
+
+## =============================================================
+
+
+## entry point of worker process
+def _worker_main(worker_target, shard: WorkerShard, conn, log_file: str, levels_dict: Dict[str, int]):
+    ## terminate request from supervisor handled as regular exit, so sessions are cleaned up
+    signal.signal(signal.SIGTERM, lambda _signum, _frame: sys.exit(0))
+
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    log_pipeline = configure_logging(log_file, queue_size=0, levels_dict=levels_dict)
+
+    def stats_handler(stats: Dict[str, Any]):
+        try:
+            conn.send((shard.name, stats))
+        except OSError:
+            ## supervisor ended
+            pass
+
+    exit_code = 0
+    try:
+        valid = worker_target(shard, stats_handler)
+        if valid is False:
+            exit_code = 1
+    except Exception:  # pylint: disable=W0703
+        _LOGGER.exception("worker %s failed", shard.name)
+        exit_code = 1
+    finally:
+        conn.close()
+        log_pipeline.stop()
+    sys.exit(exit_code)
+
+
+class WorkerHandle:
+    def __init__(self, shard: WorkerShard):
+        self.shard = shard
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.conn: Optional[multiprocessing.connection.Connection] = None
+        self.restarts = 0
+        ## number of crashes since last stable run
+        self.crashes = 0
+        self.start_time = 0.0
+        ## time of planned restart, None if not planned
+        self.restart_time: float = None
+        self.stats: Dict[str, Any] = {}
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class Supervisor:
+    ## delay of restart of crashed worker, doubled on each subsequent crash
+    RESTART_DELAY = 1.0
+    MAX_RESTART_DELAY = 60.0
+    ## worker running longer than this is considered stable - restart delay is reset
+    STABLE_TIME = 60.0
+
+    def __init__(
+        self,
+        worker_target: Callable[[WorkerShard, Callable[[Dict[str, Any]], None]], bool],
+        shards: List[WorkerShard],
+        log_dir: str = None,
+        levels_dict: Dict[str, int] = None,
+        stats_interval: float = 30.0,
+    ):
+        """Create supervisor.
+
+        'worker_target' is executed in worker process with shard and stats handler,
+        it has to be module level function (worker processes are spawned).
+        """
+        self.worker_target = worker_target
+        self.workers: List[WorkerHandle] = [WorkerHandle(shard) for shard in shards]
+        self.log_dir = log_dir
+        self.levels_dict = levels_dict
+        self.stats_interval = stats_interval
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = False
+
+    def start(self):
+        for worker in self.workers:
+            self._start_worker(worker)
+
+    def run(self, duration: float = None):
+        """Supervise workers until all workers finish, 'duration' elapses or interrupted."""
+        end_time = None if duration is None else time.monotonic() + duration
+        next_stats_time = time.monotonic() + self.stats_interval
+        try:
+            while not self._stopping:
+                now = time.monotonic()
+                if end_time is not None and now >= end_time:
+                    break
+                self._restart_pending(now)
+                ## process is released when worker finished, crashed worker has planned restart
+                if not any(worker.process is not None or worker.restart_time is not None for worker in self.workers):
+                    _LOGGER.info("all workers finished")
+                    break
+                if now >= next_stats_time:
+                    self.print_stats()
+                    next_stats_time = now + self.stats_interval
+                self._poll(0.2)
+        except KeyboardInterrupt:
+            _LOGGER.info("supervisor interrupted")
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping = True
+        for worker in self.workers:
+            worker.restart_time = None
+            if worker.is_alive():
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                _LOGGER.warning("worker %s did not stop - killing", worker.shard.name)
+                worker.process.kill()
+                worker.process.join()
+            self._receive_stats(worker)
+        self.print_stats()
+
+    ## ======================================================
+
+    def get_stats(self) -> Dict[str, Any]:
+        total: Dict[str, Any] = {"workers": len(self.workers), "alive": 0, "restarts": 0, "sessions": 0}
+        total.update({"records": 0, "bytes": 0, "throughput": 0.0})
+        workers_stats = {}
+        for worker in self.workers:
+            total["alive"] += int(worker.is_alive())
+            total["restarts"] += worker.restarts
+            sessions_stats = worker.stats.get("sessions", {})
+            total["sessions"] += len(sessions_stats)
+            for session_stats in sessions_stats.values():
+                total["records"] += session_stats.get("records", 0)
+                total["bytes"] += session_stats.get("bytes", 0)
+                total["throughput"] += session_stats.get("throughput", 0.0)
+            workers_stats[worker.shard.name] = {
+                "adapter": worker.shard.adapter_index,
+                "alive": worker.is_alive(),
+                "restarts": worker.restarts,
+                "stats": worker.stats,
+            }
+        return {"workers": workers_stats, "total": total}
+
+    def print_stats(self):
+        stats = self.get_stats()
+        for name, worker_stats in stats["workers"].items():
+            _LOGGER.info(
+                "worker %s: adapter: hci%s alive: %s restarts: %s",
+                name,
+                worker_stats["adapter"],
+                worker_stats["alive"],
+                worker_stats["restarts"],
+            )
+        total = stats["total"]
+        _LOGGER.info(
+            "total: workers: %s alive: %s restarts: %s sessions: %s records: %s bytes: %s throughput: %.1f B/s",
+            total["workers"],
+            total["alive"],
+            total["restarts"],
+            total["sessions"],
+            total["records"],
+            total["bytes"],
+            total["throughput"],
+        )
+
+    ## ======================================================
+
+    def _start_worker(self, worker: WorkerHandle):
+        parent_conn, child_conn = self._context.Pipe(duplex=False)
+        log_file = None
+        if self.log_dir:
+            log_file = os.path.join(self.log_dir, f"log-{worker.shard.name}.txt")
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self.worker_target, worker.shard, child_conn, log_file, self.levels_dict),
+            name=f"worker-{worker.shard.name}",
+            daemon=False,
+        )
+        process.start()
+        ## child end is used only by worker
+        child_conn.close()
+        worker.process = process
+        worker.conn = parent_conn
+        worker.start_time = time.monotonic()
+        worker.restart_time = None
+        _LOGGER.info("started worker %s (pid %s): %s", worker.shard.name, process.pid, worker.shard.targets)
+
+    def _poll(self, timeout: float):
+        wait_list: List[Any] = []
+        for worker in self.workers:
+            if worker.conn is not None:
+                wait_list.append(worker.conn)
+            if worker.is_alive():
+                wait_list.append(worker.process.sentinel)
+        if wait_list:
+            multiprocessing.connection.wait(wait_list, timeout)
+        else:
+            time.sleep(timeout)
+        for worker in self.workers:
+            self._receive_stats(worker)
+            if worker.process is not None and not worker.process.is_alive() and worker.restart_time is None:
+                self._handle_exit(worker)
+
+    def _receive_stats(self, worker: WorkerHandle):
+        if worker.conn is None:
+            return
+        try:
+            while worker.conn.poll():
+                _name, stats = worker.conn.recv()
+                worker.stats = stats
+        except (EOFError, OSError):
+            ## worker ended
+            worker.conn.close()
+            worker.conn = None
+
+    def _handle_exit(self, worker: WorkerHandle):
+        exit_code = worker.process.exitcode
+        if exit_code is None or self._stopping:
+            return
+        if exit_code == 0:
+            _LOGGER.info("worker %s finished", worker.shard.name)
+            worker.process = None
+            return
+        run_time = time.monotonic() - worker.start_time
+        if run_time >= self.STABLE_TIME:
+            worker.crashes = 0
+        delay = min(self.RESTART_DELAY * 2**worker.crashes, self.MAX_RESTART_DELAY)
+        worker.crashes += 1
+        _LOGGER.warning(
+            "worker %s crashed with exit code %s - restarting in %.1fs", worker.shard.name, exit_code, delay
+        )
+        worker.restart_time = time.monotonic() + delay
+
+    def _restart_pending(self, now: float):
+        for worker in self.workers:
+            if worker.restart_time is None or worker.restart_time > now:
+                continue
+            worker.restarts += 1
+            self._start_worker(worker)
@@ -0,0 +1,375 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Upstream I/O engine.
+
+Single thread owning connection to the device. Requests from other threads
+are passed through queue and executed between notification polls. If backend
+provides file descriptor then engine sleeps in 'poll' until the descriptor
+becomes readable or until new request is submitted.
+
+Queued requests are executed by priority class (client writes, then client reads,
+then background requests) and in submit order within class. Request with deadline
+fails without being executed if deadline passed while waiting in queue.
+"""
+
+import logging
+from typing import Dict, Any, Callable, List, Deque
+from collections import deque
+
+import time
+import queue
+import bisect
+import itertools
+import threading
+
+from btgattmitm.fdwait import WakeupFd, wait_readable
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+## priority classes of requests - lower value is executed first
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_BACKGROUND = 2
+
+PRIORITY_NAMES = {PRIORITY_WRITE: "write", PRIORITY_READ: "read", PRIORITY_BACKGROUND: "background"}
+
+
+class RequestExpiredError(TimeoutError):
+    """Deadline of request passed before request was executed."""
+
+
+class Histogram:
+    """Counts values in buckets given by upper bounds, last bucket counts values above all bounds."""
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    ## returns list of pairs: upper bound (None for last bucket) and count
+    def get_data(self) -> List:
+        upper_list = self.bounds + [None]
+        return list(zip(upper_list, self.counts))
+
+
+class LatencyStats:
+    """Keeps recent latency samples (in seconds) and calculates percentiles."""
+
+    def __init__(self, max_samples: int = 4096):
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+        self.max_value = 0.0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.max_value:
+            self.max_value = value
+
+    def percentile(self, percent: float) -> float:
+        if not self.samples:
+            return 0.0
+        sorted_list = sorted(self.samples)
+        index = int(round(percent / 100.0 * (len(sorted_list) - 1)))
+        return sorted_list[index]
+
+    def get_summary(self) -> Dict[str, Any]:
+        mean = 0.0
+        if self.count > 0:
+            mean = self.total / self.count
+        return {
+            "count": self.count,
+            "mean": mean,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max_value,
+        }
+
+
+class ClassStats:
+    """Statistics of priority class: queue depth seen by submitted requests and queue wait time."""
+
+    ## bounds of wait time buckets in seconds
+    WAIT_BOUNDS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0]
+    ## bounds of queue depth buckets
+    DEPTH_BOUNDS = [0, 1, 2, 4, 8, 16, 32]
+
+    def __init__(self):
+        self.depth = 0
+        self.max_depth = 0
+        self.expired = 0
+        self.depth_histogram = Histogram(self.DEPTH_BOUNDS)
+        self.wait_histogram = Histogram(self.WAIT_BOUNDS)
+        self.wait_stats = LatencyStats()
+
+    def get_data(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "expired": self.expired,
+            "depth_histogram": self.depth_histogram.get_data(),
+            "wait_histogram": self.wait_histogram.get_data(),
+            "queue_wait": self.wait_stats.get_summary(),
+        }
+
+
+class UpstreamRequest:
+    ## 'deadline' - time in seconds (relative to submit) after which request is not executed
+    def __init__(self, label: str, function: Callable, args, priority: int = PRIORITY_READ, deadline: float = None):
+        self.label = label
+        self.function = function
+        self.args = args
+        self.priority = priority
+        self.submit_time = time.perf_counter()
+        self.expire_time: float = None
+        if deadline is not None:
+            self.expire_time = self.submit_time + deadline
+        self.result = None
+        self.error: BaseException = None
+        self.done = threading.Event()
+
+    def wait(self, timeout: float = None):
+        if self.done.wait(timeout) is False:
+            raise TimeoutError(f"upstream request '{self.label}' timed out")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class UpstreamEngine(threading.Thread):
+    """Thread executing queued requests and polling for notifications in between.
+
+    'poll_function' is called with time slice (in seconds) it is allowed to block.
+    'fd_function' returns descriptor of backend (or None) to wait on when idle.
+    """
+
+    def __init__(
+        self,
+        poll_function: Callable[[float], Any],
+        poll_interval: float = 0.001,
+        name="UpstreamEngine",
+        fd_function: Callable[[], int] = None,
+    ):
+        threading.Thread.__init__(self, target=self._work, name=name)
+        self.daemon = True
+        self.poll_function = poll_function
+        self.poll_interval = poll_interval
+        self.fd_function = fd_function
+        self.execute = True
+        ## items: (priority, sequence number, request)
+        self._requests: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        ## guards enqueueing against cancelling pending requests on stop
+        self._submit_lock = threading.Lock()
+        self._wakeup = WakeupFd()
+        self._stats_lock = threading.Lock()
+        self._queue_wait: Dict[str, LatencyStats] = {}
+        self._service_time: Dict[str, LatencyStats] = {}
+        self._class_stats: Dict[int, ClassStats] = {priority: ClassStats() for priority in PRIORITY_NAMES}
+
+    def stop(self):
+        _LOGGER.info("Stopping upstream engine")
+        self.execute = False
+        self._wakeup.wake()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+        self._cancel_pending()
+        self._wakeup.close()
+
+    def submit(
+        self, label: str, function: Callable, *args, priority: int = PRIORITY_READ, deadline: float = None
+    ) -> UpstreamRequest:
+        request = UpstreamRequest(label, function, args, priority, deadline)
+        with self._submit_lock:
+            if self.execute is False:
+                request.error = RuntimeError("upstream engine stopped")
+                request.done.set()
+                return request
+            with self._stats_lock:
+                class_stats = self._class_stats[priority]
+                class_stats.depth_histogram.add(class_stats.depth)
+                class_stats.depth += 1
+                class_stats.max_depth = max(class_stats.max_depth, class_stats.depth)
+            self._requests.put((priority, next(self._sequence), request))
+        self._wakeup.wake()
+        return request
+
+    ## execute function on engine thread and wait for result
+    def execute_request(
+        self,
+        label: str,
+        function: Callable,
+        *args,
+        timeout: float = None,
+        priority: int = PRIORITY_READ,
+        deadline: float = None,
+    ):
+        if threading.current_thread() is self:
+            ## called from notification callback or from other request - execute directly
+            return function(*args)
+        request = self.submit(label, function, *args, priority=priority, deadline=deadline)
+        return request.wait(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            ret_data = {}
+            for label, wait_stats in self._queue_wait.items():
+                service_stats = self._service_time[label]
+                ret_data[label] = {
+                    "queue_wait": wait_stats.get_summary(),
+                    "service_time": service_stats.get_summary(),
+                }
+            return ret_data
+
+    ## returns statistics of priority classes
+    def get_class_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {PRIORITY_NAMES[priority]: stats.get_data() for priority, stats in self._class_stats.items()}
+
+    def print_stats(self):
+        stats = self.get_stats()
+        if not stats:
+            _LOGGER.info("upstream engine: no requests")
+            return
+        for label, data in stats.items():
+            wait_data = data["queue_wait"]
+            serv_data = data["service_time"]
+            _LOGGER.info(
+                "upstream %s: count: %s queue wait p50/p99: %.3f/%.3f ms service time p50/p99: %.3f/%.3f ms",
+                label,
+                wait_data["count"],
+                wait_data["p50"] * 1000.0,
+                wait_data["p99"] * 1000.0,
+                serv_data["p50"] * 1000.0,
+                serv_data["p99"] * 1000.0,
+            )
+        for name, data in self.get_class_stats().items():
+            wait_data = data["queue_wait"]
+            if wait_data["count"] == 0 and data["expired"] == 0:
+                continue
+            _LOGGER.info(
+                "upstream class %s: count: %s expired: %s max depth: %s queue wait p50/p99: %.3f/%.3f ms",
+                name,
+                wait_data["count"],
+                data["expired"],
+                data["max_depth"],
+                wait_data["p50"] * 1000.0,
+                wait_data["p99"] * 1000.0,
+            )
+
+    def _work(self):
+        try:
+            _LOGGER.info("Starting upstream engine")
+            while self.execute:
+                self._process_requests()
+                if self.execute is False:
+                    break
+                try:
+                    self._poll()
+                except:  # noqa    # pylint: disable=W0702
+                    _LOGGER.exception("Exception occurred while polling")
+                    self.execute = False
+        finally:
+            self._cancel_pending()
+            _LOGGER.info("Upstream engine run loop stopped")
+
+    def _poll(self):
+        backend_fd = None
+        if self.fd_function is not None:
+            backend_fd = self.fd_function()
+        if backend_fd is None:
+            self.poll_function(self.poll_interval)
+            return
+
+        ## sleep until notification arrives or request is submitted
+        wakeup_fd = self._wakeup.fileno()
+        ready_list = wait_readable([backend_fd, wakeup_fd])
+        if wakeup_fd in ready_list:
+            self._wakeup.clear()
+        if backend_fd in ready_list:
+            self.poll_function(self.poll_interval)
+
+    def _process_requests(self):
+        ## request with highest priority is taken each time, so requests submitted
+        ## while processing can overtake queued ones of lower priority
+        while True:
+            try:
+                _priority, _sequence, request = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            start_time = time.perf_counter()
+            if request.expire_time is not None and start_time > request.expire_time:
+                request.error = RequestExpiredError(f"upstream request '{request.label}' expired in queue")
+                request.done.set()
+                with self._stats_lock:
+                    class_stats = self._class_stats[request.priority]
+                    class_stats.depth -= 1
+                    class_stats.expired += 1
+                _LOGGER.warning("upstream request '%s' expired in queue", request.label)
+                continue
+            self._add_class_stats(request.priority, start_time - request.submit_time)
+            try:
+                request.result = request.function(*request.args)
+            except BaseException as exc:  # pylint: disable=W0718
+                request.error = exc
+            end_time = time.perf_counter()
+            request.done.set()
+            self._add_stats(request.label, start_time - request.submit_time, end_time - start_time)
+
+    def _add_class_stats(self, priority: int, wait_time: float):
+        with self._stats_lock:
+            class_stats = self._class_stats[priority]
+            class_stats.depth -= 1
+            class_stats.wait_histogram.add(wait_time)
+            class_stats.wait_stats.add(wait_time)
+
+    def _add_stats(self, label: str, wait_time: float, service_time: float):
+        with self._stats_lock:
+            wait_stats = self._queue_wait.get(label)
+            if wait_stats is None:
+                wait_stats = LatencyStats()
+                self._queue_wait[label] = wait_stats
+                self._service_time[label] = LatencyStats()
+            wait_stats.add(wait_time)
+            self._service_time[label].add(service_time)
+
+    def _cancel_pending(self):
+        with self._submit_lock:
+            while True:
+                try:
+                    _priority, _sequence, request = self._requests.get_nowait()
+                except queue.Empty:
+                    return
+                with self._stats_lock:
+                    self._class_stats[request.priority].depth -= 1
+                request.error = RuntimeError("upstream engine stopped")
+                request.done.set()
@@ -0,0 +1,176 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Cache of characteristic values read from device.
+
+Example of configuration in device profile:
+
+    readcache:
+      maxsize: 256
+      default: through
+      characteristics:
+        00002a24-0000-1000-8000-00805f9b34fb: static
+        00002a19-0000-1000-8000-00805f9b34fb:
+          policy: ttl
+          ttl: 5.0
+"""
+
+import logging
+from typing import Dict, Any
+from collections import OrderedDict
+
+import time
+import threading
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+## always read from device
+POLICY_THROUGH = "through"
+## read once and keep value (refreshed only by notifications)
+POLICY_STATIC = "static"
+## keep value for given time
+POLICY_TTL = "ttl"
+
+POLICIES = (POLICY_THROUGH, POLICY_STATIC, POLICY_TTL)
+
+
+class CachePolicy:
+    def __init__(self, policy: str = POLICY_THROUGH, ttl: float = None):
+        if policy not in POLICIES:
+            raise ValueError(f"invalid cache policy: {policy}")
+        if policy == POLICY_TTL and ttl is None:
+            raise ValueError("missing 'ttl' value for 'ttl' cache policy")
+        self.policy = policy
+        self.ttl = ttl
+
+    def is_cached(self) -> bool:
+        return self.policy != POLICY_THROUGH
+
+    @staticmethod
+    def from_config(config) -> "CachePolicy":
+        if config is None:
+            return CachePolicy()
+        if isinstance(config, str):
+            return CachePolicy(config)
+        return CachePolicy(config.get("policy", POLICY_THROUGH), config.get("ttl"))
+
+
+class ValueCache:
+    """Values cache indexed by characteristic handle with LRU eviction."""
+
+    def __init__(self, max_size: int = 256, default_policy: CachePolicy = None, clock=time.monotonic):
+        if default_policy is None:
+            default_policy = CachePolicy()
+        self.max_size = max_size
+        self.default_policy: CachePolicy = default_policy
+        self.clock = clock
+        ## characteristic UUID to policy
+        self.uuid_policies: Dict[str, CachePolicy] = {}
+        self._policies: Dict[int, CachePolicy] = {}
+        ## handle to pair [value, timestamp]
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    ## assign policy to handle based on characteristic UUID
+    def register(self, handle: int, uuid: str):
+        policy = self.uuid_policies.get(uuid.lower(), self.default_policy)
+        self._policies[handle] = policy
+
+    def get_policy(self, handle: int) -> CachePolicy:
+        return self._policies.get(handle, self.default_policy)
+
+    ## returns cached value or None
+    def get(self, handle: int):
+        policy = self.get_policy(handle)
+        if not policy.is_cached():
+            return None
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                self.misses += 1
+                return None
+            if policy.policy == POLICY_TTL and self.clock() - entry[1] > policy.ttl:
+                del self._entries[handle]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(handle)
+            self.hits += 1
+            return entry[0]
+
+    ## store value read from device or received in notification
+    def put(self, handle: int, value):
+        policy = self.get_policy(handle)
+        if not policy.is_cached():
+            return
+        with self._lock:
+            self._entries[handle] = [value, self.clock()]
+            self._entries.move_to_end(handle)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, handle: int):
+        with self._lock:
+            self._entries.pop(handle, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+    def print_stats(self):
+        stats = self.get_stats()
+        _LOGGER.info(
+            "read cache: hits: %s misses: %s evictions: %s size: %s",
+            stats["hits"],
+            stats["misses"],
+            stats["evictions"],
+            stats["size"],
+        )
+
+    @staticmethod
+    def from_config(cache_config: Dict[str, Any]) -> "ValueCache":
+        """Create cache from 'readcache' section of device profile. Returns None if section is missing."""
+        if not cache_config:
+            return None
+        max_size = cache_config.get("maxsize", 256)
+        default_policy = CachePolicy.from_config(cache_config.get("default"))
+        cache = ValueCache(max_size, default_policy)
+        chars_config = cache_config.get("characteristics", {})
+        for char_uuid, policy_config in chars_config.items():
+            cache.uuid_policies[str(char_uuid).lower()] = CachePolicy.from_config(policy_config)
+        return cache
@@ -0,0 +1,247 @@
+#
+# MIT License
+#
+# Copyright (c) 2025 Arkadiusz Netczuk <dev.arnet@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Forwarding of client writes to device.
+
+Write commands (write without response) are queued and sent in batches, optionally
+coalescing consecutive pending writes to the same handle. Write requests (with response) wait
+for result. Queue is bounded instead of accumulating unbounded latency: write request waits
+for free slot (and eventually fails), write command is dropped when queue is full.
+Write request submitted from D-Bus main loop does not wait - completion callback is called
+by pipeline thread and request is rejected at once when queue is full.
+
+Example of configuration in device profile:
+
+    writepipeline:
+      maxpending: 64
+      timeout: 5.0
+      coalesce:
+        - 0000fff1-0000-1000-8000-00805f9b34fb
+"""
+
+import logging
+from typing import List, Dict, Any, Set, Callable
+from collections import deque
+
+import time
+import threading
+
+from btgattmitm.connector import ServiceConnector
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class WriteRequest:
+    def __init__(self, handle: int, data: bytes, with_response: bool, callback: Callable[[BaseException], None] = None):
+        self.handle = handle
+        self.data = data
+        self.with_response = with_response
+        ## called by pipeline thread with error (None on success) when write is completed
+        self.callback = callback
+        self.error: BaseException = None
+        self.done = threading.Event()
+        ## set by pipeline thread when sending begins
+        self.started = False
+        ## set when client stopped waiting before sending began - request is not sent
+        self.cancelled = False
+
+
+class WritePipeline(threading.Thread):
+    def __init__(
+        self,
+        connector: ServiceConnector,
+        max_pending: int = 64,
+        timeout: float = 5.0,
+        coalesce_uuids: List[str] = None,
+    ):
+        threading.Thread.__init__(self, target=self._work, name="WritePipeline")
+        self.daemon = True
+        self.connector: ServiceConnector = connector
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.coalesce_uuids: Set[str] = set()
+        if coalesce_uuids:
+            self.coalesce_uuids = {item.lower() for item in coalesce_uuids}
+        self.execute = True
+        ## handles allowed to coalesce
+        self._coalesce_handles: Set[int] = set()
+        self._pending: deque = deque()
+        self._cond = threading.Condition()
+        self._stats: Dict[str, int] = {
+            "commands": 0,
+            "requests": 0,
+            "coalesced": 0,
+            "failed": 0,
+            "rejected": 0,
+            "cancelled": 0,
+            "dropped": 0,
+        }
+
+    def register(self, handle: int, uuid: str):
+        if uuid.lower() in self.coalesce_uuids:
+            self._coalesce_handles.add(handle)
+
+    def stop(self):
+        _LOGGER.info("Stopping write pipeline")
+        with self._cond:
+            self.execute = False
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join()
+
+    ## write without response - returns immediately after queuing, dropped if queue is full
+    def write_command(self, handle: int, data: bytes):
+        with self._cond:
+            if handle in self._coalesce_handles and self._pending:
+                ## only last queued write can be replaced - keeps order of writes to different handles
+                pending = self._pending[-1]
+                if pending.handle == handle and pending.with_response is False:
+                    pending.data = data
+                    self._stats["coalesced"] += 1
+                    return
+            if self.execute is False:
+                raise RuntimeError("write pipeline stopped")
+            if len(self._pending) >= self.max_pending:
+                ## called from D-Bus main loop - waiting for free slot would stall all other D-Bus traffic
+                self._stats["dropped"] += 1
+                _LOGGER.warning("write queue full, dropping command to handle %#x", handle)
+                return
+            self._pending.append(WriteRequest(handle, data, False))
+            self._cond.notify_all()
+
+    ## write with response - waits for confirmation from device
+    ## whole call (waiting for free slot and for confirmation) is limited by timeout
+    def write_request(self, handle: int, data: bytes):
+        end_time = time.monotonic() + self.timeout
+        request = WriteRequest(handle, data, True)
+        with self._cond:
+            self._enqueue(request, self.timeout)
+        if request.done.wait(max(end_time - time.monotonic(), 0.0)) is False:
+            self.cancel_request(request)
+            raise TimeoutError(f"write to handle {handle:#x} timed out")
+        if request.error is not None:
+            raise request.error
+
+    ## write with response without waiting - 'callback' is called by pipeline thread with error (None on success)
+    ## returns request to pass to 'cancel_request' when client stops waiting
+    def submit_request(self, handle: int, data: bytes, callback: Callable[[BaseException], None]) -> WriteRequest:
+        request = WriteRequest(handle, data, True, callback)
+        with self._cond:
+            ## called from D-Bus main loop - request is rejected instead of waiting for free slot
+            self._enqueue(request, 0.0)
+        return request
+
+    ## withdraw request not sent yet, so client is not told about failure of write that happens later
+    ## returns False if sending already began
+    def cancel_request(self, request: WriteRequest) -> bool:
+        with self._cond:
+            if request.started:
+                return False
+            request.cancelled = True
+            if request in self._pending:
+                self._pending.remove(request)
+                self._cond.notify_all()
+            self._stats["cancelled"] += 1
+            return True
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._cond:
+            ret_stats = dict(self._stats)
+            ret_stats["pending"] = len(self._pending)
+            return ret_stats
+
+    def print_stats(self):
+        stats = self.get_stats()
+        _LOGGER.info(
+            "write pipeline: commands: %s requests: %s coalesced: %s failed: %s rejected: %s cancelled: %s"
+            " dropped: %s",
+            stats["commands"],
+            stats["requests"],
+            stats["coalesced"],
+            stats["failed"],
+            stats["rejected"],
+            stats["cancelled"],
+            stats["dropped"],
+        )
+
+    ## =======================================================
+
+    ## have to be called with acquired lock
+    def _enqueue(self, request: WriteRequest, timeout: float):
+        if self.execute is False:
+            raise RuntimeError("write pipeline stopped")
+        ## backpressure - wait for free slot
+        has_slot = self._cond.wait_for(lambda: len(self._pending) < self.max_pending or self.execute is False, timeout)
+        if has_slot is False or self.execute is False:
+            self._stats["rejected"] += 1
+            raise TimeoutError(f"write queue full, unable to write to handle {request.handle:#x}")
+        self._pending.append(request)
+        self._cond.notify_all()
+
+    def _work(self):
+        try:
+            _LOGGER.info("Starting write pipeline")
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._pending or self.execute is False)
+                    if not self._pending and self.execute is False:
+                        break
+                    ## take whole batch
+                    batch = list(self._pending)
+                    self._pending.clear()
+                    self._cond.notify_all()
+                for request in batch:
+                    self._send(request)
+        finally:
+            _LOGGER.info("Write pipeline loop stopped")
+
+    def _send(self, request: WriteRequest):
+        with self._cond:
+            if request.cancelled:
+                return
+            request.started = True
+        try:
+            self.connector.write_characteristic(request.handle, request.data, request.with_response)
+            stat_key = "requests" if request.with_response else "commands"
+            with self._cond:
+                self._stats[stat_key] += 1
+        except BaseException as exc:  # pylint: disable=W0718
+            if request.with_response is False:
+                _LOGGER.error("unable to write command to handle %#x: %s", request.handle, exc)
+            request.error = exc
+            with self._cond:
+                self._stats["failed"] += 1
+        request.done.set()
+        if request.callback is not None:
+            request.callback(request.error)
+
+    @staticmethod
+    def from_config(connector: ServiceConnector, pipeline_config: Dict[str, Any]) -> "WritePipeline":
+        if pipeline_config is None:
+            pipeline_config = {}
+        max_pending = pipeline_config.get("maxpending", 64)
+        timeout = pipeline_config.get("timeout", 5.0)
+        coalesce_uuids = pipeline_config.get("coalesce", [])
+        return WritePipeline(connector, max_pending, timeout, coalesce_uuids)
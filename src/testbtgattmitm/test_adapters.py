@@ -0,0 +1,101 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import os
+import struct
+import shutil
+import tempfile
+import unittest
+
+from btgattmitm.adapters import AdapterInventory
+from btgattmitm.btmgmt.mgmtsocket import MgmtSocket, MGMT_EV_INDEX_ADDED, MGMT_OP_READ_INDEX_LIST, MGMT_INDEX_NONE
+
+from testbtgattmitm.test_mgmtsocket import FakeSocket, make_event, make_complete
+
+
+def add_adapter(sysfs_path, name, address=None):
+    entry_path = os.path.join(sysfs_path, name)
+    os.makedirs(entry_path)
+    with open(os.path.join(entry_path, "type"), "w", encoding="utf-8") as attr_file:
+        attr_file.write("Primary\n")
+    if address:
+        with open(os.path.join(entry_path, "address"), "w", encoding="utf-8") as attr_file:
+            attr_file.write(address + "\n")
+
+
+class ListenedInventory(AdapterInventory):
+    """Inventory reading adapters from sysfs and listening events on fake mgmt socket."""
+
+    def __init__(self, sysfs_path: str, listener_socket: FakeSocket):
+        super().__init__(sysfs_path)
+        self.listener_socket = listener_socket
+
+    def _open_mgmt(self) -> MgmtSocket:
+        if self._adapters is None:
+            ## loading adapters
+            return None
+        return MgmtSocket(self.listener_socket)
+
+
+class AdapterInventoryTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.sysfs_path = tempfile.mkdtemp()
+        add_adapter(self.sysfs_path, "hci1", "00:11:22:33:44:55")
+        add_adapter(self.sysfs_path, "hci0", "aa:bb:cc:dd:ee:ff")
+        ## connection entry
+        add_adapter(self.sysfs_path, "hci0:64")
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        shutil.rmtree(self.sysfs_path)
+
+    def test_get_adapters(self):
+        inventory = AdapterInventory(self.sysfs_path, use_mgmt=False)
+        adapters = inventory.get_adapters()
+        self.assertEqual([0, 1], [item.index for item in adapters])
+        self.assertEqual("AA:BB:CC:DD:EE:FF", adapters[0].address)
+        self.assertEqual("Primary", adapters[0].dev_type)
+        self.assertTrue(adapters[0].is_le_supported())
+
+    def test_find(self):
+        inventory = AdapterInventory(self.sysfs_path, use_mgmt=False)
+        self.assertEqual("hci1", inventory.find_by_address("00-11-22-33-44-55").name)
+        self.assertEqual(0, inventory.find_by_name("hci0").index)
+        self.assertEqual("00:11:22:33:44:55", inventory.get_adapter(1).address)
+        self.assertIsNone(inventory.get_adapter(2))
+
+    def test_cache(self):
+        inventory = AdapterInventory(self.sysfs_path, use_mgmt=False)
+        self.assertEqual(2, len(inventory.get_adapters()))
+
+        add_adapter(self.sysfs_path, "hci2", "01:02:03:04:05:06")
+        ## cached
+        self.assertEqual(2, len(inventory.get_adapters()))
+
+        inventory.handle_mgmt_event(MGMT_EV_INDEX_ADDED, 2)
+        self.assertEqual(3, len(inventory.get_adapters()))
+        self.assertEqual("hci2", inventory.find_by_address("01:02:03:04:05:06").name)
+
+    def test_listener(self):
+        index_list = make_complete(MGMT_OP_READ_INDEX_LIST, MGMT_INDEX_NONE, 0, struct.pack("<HHH", 2, 0, 1))
+        fake = FakeSocket([index_list, make_event(MGMT_EV_INDEX_ADDED, 2, b"")])
+        inventory = ListenedInventory(self.sysfs_path, fake)
+        self.assertEqual(2, len(inventory.get_adapters()))
+        ## listener ends when fake socket has no more packets
+        inventory._listener.join(5.0)  # pylint: disable=W0212
+
+        add_adapter(self.sysfs_path, "hci2", "01:02:03:04:05:06")
+        self.assertEqual(3, len(inventory.get_adapters()))
+
+    def test_lookup_miss(self):
+        inventory = AdapterInventory(self.sysfs_path, use_mgmt=False)
+        self.assertIsNone(inventory.find_by_name("hci2"))
+
+        add_adapter(self.sysfs_path, "hci2", "01:02:03:04:05:06")
+        self.assertEqual(2, inventory.find_by_name("hci2").index)
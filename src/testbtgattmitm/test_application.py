@@ -0,0 +1,60 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import unittest
+
+try:
+    from btgattmitm.dbusobject.application import Application
+    from btgattmitm.dbusobject.service import Service
+    from btgattmitm.dbusobject.characteristic import Characteristic
+except ImportError:
+    ## D-Bus bindings not installed
+    Application = None  # type: ignore
+
+
+@unittest.skipIf(Application is None, "dbus not installed")
+class ApplicationTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        ## objects not exported - no bus connection
+        self.app = Application(None, "/test/app")
+        self.service = Service(None, 0, "0000180f-0000-1000-8000-00805f9b34fb", True, "/test/app/service")
+        self.app.add_service(self.service)
+
+    def test_cached(self):
+        objects = self.app.get_managed_objects()
+        self.assertIs(objects, self.app.get_managed_objects())
+
+    def test_service_changed(self):
+        objects = self.app.get_managed_objects()
+        characteristic = Characteristic(None, 0, "00002a19-0000-1000-8000-00805f9b34fb", ["read"], self.service)
+        self.service.add_characteristic(characteristic)
+        ## tree of application rebuilt with new characteristic
+        new_objects = self.app.get_managed_objects()
+        self.assertIsNot(objects, new_objects)
+        self.assertEqual(2, len(new_objects))
+
+    def test_characteristic_changed(self):
+        characteristic = Characteristic(None, 0, "00002a19-0000-1000-8000-00805f9b34fb", ["read"], self.service)
+        self.service.add_characteristic(characteristic)
+        objects = self.app.get_managed_objects()
+        characteristic.add_descriptor(DescriptorStub("/test/app/service0/char0/desc0"))
+        new_objects = self.app.get_managed_objects()
+        self.assertIsNot(objects, new_objects)
+        self.assertEqual(3, len(new_objects))
+
+
+class DescriptorStub:
+    def __init__(self, path: str):
+        self.path = path
+
+    def get_path(self):
+        return self.path
+
+    def get_properties(self):
+        return {}
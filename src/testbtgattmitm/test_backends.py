@@ -0,0 +1,21 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import unittest
+
+from btgattmitm.backends import create_connector, create_advertiser
+
+
+class BackendsTest(unittest.TestCase):
+    def test_unknown_connector(self):
+        with self.assertRaises(ValueError):
+            create_connector("unknown", "AA:BB:CC:DD:EE:FF")
+
+    def test_unknown_advertiser(self):
+        with self.assertRaises(ValueError):
+            create_advertiser("unknown", None, 0)
@@ -0,0 +1,63 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import time
+import unittest
+
+from btgattmitm.upstream import UpstreamEngine
+from btgattmitm.connector import NotificationHandler
+
+try:
+    from btgattmitm import bluepyconnector
+except ImportError:
+    ## bluepy not installed
+    bluepyconnector = None
+
+
+class FakePeripheral:
+    def __init__(self):
+        self.disconnected = False
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+@unittest.skipIf(bluepyconnector is None, "bluepy not installed")
+class BluepyConnectorTest(unittest.TestCase):
+    def test_engine_stopped(self):
+        connector = bluepyconnector.BluepyConnector("AA:BB:CC:DD:EE:FF")
+        peripheral = FakePeripheral()
+        connector._peripheral = peripheral  # pylint: disable=W0212
+
+        def failing_poll(_timeout):
+            raise OSError("helper died")
+
+        engine = UpstreamEngine(failing_poll)
+        connector._engine = engine  # pylint: disable=W0212
+        engine.start()
+        engine.join(5.0)
+        self.assertFalse(engine.is_alive())
+        self.assertTrue(connector.is_connected())
+
+        calls = []
+        process_notifications = connector.process_notifications
+
+        def counting_process():
+            calls.append(time.monotonic())
+            process_notifications()
+
+        connector.process_notifications = counting_process
+        handler = NotificationHandler(connector)
+        handler.start()
+        time.sleep(0.3)
+        handler.stop()
+
+        ## connection dropped and handler waits idle instead of spinning
+        self.assertFalse(connector.is_connected())
+        self.assertTrue(peripheral.disconnected)
+        self.assertEqual(1, len(calls))
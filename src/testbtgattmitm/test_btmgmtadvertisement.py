@@ -0,0 +1,81 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import unittest
+from typing import List
+
+from btgattmitm.btmgmt.advertisement import Advertiser
+
+
+class FakeAdvertiser(Advertiser):
+    """Records 'btmgmt' commands instead of executing them."""
+
+    def __init__(self, hci_iface_index: int, adv_instance: int = 2, change_mac: str = None, name: str = None):
+        super().__init__(hci_iface_index, adv_instance)
+        self.change_mac = change_mac
+        if name is not None:
+            self.adv_data.set_name(name)
+        self.commands: List[str] = []
+
+    def _open_mgmt(self) -> bool:
+        return False
+
+    def _run_btmgmt_cmd(self, cmd_params=None) -> bool:
+        self.commands.append(cmd_params[0])
+        return True
+
+    def _set_public_mac(self, adv_instance) -> bool:
+        return True
+
+
+class AdvertiserTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.advertisers = []
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        for advertiser in self.advertisers:
+            advertiser.stop()
+
+    def _create(self, *args, **kwargs) -> FakeAdvertiser:
+        advertiser = FakeAdvertiser(*args, **kwargs)
+        self.advertisers.append(advertiser)
+        return advertiser
+
+    def test_shared_adapter(self):
+        first = self._create(0, 2, change_mac="00:11:22:33:44:55", name="first")
+        second = self._create(0, 3, name="second")
+        self.assertTrue(first.advertise())
+        self.assertTrue(second.advertise())
+        self.assertEqual(["power", "public-addr", "power", "advertising", "name", "add-adv"], first.commands)
+        ## second session does not power cycle nor rename adapter
+        self.assertEqual(["add-adv"], second.commands)
+
+    def test_shared_adapter_other_mac(self):
+        first = self._create(0, 2, change_mac="00:11:22:33:44:55")
+        second = self._create(0, 3, change_mac="00:11:22:33:44:66")
+        self.assertTrue(first.advertise())
+        self.assertFalse(second.advertise())
+        self.assertEqual([], second.commands)
+
+    def test_other_adapter(self):
+        first = self._create(0, 2, change_mac="00:11:22:33:44:55")
+        second = self._create(1, 3, change_mac="00:11:22:33:44:66")
+        self.assertTrue(first.advertise())
+        self.assertTrue(second.advertise())
+        self.assertEqual(["power", "public-addr", "power", "advertising", "add-adv"], second.commands)
+
+    def test_release_adapter(self):
+        first = self._create(0, 2)
+        second = self._create(0, 3, change_mac="00:11:22:33:44:66")
+        self.assertTrue(first.advertise())
+        first.stop()
+        ## adapter not used anymore - settings can be changed
+        self.assertTrue(second.advertise())
+        self.assertEqual(["power", "public-addr", "power", "advertising", "add-adv"], second.commands)
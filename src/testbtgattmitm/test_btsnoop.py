@@ -0,0 +1,96 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import os
+import struct
+import unittest
+import tempfile
+
+from btgattmitm.capture import LINK_UPSTREAM, LINK_DOWNSTREAM, DIR_RX, DIR_TX, OP_NOTIFY, OP_READ_RSP
+from btgattmitm.btsnoop import (
+    BtsnoopWriter,
+    BTSNOOP_HEADER,
+    BTSNOOP_RECORD,
+    BTSNOOP_MAGIC,
+    BTSNOOP_DATALINK_H4,
+    UPSTREAM_CONN_HANDLE,
+    DOWNSTREAM_CONN_HANDLE,
+)
+
+
+def read_btsnoop(path):
+    with open(path, "rb") as snoop_file:
+        content = snoop_file.read()
+    magic, _version, datalink = BTSNOOP_HEADER.unpack_from(content, 0)
+    pos = BTSNOOP_HEADER.size
+    records = []
+    while pos < len(content):
+        _orig_len, incl_len, flags, _drops, _timestamp = BTSNOOP_RECORD.unpack_from(content, pos)
+        pos += BTSNOOP_RECORD.size
+        records.append((flags, content[pos : pos + incl_len]))
+        pos += incl_len
+    return magic, datalink, records
+
+
+class BtsnoopWriterTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.path = os.path.join(self.temp_dir.name, "capture.btsnoop")
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.temp_dir.cleanup()
+
+    def test_write(self):
+        writer = BtsnoopWriter(self.path)
+        writer.start()
+        writer.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, 0x0012, b"\x01\x02")
+        writer.record(LINK_DOWNSTREAM, DIR_TX, OP_READ_RSP, 0x0012, bytearray(b"\x03"))
+        writer.close()
+
+        magic, datalink, records = read_btsnoop(self.path)
+        self.assertEqual(BTSNOOP_MAGIC, magic)
+        self.assertEqual(BTSNOOP_DATALINK_H4, datalink)
+        self.assertEqual(2, len(records))
+
+        flags, packet = records[0]
+        self.assertEqual(1, flags)
+        _h4_type, acl_handle, _acl_len, l2cap_len, cid = struct.unpack_from("<BHHHH", packet)
+        self.assertEqual(UPSTREAM_CONN_HANDLE, acl_handle & 0x0FFF)
+        self.assertEqual(4, cid)
+        self.assertEqual(5, l2cap_len)
+        self.assertEqual(b"\x1b\x12\x00\x01\x02", packet[9:])
+
+        flags, packet = records[1]
+        self.assertEqual(0, flags)
+        acl_handle = struct.unpack_from("<H", packet, 1)[0]
+        self.assertEqual(DOWNSTREAM_CONN_HANDLE, acl_handle & 0x0FFF)
+        self.assertEqual(b"\x0b\x03", packet[9:])
+
+    def test_rotate(self):
+        writer = BtsnoopWriter(self.path, max_bytes=100, backup_count=2)
+        writer.start()
+        for i in range(10):
+            writer.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, i, b"\x00" * 20)
+        writer.close()
+        self.assertGreater(writer.get_stats()["rotated"], 0)
+        self.assertTrue(os.path.exists(self.path + ".1"))
+        self.assertFalse(os.path.exists(self.path + ".3"))
+        self.assertEqual(10, writer.get_stats()["written"])
+
+    def test_drop(self):
+        writer = BtsnoopWriter(self.path, max_pending=2)
+        writer.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, 1, b"\x01")
+        writer.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, 1, b"\x02")
+        writer.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, 1, b"\x03")
+        self.assertEqual(1, writer.get_stats()["dropped"])
+        writer.start()
+        writer.close()
+        _magic, _datalink, records = read_btsnoop(self.path)
+        self.assertEqual(2, len(records))
@@ -0,0 +1,132 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import os
+import unittest
+import threading
+import tempfile
+
+from btgattmitm.capture import (
+    TrafficRing,
+    TrafficCounter,
+    SessionRecorder,
+    SpillFile,
+    read_spill_file,
+    LINK_UPSTREAM,
+    LINK_DOWNSTREAM,
+    DIR_RX,
+    DIR_TX,
+    OP_READ_RSP,
+    OP_NOTIFY,
+    OP_WRITE_CMD,
+)
+
+
+class TrafficRingTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.temp_dir.cleanup()
+
+    def test_record(self):
+        ring = TrafficRing(capacity=4, data_capacity=16)
+        ring.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, 0x10, b"\x01\x02")
+        ring.record(LINK_DOWNSTREAM, DIR_RX, OP_WRITE_CMD, 0x11, bytearray(b"\x03"))
+        records = list(ring.get_records())
+        self.assertEqual(2, len(records))
+        self.assertEqual((LINK_UPSTREAM, DIR_RX, OP_NOTIFY, 0x10, b"\x01\x02"), records[0][1:])
+        self.assertEqual((LINK_DOWNSTREAM, DIR_RX, OP_WRITE_CMD, 0x11, b"\x03"), records[1][1:])
+
+    def test_overwrite_oldest(self):
+        ring = TrafficRing(capacity=3, data_capacity=64)
+        for i in range(5):
+            ring.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, i, bytes([i]))
+        records = list(ring.get_records())
+        self.assertEqual([2, 3, 4], [item[4] for item in records])
+        self.assertEqual(2, ring.get_stats()["dropped"])
+
+    def test_overwrite_data(self):
+        ## data buffer is smaller than records buffer
+        ring = TrafficRing(capacity=16, data_capacity=8)
+        for i in range(6):
+            ring.record(LINK_UPSTREAM, DIR_TX, OP_READ_RSP, i, bytes([i, i, i]))
+        records = list(ring.get_records())
+        self.assertEqual([4, 5], [item[4] for item in records])
+        for item in records:
+            handle = item[4]
+            self.assertEqual(bytes([handle, handle, handle]), item[5])
+
+    def test_spill(self):
+        spill_path = os.path.join(self.temp_dir.name, "capture.bin")
+        ring = TrafficRing(capacity=4, data_capacity=8, spill_path=spill_path)
+        for i in range(10):
+            ring.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, i, bytes([i, i]))
+        ring.close()
+        records = list(read_spill_file(spill_path))
+        self.assertEqual(list(range(10)), [item[4] for item in records])
+        self.assertEqual(bytes([7, 7]), records[7][5])
+        self.assertEqual(0, ring.get_stats()["dropped"])
+
+    def test_spill_background(self):
+        spill_path = os.path.join(self.temp_dir.name, "capture.bin")
+        ring = TrafficRing(capacity=4, spill_path=spill_path)
+        spill_write = ring._spill.write  # pylint: disable=W0212
+        write_event = threading.Event()
+        release_event = threading.Event()
+
+        def blocked_write(data):
+            write_event.set()
+            release_event.wait()
+            spill_write(data)
+
+        ring._spill.write = blocked_write  # pylint: disable=W0212
+        for i in range(8):
+            ring.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, i, bytes([i]))
+        ## first buffer is being written, recording continues in second one
+        self.assertTrue(write_event.wait(5.0))
+        self.assertEqual(4, len(ring))
+        release_event.set()
+        ring.close()
+        records = list(read_spill_file(spill_path))
+        self.assertEqual(list(range(8)), [item[4] for item in records])
+
+    def test_spill_file_windows(self):
+        spill_path = os.path.join(self.temp_dir.name, "spill.bin")
+        spill = SpillFile(spill_path, window_size=1)
+        data = os.urandom(spill.window_size * 2 + 100)
+        spill.write(data)
+        spill.close()
+        with open(spill_path, "rb") as spill_file:
+            content = spill_file.read()
+        self.assertEqual(data, content[-len(data) :])
+
+
+class TrafficCounterTest(unittest.TestCase):
+    def test_session(self):
+        ring = TrafficRing(capacity=4)
+        counter = TrafficCounter()
+        recorder = SessionRecorder(ring, 2)
+        for item in (counter, recorder):
+            item.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, 0x10, b"\x01\x02")
+            item.record(LINK_DOWNSTREAM, DIR_TX, OP_READ_RSP, 0x11, b"\x03")
+            item.record(LINK_DOWNSTREAM, DIR_TX, OP_READ_RSP, 0x11, None)
+
+        stats = counter.get_stats()
+        self.assertEqual(3, stats["records"])
+        self.assertEqual(3, stats["bytes"])
+        self.assertEqual(1, stats["upstream_rx_records"])
+        self.assertEqual(2, stats["downstream_tx_records"])
+        self.assertEqual(1, stats["downstream_tx_bytes"])
+        self.assertEqual(0, stats["upstream_tx_records"])
+
+        ## links of session 2
+        links = [item[1] for item in ring.get_records()]
+        self.assertEqual([4, 5, 5], links)
@@ -0,0 +1,235 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import time
+import unittest
+import threading
+
+from btgattmitm.connector import CallbackContainer, SubscriptionManager, CCCD_NOTIFY, CCCD_INDICATE
+from btgattmitm.connector import ServiceConnector, ServiceData, CCCD_UUID, AbstractConnector, NotificationHandler
+
+
+class Receiver:
+    def __init__(self):
+        self.values = []
+
+    def callback(self, data):
+        self.values.append(data)
+
+
+class CallbackContainerTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.container = CallbackContainer()
+
+    def test_dispatch(self):
+        receiver1 = Receiver()
+        receiver2 = Receiver()
+        self.container.register(1, receiver1.callback)
+        self.container.register(1, receiver2.callback)
+        self.container.register(1, receiver1.callback)
+        called = self.container.dispatch(1, b"\x01")
+        self.assertEqual(2, called)
+        self.assertEqual([b"\x01"], receiver1.values)
+        self.assertEqual([b"\x01"], receiver2.values)
+        self.assertEqual(0, self.container.dispatch(2, b"\x02"))
+
+    def test_unregister(self):
+        receiver = Receiver()
+        self.container.register(1, receiver.callback)
+        self.container.unregister(1, receiver.callback)
+        self.assertIsNone(self.container.get(1))
+        self.assertEqual(0, self.container.dispatch(1, b"\x01"))
+        ## not registered
+        self.container.unregister(2, receiver.callback)
+
+    def test_unregister_during_dispatch(self):
+        receiver = Receiver()
+
+        def remover(_data):
+            self.container.unregister(1, remover)
+            self.container.unregister(1, receiver.callback)
+
+        self.container.register(1, remover)
+        self.container.register(1, receiver.callback)
+        ## dispatch works on snapshot
+        self.assertEqual(2, self.container.dispatch(1, b"\x01"))
+        self.assertEqual([b"\x01"], receiver.values)
+        self.assertIsNone(self.container.get(1))
+
+    def test_callback_exception(self):
+        receiver = Receiver()
+
+        def failing(_data):
+            raise ValueError("failed")
+
+        self.container.register(1, failing)
+        self.container.register(1, receiver.callback)
+        self.container.dispatch(1, b"\x01")
+        self.assertEqual([b"\x01"], receiver.values)
+
+    def test_stats(self):
+        receiver = Receiver()
+        self.container.register(1, receiver.callback)
+        self.container.dispatch(1, b"\x01")
+        self.container.dispatch(1, b"\x02")
+        stats = self.container.get_stats()
+        self.assertEqual(2, stats[1]["count"])
+        callbacks_stats = list(stats[1]["callbacks"].values())
+        self.assertEqual(1, len(callbacks_stats))
+        self.assertEqual(2, callbacks_stats[0]["count"])
+
+    def test_stats_during_dispatch(self):
+        receivers = [Receiver() for _ in range(20)]
+        stop_event = threading.Event()
+
+        def read_stats():
+            while not stop_event.is_set():
+                self.container.get_stats()
+
+        reader = threading.Thread(target=read_stats, daemon=True)
+        reader.start()
+        try:
+            for index, receiver in enumerate(receivers):
+                self.container.register(index, receiver.callback)
+                self.container.dispatch(index, b"\x01")
+        finally:
+            stop_event.set()
+            reader.join()
+        self.assertEqual(set(range(20)), set(self.container.get_stats().keys()))
+
+    def test_stats_not_called(self):
+        receiver = Receiver()
+        self.container.register(1, receiver.callback)
+        self.assertEqual({}, self.container.get_stats())
+
+
+class SubscriptionManagerTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.writes = []
+        self.container = CallbackContainer()
+        self.manager = SubscriptionManager(self._write_cccd, self.container)
+
+    def _write_cccd(self, handle, value):
+        self.writes.append((handle, value))
+
+    def test_reference_count(self):
+        receiver1 = Receiver()
+        receiver2 = Receiver()
+        self.manager.subscribe(1, CCCD_NOTIFY, receiver1.callback)
+        self.manager.subscribe(1, CCCD_NOTIFY, receiver1.callback)
+        self.manager.subscribe(1, CCCD_NOTIFY, receiver2.callback)
+        self.assertEqual([(1, CCCD_NOTIFY)], self.writes)
+        self.assertEqual(2, self.container.dispatch(1, b"\x01"))
+
+        self.manager.unsubscribe(1, CCCD_NOTIFY, receiver1.callback)
+        self.manager.unsubscribe(1, CCCD_NOTIFY, receiver2.callback)
+        self.assertEqual([(1, CCCD_NOTIFY)], self.writes)
+        ## receiver2 unregistered
+        self.assertEqual(1, self.container.dispatch(1, b"\x02"))
+
+        self.manager.unsubscribe(1, CCCD_NOTIFY, receiver1.callback)
+        self.assertEqual([(1, CCCD_NOTIFY), (1, 0)], self.writes)
+        self.assertIsNone(self.container.get(1))
+
+        ## not subscribed
+        self.manager.unsubscribe(1, CCCD_NOTIFY, receiver1.callback)
+        self.assertEqual(2, len(self.writes))
+        self.assertEqual(2, self.manager.get_stats()["writes"])
+
+    def test_merge_modes(self):
+        receiver = Receiver()
+        self.manager.subscribe(1, CCCD_NOTIFY, receiver.callback)
+        self.manager.subscribe(1, CCCD_INDICATE, receiver.callback)
+        self.assertEqual(CCCD_NOTIFY | CCCD_INDICATE, self.manager.get_value(1))
+        self.manager.unsubscribe(1, CCCD_NOTIFY, receiver.callback)
+        self.assertEqual([(1, 1), (1, 3), (1, 2)], self.writes)
+        ## still subscribed for indications
+        self.assertEqual(1, self.container.dispatch(1, b"\x01"))
+
+    def test_clear_during_write(self):
+        ## connector lock taken by CCCD write and by disconnect calling 'clear'
+        connector_lock = threading.Lock()
+        write_started = threading.Event()
+        clear_started = threading.Event()
+
+        def write_cccd(handle, value):
+            write_started.set()
+            clear_started.wait(1.0)
+            with connector_lock:
+                self.writes.append((handle, value))
+
+        def disconnect():
+            write_started.wait(1.0)
+            with connector_lock:
+                clear_started.set()
+                manager.clear()
+
+        receiver = Receiver()
+        manager = SubscriptionManager(write_cccd, self.container)
+        subscriber = threading.Thread(target=manager.subscribe, args=(1, CCCD_NOTIFY, receiver.callback), daemon=True)
+        disconnector = threading.Thread(target=disconnect, daemon=True)
+        subscriber.start()
+        disconnector.start()
+        subscriber.join(2.0)
+        disconnector.join(2.0)
+        self.assertFalse(subscriber.is_alive())
+        self.assertFalse(disconnector.is_alive())
+        self.assertEqual([(1, CCCD_NOTIFY)], self.writes)
+
+    def test_failed_write(self):
+        def failing(_handle, _value):
+            raise ValueError("failed")
+
+        receiver = Receiver()
+        manager = SubscriptionManager(failing, self.container)
+        with self.assertRaises(ValueError):
+            manager.subscribe(1, CCCD_NOTIFY, receiver.callback)
+        self.assertEqual(0, manager.get_value(1))
+        self.assertIsNone(self.container.get(1))
+
+
+class CccdHandleTest(unittest.TestCase):
+    def test_resolve(self):
+        service = ServiceData("0000180d-0000-1000-8000-00805f9b34fb")
+        char_data = service.add_characteristic("00002a37-0000-1000-8000-00805f9b34fb", None, 0x10, ["notify"])
+        char_data.add_descriptor("00002901-0000-1000-8000-00805f9b34fb", None, 0x11, b"rate")
+        char_data.add_descriptor(CCCD_UUID, None, 0x12)
+        service.add_characteristic("00002a38-0000-1000-8000-00805f9b34fb", None, 0x14, ["notify"])
+
+        connector = ServiceConnector()
+        connector.set_services([service])
+        self.assertEqual(0x12, connector.get_cccd_handle(0x10))
+        ## not discovered - handle following value
+        self.assertEqual(0x15, connector.get_cccd_handle(0x14))
+
+
+class NonBlockingConnector(AbstractConnector):
+    """Connector which 'process_notifications' returns immediately (e.g. connection lost)."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def is_connected(self) -> bool:
+        return True
+
+    def process_notifications(self):
+        self.calls += 1
+
+
+class NotificationHandlerTest(unittest.TestCase):
+    def test_non_blocking_connector(self):
+        connector = NonBlockingConnector()
+        handler = NotificationHandler(connector)
+        handler.start()
+        time.sleep(0.3)
+        handler.stop()
+        ## handler waits idle between calls instead of spinning
+        self.assertGreater(connector.calls, 0)
+        self.assertLess(connector.calls, 10)
@@ -6,18 +6,23 @@
 # LICENSE file in the root directory of this source tree.
 #
 
+import os
 import unittest
+import tempfile
+
 from btgattmitm import dataio
 
 
 class DataIOTest(unittest.TestCase):
     def setUp(self):
         ## Called before testfunction is executed
-        pass
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        dataio.CACHE_DIR = os.path.join(self.temp_dir.name, "compiled")
 
     def tearDown(self):
         ## Called after testfunction was executed
-        pass
+        dataio.CACHE_DIR = None
+        self.temp_dir.cleanup()
 
     def test_dump_bytearray(self):
         input_data = bytearray([1, 2, 3])
@@ -42,3 +47,36 @@ class DataIOTest(unittest.TestCase):
 
         restored_data = dataio.load(out)
         self.assertEqual(input_data, restored_data)
+
+    def test_load_from_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_path = os.path.join(temp_dir, "device.yaml")
+            dataio.dump_to({"value": bytearray([1, 2])}, config_path)
+
+            restored_data = dataio.load_from(config_path)
+            self.assertEqual({"value": bytearray([1, 2])}, restored_data)
+            cache_path = dataio.get_cache_path(config_path)
+            self.assertTrue(cache_path.startswith(dataio.CACHE_DIR))
+            self.assertTrue(os.path.exists(cache_path))
+            self.assertFalse(os.path.exists(config_path + dataio.CACHE_SUFFIX))
+
+            ## loaded from cache
+            restored_data = dataio.load_from(config_path)
+            self.assertEqual({"value": bytearray([1, 2])}, restored_data)
+
+            ## file changed - cache invalidated
+            dataio.dump_to({"value": "other"}, config_path)
+            restored_data = dataio.load_from(config_path)
+            self.assertEqual({"value": "other"}, restored_data)
+
+    def test_load_from_cache_not_private(self):
+        os.makedirs(dataio.CACHE_DIR, mode=0o755)
+        os.chmod(dataio.CACHE_DIR, 0o755)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_path = os.path.join(temp_dir, "device.yaml")
+            dataio.dump_to({"value": 1}, config_path)
+
+            restored_data = dataio.load_from(config_path)
+            self.assertEqual({"value": 1}, restored_data)
+            self.assertIsNone(dataio.get_cache_path(config_path))
+            self.assertEqual([], os.listdir(dataio.CACHE_DIR))
@@ -0,0 +1,88 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import unittest
+
+from btgattmitm.find_adapter import BluezObjectCache
+from btgattmitm.constants import GATT_MANAGER_IFACE, LE_ADVERTISING_MANAGER_IFACE
+
+
+class FakeMatch:
+    def __init__(self, bus):
+        self.bus = bus
+
+    def remove(self):
+        self.bus.removed += 1
+
+
+class FakeObject:
+    def __init__(self, bus):
+        self.bus = bus
+
+    def GetManagedObjects(self, dbus_interface=None):  # pylint: disable=C0103,W0613
+        self.bus.calls += 1
+        return self.bus.objects
+
+
+class FakeBus:
+    def __init__(self, objects):
+        self.objects = objects
+        self.handlers = {}
+        self.calls = 0
+        self.removed = 0
+
+    def add_signal_receiver(self, handler, signal_name=None, **_kwargs):
+        self.handlers[signal_name] = handler
+        return FakeMatch(self)
+
+    def get_object(self, _bus_name, _path):
+        return FakeObject(self)
+
+
+def make_objects():
+    adapter_ifaces = {"org.bluez.Adapter1": {}, GATT_MANAGER_IFACE: {}, LE_ADVERTISING_MANAGER_IFACE: {}}
+    return {
+        "/org/bluez": {"org.bluez.AgentManager1": {}},
+        "/org/bluez/hci0": adapter_ifaces,
+        "/org/bluez/hci1": {"org.bluez.Adapter1": {}, GATT_MANAGER_IFACE: {}},
+        "/org/bluez/hci0/dev_00_11_22_33_44_55": {"org.bluez.Device1": {"Name": "dev"}},
+    }
+
+
+class BluezObjectCacheTest(unittest.TestCase):
+    def test_find(self):
+        bus = FakeBus(make_objects())
+        cache = BluezObjectCache(bus)
+        self.assertEqual("/org/bluez/hci0", cache.find_object(GATT_MANAGER_IFACE))
+        self.assertEqual("/org/bluez/hci1", cache.find_object(GATT_MANAGER_IFACE, "hci1"))
+        self.assertIsNone(cache.find_object(LE_ADVERTISING_MANAGER_IFACE, "hci1"))
+        self.assertEqual(["/org/bluez/hci0/dev_00_11_22_33_44_55"], cache.get_devices("hci0"))
+        self.assertEqual([], cache.get_devices("/org/bluez/hci1"))
+        self.assertEqual({"Name": "dev"}, cache.get_properties(cache.get_devices()[0], "org.bluez.Device1"))
+        ## tree received once
+        self.assertEqual(1, bus.calls)
+
+    def test_signals(self):
+        bus = FakeBus(make_objects())
+        cache = BluezObjectCache(bus)
+        cache.initialize()
+
+        device_path = "/org/bluez/hci1/dev_AA_BB_CC_DD_EE_FF"
+        bus.handlers["InterfacesAdded"](device_path, {"org.bluez.Device1": {}})
+        self.assertEqual([device_path], cache.get_devices("hci1"))
+
+        bus.handlers["InterfacesRemoved"](device_path, ["org.bluez.Device1"])
+        self.assertEqual([], cache.get_devices("hci1"))
+
+        bus.handlers["InterfacesRemoved"]("/org/bluez/hci0", [LE_ADVERTISING_MANAGER_IFACE])
+        self.assertIsNone(cache.find_object(LE_ADVERTISING_MANAGER_IFACE))
+        self.assertEqual("/org/bluez/hci0", cache.find_object(GATT_MANAGER_IFACE))
+        self.assertEqual(1, bus.calls)
+
+        cache.close()
+        self.assertEqual(2, bus.removed)
@@ -0,0 +1,111 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import os
+import unittest
+import tempfile
+
+from btgattmitm import dataio
+from btgattmitm.connector import AbstractConnector, ServiceData, CCCD_UUID
+from btgattmitm.gattcache import GattCache, DATABASE_HASH_UUID
+
+
+class FakeConnector(AbstractConnector):
+    def __init__(self, db_hash=None):
+        self.db_hash = db_hash
+        self.discovered = 0
+
+    def connect(self):
+        return self
+
+    def get_address(self):
+        return "AA:BB:CC:DD:EE:FF"
+
+    def get_address_type(self):
+        return "public"
+
+    def get_services(self):
+        self.discovered += 1
+        service = ServiceData("00001801-0000-1000-8000-00805f9b34fb", "Generic Attribute")
+        char_data = service.add_characteristic(
+            "00002a05-0000-1000-8000-00805f9b34fb", "Service Changed", 3, ["indicate"]
+        )
+        char_data.add_descriptor("00002901-0000-1000-8000-00805f9b34fb", "User Description", 4, b"changed")
+        char_data.add_descriptor(CCCD_UUID, "Client Characteristic Configuration", 5)
+        if self.db_hash is not None:
+            service.add_characteristic(DATABASE_HASH_UUID, "Database Hash", 6, ["read"])
+        return [service]
+
+    def read_characteristic(self, handle):
+        if handle == 6:
+            return self.db_hash
+        raise ValueError("invalid handle")
+
+
+class NoAddressTypeConnector(FakeConnector):
+    """Connector not providing address type (like bleak backend)."""
+
+    def get_address_type(self):
+        raise NotImplementedError()
+
+
+class GattCacheTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.cache = GattCache(os.path.join(self.temp_dir.name, "cache"))
+        dataio.CACHE_DIR = os.path.join(self.temp_dir.name, "compiled")
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        dataio.CACHE_DIR = None
+        self.temp_dir.cleanup()
+
+    def test_warm_start(self):
+        connector = FakeConnector()
+        self.cache.get_services(connector)
+        service_list = self.cache.get_services(connector)
+        self.assertEqual(1, connector.discovered)
+        self.assertEqual(
+            3, ServiceData.find_characteristic_handle(service_list, "00002a05-0000-1000-8000-00805f9b34fb")
+        )
+        ## descriptors restored from cache
+        self.assertEqual({3: 5}, ServiceData.get_cccd_handles(service_list))
+        char_data = service_list[0].getCharacteristics()[0]
+        self.assertEqual(b"changed", char_data.find_descriptor("00002901-0000-1000-8000-00805f9b34fb").value)
+        self.assertIsNone(char_data.find_descriptor(CCCD_UUID).value)
+
+    def test_invalidate(self):
+        connector = FakeConnector()
+        self.cache.get_services(connector)
+        ## warm start creates compiled cache of entry
+        self.cache.get_services(connector)
+        cache_path = self.cache.get_path("AA:BB:CC:DD:EE:FF", "public")
+        self.assertTrue(os.path.exists(dataio.get_cache_path(cache_path)))
+        self.cache.invalidate("AA:BB:CC:DD:EE:FF", "public")
+        self.assertFalse(os.path.exists(dataio.get_cache_path(cache_path)))
+        self.cache.get_services(connector)
+        self.assertEqual(2, connector.discovered)
+
+    def test_hash_mismatch(self):
+        connector = FakeConnector(b"\x01" * 16)
+        self.cache.get_services(connector)
+        self.cache.get_services(connector)
+        self.assertEqual(1, connector.discovered)
+        connector.db_hash = b"\x02" * 16
+        self.cache.get_services(connector)
+        self.assertEqual(2, connector.discovered)
+
+    def test_no_address_type(self):
+        connector = NoAddressTypeConnector()
+        self.cache.get_services(connector)
+        self.cache.get_services(connector)
+        self.assertEqual(1, connector.discovered)
+        self.cache.invalidate("AA:BB:CC:DD:EE:FF", GattCache.get_address_type(connector))
+        self.cache.get_services(connector)
+        self.assertEqual(2, connector.discovered)
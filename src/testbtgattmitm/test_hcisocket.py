@@ -0,0 +1,91 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import struct
+import socket
+import unittest
+
+from btgattmitm.hcitool.hcisocket import HciSocket, HciError, make_opcode, hex_list_to_bytes
+
+
+def make_complete(opcode, status, data=b""):
+    params = struct.pack("<BHB", 1, opcode, status) + data
+    return struct.pack("<BBB", 0x04, 0x0E, len(params)) + params
+
+
+def make_status(opcode, status):
+    params = struct.pack("<BBH", status, 1, opcode)
+    return struct.pack("<BBB", 0x04, 0x0F, len(params)) + params
+
+
+class FakeSocket:
+    """Replays recorded HCI events."""
+
+    def __init__(self, responses=None):
+        self.responses = list(responses or [])
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(bytes(data))
+        return len(data)
+
+    def recv(self, _bufsize):
+        if not self.responses:
+            raise socket.timeout()
+        return self.responses.pop(0)
+
+    def settimeout(self, _timeout):
+        pass
+
+    def close(self):
+        pass
+
+
+class HciSocketTest(unittest.TestCase):
+    def test_command_complete(self):
+        opcode = make_opcode(0x08, 0x000A)
+        self.assertEqual(0x200A, opcode)
+        fake = FakeSocket([make_complete(opcode, 0x00)])
+        hci = HciSocket(0, fake)
+        response = hci.le_set_advertise_enable(True)
+        self.assertEqual(b"\x01\x0a\x20\x01\x01", fake.sent[0])
+        self.assertTrue(response.is_success())
+
+    def test_skip_other(self):
+        opcode = make_opcode(0x08, 0x0008)
+        ## response of other command comes first
+        fake = FakeSocket([make_complete(0x0C03, 0x00), make_complete(opcode, 0x00)])
+        hci = HciSocket(0, fake)
+        hci.le_set_advertising_data(bytes.fromhex("020106"))
+        params = fake.sent[0][4:]
+        self.assertEqual(32, len(params))
+        self.assertEqual(bytes.fromhex("03020106"), params[:4])
+        self.assertEqual([], fake.responses)
+
+    def test_random_address(self):
+        opcode = make_opcode(0x08, 0x0035)
+        fake = FakeSocket([make_complete(opcode, 0x0C)])
+        hci = HciSocket(0, fake)
+        with self.assertRaises(HciError) as context:
+            hci.le_set_advertising_set_random_address(2, "00:11:22:33:44:55")
+        self.assertEqual(0x0C, context.exception.status)
+        self.assertEqual(b"\x01\x35\x20\x07\x02" + bytes.fromhex("554433221100"), fake.sent[0])
+
+    def test_command_status(self):
+        opcode = make_opcode(0x08, 0x0006)
+        fake = FakeSocket([make_status(opcode, 0x12)])
+        hci = HciSocket(0, fake)
+        params = hex_list_to_bytes(["0x20", "00", "20", "0"])
+        self.assertEqual(b"\x20\x00\x20\x00", params)
+        response = hci.send_command(0x08, 0x0006, params)
+        self.assertEqual(0x0F, response.event)
+        self.assertEqual(0x12, response.status)
+
+    def test_timeout(self):
+        hci = HciSocket(0, FakeSocket(), timeout=0.1)
+        self.assertRaises(TimeoutError, hci.le_set_advertise_enable, False)
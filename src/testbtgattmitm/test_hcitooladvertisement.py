@@ -0,0 +1,54 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import unittest
+import subprocess  # nosec
+from unittest import mock
+
+from btgattmitm.hcitool.advertisement import Advertiser
+from btgattmitm.hcitool.hcisocket import HciResponse
+
+
+class FakeHciSocket:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def send_command(self, ogf: int, ocf: int, params: bytes = b"") -> HciResponse:
+        self.calls.append(("command", ogf, ocf, params))
+        return HciResponse(0x0E, (ogf << 10) | ocf, 0x00)
+
+    def close(self):
+        self.calls.append(("close",))
+
+
+class AdvertiserTest(unittest.TestCase):
+    def test_stop(self):
+        calls = []
+        advertiser = Advertiser(0)
+        advertiser.hci = FakeHciSocket(calls)
+        with mock.patch("subprocess.run", side_effect=lambda *args, **kwargs: calls.append(("run",))):
+            self.assertTrue(advertiser.stop())
+        ## advertisement disabled before socket is closed
+        self.assertEqual([("command", 0x08, 0x000A, b"\x00"), ("run",), ("close",)], calls)
+        self.assertIsNone(advertiser.hci)
+
+    def test_stop_disable_failed(self):
+        commands = []
+
+        def run_process(cmd_list, **_kwargs):
+            commands.append(cmd_list)
+            if "hcitool" in cmd_list:
+                raise subprocess.CalledProcessError(1, cmd_list, stderr="failed")
+
+        advertiser = Advertiser(0)
+        advertiser.hci = None
+        with mock.patch("subprocess.run", side_effect=run_process):
+            self.assertTrue(advertiser.stop())
+        ## scanning disabled even if disabling advertisement failed
+        self.assertEqual(2, len(commands))
+        self.assertIn("noscan", commands[1])
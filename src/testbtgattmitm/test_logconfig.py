@@ -0,0 +1,57 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import logging
+import unittest
+
+from btgattmitm.logconfig import BoundedQueueHandler, LogPipeline, parse_levels
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def make_record(message, *args):
+    return logging.LogRecord("test", logging.INFO, __file__, 0, message, args, None)
+
+
+class LogConfigTest(unittest.TestCase):
+    def test_parse_levels(self):
+        levels = parse_levels(["connector=debug", "gattmock=WARNING"])
+        self.assertEqual({"connector": logging.DEBUG, "gattmock": logging.WARNING}, levels)
+        self.assertEqual({}, parse_levels(None))
+        self.assertRaises(ValueError, parse_levels, ["unknown=DEBUG"])
+        self.assertRaises(ValueError, parse_levels, ["connector=VERBOSE"])
+
+    def test_queue_drop(self):
+        handler = BoundedQueueHandler(max_size=2)
+        for i in range(5):
+            handler.handle(make_record("message %s", i))
+        self.assertEqual(3, handler.dropped)
+        self.assertEqual(2, handler.queue.qsize())
+
+    def test_pipeline(self):
+        target = ListHandler()
+        pipeline = LogPipeline([target], queue_size=16)
+        pipeline.start()
+        queue_handler = pipeline.get_root_handlers()[0]
+        queue_handler.handle(make_record("value %s", 1))
+        pipeline.stop()
+        self.assertEqual(["value 1"], target.messages)
+
+    def test_pipeline_sync(self):
+        target = ListHandler()
+        pipeline = LogPipeline([target], queue_size=0)
+        self.assertEqual([target], pipeline.get_root_handlers())
+        pipeline.start()
+        pipeline.stop()
@@ -0,0 +1,104 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import struct
+import socket
+import unittest
+
+from btgattmitm.btmgmt.mgmtsocket import (
+    MgmtSocket,
+    MgmtError,
+    MGMT_OP_SET_POWERED,
+    MGMT_OP_SET_PUBLIC_ADDRESS,
+    MGMT_OP_ADD_ADVERTISING,
+    MGMT_OP_READ_INDEX_LIST,
+    MGMT_EV_CMD_COMPLETE,
+    MGMT_EV_CMD_STATUS,
+)
+
+
+def make_event(event, index, params):
+    return struct.pack("<HHH", event, index, len(params)) + params
+
+
+def make_complete(opcode, index, status, data=b""):
+    return make_event(MGMT_EV_CMD_COMPLETE, index, struct.pack("<HB", opcode, status) + data)
+
+
+class FakeSocket:
+    """Replays recorded mgmt responses."""
+
+    def __init__(self, responses=None):
+        self.responses = list(responses or [])
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(bytes(data))
+        return len(data)
+
+    def recv(self, _bufsize):
+        if not self.responses:
+            raise socket.timeout()
+        return self.responses.pop(0)
+
+    def settimeout(self, _timeout):
+        pass
+
+    def close(self):
+        pass
+
+
+class MgmtSocketTest(unittest.TestCase):
+    def test_set_powered(self):
+        ## current settings returned
+        fake = FakeSocket([make_complete(MGMT_OP_SET_POWERED, 0, 0, struct.pack("<I", 0x01))])
+        mgmt = MgmtSocket(fake)
+        response = mgmt.set_powered(0, True)
+        self.assertEqual(b"\x05\x00\x00\x00\x01\x00\x01", fake.sent[0])
+        self.assertTrue(response.is_success())
+        self.assertEqual(struct.pack("<I", 0x01), response.data)
+
+    def test_public_address(self):
+        fake = FakeSocket([make_complete(MGMT_OP_SET_PUBLIC_ADDRESS, 1, 0)])
+        mgmt = MgmtSocket(fake)
+        mgmt.set_public_address(1, "00:11:22:33:44:55")
+        self.assertEqual(b"\x39\x00\x01\x00\x06\x00" + bytes.fromhex("554433221100"), fake.sent[0])
+
+    def test_add_advertising(self):
+        fake = FakeSocket([make_complete(MGMT_OP_ADD_ADVERTISING, 0, 0, b"\x02")])
+        mgmt = MgmtSocket(fake)
+        instance = mgmt.add_advertising(0, 2, bytes.fromhex("020106"), bytes.fromhex("03094142"))
+        self.assertEqual(2, instance)
+        params = fake.sent[0][6:]
+        self.assertEqual(struct.pack("<BIHHBB", 2, 1, 0, 0, 3, 4), params[:11])
+        self.assertEqual(bytes.fromhex("02010603094142"), params[11:])
+
+    def test_read_index_list(self):
+        fake = FakeSocket([make_complete(MGMT_OP_READ_INDEX_LIST, 0xFFFF, 0, struct.pack("<HHH", 2, 0, 1))])
+        mgmt = MgmtSocket(fake)
+        self.assertEqual([0, 1], mgmt.read_index_list())
+
+    def test_events(self):
+        events = []
+        ## unsolicited 'New Settings' event comes before response
+        fake = FakeSocket(
+            [
+                make_event(0x0006, 0, struct.pack("<I", 0x01)),
+                make_event(MGMT_EV_CMD_STATUS, 0, struct.pack("<HB", MGMT_OP_SET_POWERED, 0x14)),
+            ]
+        )
+        mgmt = MgmtSocket(fake)
+        mgmt.event_handler = lambda event, index, params: events.append((event, index, params))
+        with self.assertRaises(MgmtError) as context:
+            mgmt.set_powered(0, False)
+        self.assertEqual(0x14, context.exception.status)
+        self.assertEqual([(0x0006, 0, struct.pack("<I", 0x01))], events)
+
+    def test_timeout(self):
+        mgmt = MgmtSocket(FakeSocket(), timeout=0.1)
+        self.assertRaises(TimeoutError, mgmt.set_advertising, 0, 0)
@@ -0,0 +1,89 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import unittest
+from unittest import mock
+
+from btgattmitm.capture import LINK_UPSTREAM, DIR_RX, OP_NOTIFY
+
+try:
+    from btgattmitm import multisession
+except ImportError:
+    ## GLib or D-Bus bindings not installed
+    multisession = None
+
+
+class FakeMitmManager:
+    """Replaces D-Bus dependent manager of single session."""
+
+    def __init__(self, iface_index: int = 0, session_index: int = 0, **_kwargs):
+        self.iface_index = iface_index
+        self.session_index = session_index
+        self.traffic_recorder = None
+        self.gatt_cache = None
+        self.write_pipeline = None
+        self.value_cache = None
+        self.stopped = False
+
+    def set_traffic_recorder(self, recorder):
+        self.traffic_recorder = recorder
+
+    def set_gatt_cache(self, gatt_cache):
+        self.gatt_cache = gatt_cache
+
+    def stop(self):
+        self.stopped = True
+
+
+class FakeConnector:
+    def __init__(self):
+        self.disconnected = False
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+@unittest.skipIf(multisession is None, "GLib bindings not installed")
+class MultiSessionManagerTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.patches = [
+            mock.patch.object(multisession, "create_system_bus", return_value=None),
+            mock.patch.object(multisession, "get_object_cache"),
+            mock.patch.object(multisession, "MitmManager", FakeMitmManager),
+        ]
+        for item in self.patches:
+            item.start()
+        self.manager = multisession.MultiSessionManager()
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        for item in self.patches:
+            item.stop()
+
+    def test_add_session(self):
+        first = self.manager.add_session("first", 0, FakeConnector(), {})
+        second = self.manager.add_session("second", 0, None, {})
+        self.assertEqual([0, 1], [first.index, second.index])
+        self.assertEqual([0, 1], [item.manager.session_index for item in self.manager.sessions])
+
+        first.manager.traffic_recorder.record(LINK_UPSTREAM, DIR_RX, OP_NOTIFY, 1, b"\x01\x02")
+        stats = self.manager.get_stats()
+        self.assertEqual(2, stats["process"]["sessions"])
+        self.assertEqual(1, stats["sessions"]["first"]["records"])
+        self.assertEqual(0, stats["sessions"]["second"]["records"])
+
+    def test_stop(self):
+        connector = FakeConnector()
+        session = self.manager.add_session("first", 0, connector, {})
+        received = []
+        self.manager.stats_handler = received.append
+        self.manager.stop()
+        self.assertTrue(session.manager.stopped)
+        self.assertTrue(connector.disconnected)
+        self.assertEqual(1, len(received))
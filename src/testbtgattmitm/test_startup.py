@@ -0,0 +1,55 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import time
+import threading
+import unittest
+
+from btgattmitm.startup import StartupPipeline
+
+
+class StartupPipelineTest(unittest.TestCase):
+    def test_concurrent(self):
+        pipeline = StartupPipeline()
+        pipeline.add_stage("first", lambda: time.sleep(0.2) or 1, 5.0)
+        pipeline.add_stage("second", lambda: time.sleep(0.2) or 2, 5.0)
+        pipeline.run()
+        self.assertEqual(1, pipeline.get_result("first"))
+        self.assertEqual(2, pipeline.get_result("second"))
+        self.assertLess(pipeline.duration, 0.35)
+
+    def test_depends(self):
+        order = []
+        pipeline = StartupPipeline()
+        pipeline.add_stage("first", lambda: time.sleep(0.1) or order.append("first"), 5.0)
+        pipeline.add_stage("second", lambda: order.append("second"), 5.0, depends=["first"])
+        pipeline.run()
+        self.assertEqual(["first", "second"], order)
+        self.assertRaises(ValueError, pipeline.add_stage, "third", lambda: None, 1.0, ["unknown"])
+
+    def test_exception(self):
+        def failing():
+            raise ValueError("failed")
+
+        pipeline = StartupPipeline()
+        pipeline.add_stage("failing", failing, 5.0)
+        pipeline.add_stage("next", lambda: True, 5.0, depends=["failing"])
+        pipeline.run()
+        self.assertRaises(ValueError, pipeline.get_result, "failing")
+        self.assertTrue(pipeline.get_result("next"))
+
+    def test_timeout(self):
+        release = threading.Event()
+        pipeline = StartupPipeline()
+        pipeline.add_stage("slow", lambda: release.wait(5.0), 0.1)
+        pipeline.add_stage("fast", lambda: True, 5.0)
+        pipeline.run()
+        release.set()
+        self.assertRaises(TimeoutError, pipeline.get_result, "slow")
+        self.assertTrue(pipeline.get_result("fast"))
+        self.assertLess(pipeline.duration, 1.0)
@@ -0,0 +1,74 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from btgattmitm.supervisor import Supervisor, WorkerShard, distribute_targets, make_shards, parse_session_target
+
+
+## executed in worker process - crashes on first run
+def crashing_worker(shard: WorkerShard, stats_handler):
+    marker_path = os.path.join(shard.targets[0], shard.name)
+    stats_handler({"sessions": {shard.name: {"records": 2, "bytes": 10, "throughput": 1.0}}})
+    if not os.path.exists(marker_path):
+        with open(marker_path, "w", encoding="utf-8"):
+            pass
+        os._exit(3)  # pylint: disable=W0212
+    return True
+
+
+class DistributeTargetsTest(unittest.TestCase):
+    def test_parse_session_target(self):
+        self.assertEqual(("profile.yaml", None), parse_session_target("profile.yaml"))
+        self.assertEqual(("00:11:22:33:44:55", "hci1"), parse_session_target("00:11:22:33:44:55@hci1"))
+
+    def test_distribute(self):
+        targets = [("a", None), ("b", 1), ("c", None), ("d", None), ("e", 2)]
+        targets_dict = distribute_targets(targets, [0, 1])
+        self.assertEqual({0: ["a", "c"], 1: ["b", "d"], 2: ["e"]}, targets_dict)
+
+        with self.assertRaises(ValueError):
+            distribute_targets([("a", None)], [])
+
+    def test_make_shards(self):
+        shards = make_shards({1: ["a", "b", "c"], 0: ["d"]}, sessions_per_worker=2)
+        self.assertEqual(["hci0-0", "hci1-0", "hci1-1"], [shard.name for shard in shards])
+        self.assertEqual([["d"], ["a", "b"], ["c"]], [shard.targets for shard in shards])
+
+        shards = make_shards({1: ["a", "b", "c"]})
+        self.assertEqual([["a", "b", "c"]], [shard.targets for shard in shards])
+
+
+class SupervisorTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        shutil.rmtree(self.work_dir)
+
+    def test_restart(self):
+        shards = [WorkerShard("hci0-0", 0, [self.work_dir]), WorkerShard("hci1-0", 1, [self.work_dir])]
+        supervisor = Supervisor(crashing_worker, shards)
+        supervisor.RESTART_DELAY = 0.1
+        supervisor.start()
+        supervisor.run(duration=60.0)
+        supervisor.stop()
+
+        stats = supervisor.get_stats()
+        total = stats["total"]
+        self.assertEqual(2, total["workers"])
+        self.assertEqual(0, total["alive"])
+        self.assertEqual(2, total["restarts"])
+        self.assertEqual(2, total["sessions"])
+        self.assertEqual(4, total["records"])
+        self.assertEqual(1, stats["workers"]["hci1-0"]["adapter"])
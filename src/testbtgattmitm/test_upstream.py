@@ -0,0 +1,151 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import unittest
+import time
+import threading
+
+from btgattmitm.upstream import UpstreamEngine, LatencyStats, Histogram, RequestExpiredError
+from btgattmitm.upstream import PRIORITY_WRITE, PRIORITY_READ, PRIORITY_BACKGROUND
+
+
+class LatencyStatsTest(unittest.TestCase):
+    def test_percentile(self):
+        stats = LatencyStats()
+        for val in range(1, 101):
+            stats.add(val / 1000.0)
+        summary = stats.get_summary()
+        self.assertEqual(100, summary["count"])
+        self.assertAlmostEqual(0.05, summary["p50"], places=2)
+        self.assertAlmostEqual(0.099, summary["p99"], places=3)
+        self.assertAlmostEqual(0.1, summary["max"])
+
+    def test_empty(self):
+        stats = LatencyStats()
+        self.assertEqual(0.0, stats.percentile(99))
+
+
+class HistogramTest(unittest.TestCase):
+    def test_add(self):
+        histogram = Histogram([1, 5])
+        for val in (0, 1, 2, 5, 6, 100):
+            histogram.add(val)
+        self.assertEqual([(1, 2), (5, 2), (None, 2)], histogram.get_data())
+
+
+class UpstreamEngineTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.poll_thread = None
+        self.engine = UpstreamEngine(self._poll)
+        self.engine.start()
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.engine.stop()
+
+    def _poll(self, timeout):
+        self.poll_thread = threading.current_thread()
+        time.sleep(timeout)
+
+    def test_execute(self):
+        result = self.engine.execute_request("read", lambda val: val * 2, 21, timeout=1.0)
+        self.assertEqual(42, result)
+        self.assertIs(self.engine, self.poll_thread)
+
+    def test_execute_on_engine_thread(self):
+        ## nested request must not deadlock
+        def nested():
+            return self.engine.execute_request("inner", threading.current_thread)
+
+        result = self.engine.execute_request("outer", nested, timeout=1.0)
+        self.assertIs(self.engine, result)
+
+    def test_error(self):
+        def failing():
+            raise ValueError("failed")
+
+        self.assertRaises(ValueError, self.engine.execute_request, "write", failing, timeout=1.0)
+
+    def test_stats(self):
+        self.engine.execute_request("read", int, timeout=1.0)
+        self.engine.execute_request("read", int, timeout=1.0)
+        stats = self.engine.get_stats()
+        self.assertEqual(2, stats["read"]["queue_wait"]["count"])
+        self.assertEqual(2, stats["read"]["service_time"]["count"])
+
+    def test_stopped(self):
+        self.engine.stop()
+        request = self.engine.submit("read", int)
+        self.assertRaises(RuntimeError, request.wait, 1.0)
+
+    def test_submit_during_stop(self):
+        requests_queue = self.engine._requests  # pylint: disable=W0212
+        original_put = requests_queue.put
+        entered = threading.Event()
+
+        def delayed_put(item):
+            entered.set()
+            time.sleep(0.2)
+            original_put(item)
+
+        requests_queue.put = delayed_put
+        submitted = []
+        submitter = threading.Thread(target=lambda: submitted.append(self.engine.submit("read", int)))
+        submitter.start()
+        self.assertTrue(entered.wait(1.0))
+        self.engine.stop()
+        submitter.join()
+        ## request queued while stopping is cancelled, not left pending
+        self.assertRaises(RuntimeError, submitted[0].wait, 1.0)
+
+    def _block_engine(self):
+        ## occupy engine until returned event is set
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(1.0)
+
+        self.engine.submit("block", blocking, priority=PRIORITY_WRITE)
+        started.wait(1.0)
+        return release
+
+    def test_priority(self):
+        release = self._block_engine()
+        executed = []
+        requests = [
+            self.engine.submit("prefetch", executed.append, "background", priority=PRIORITY_BACKGROUND),
+            self.engine.submit("read", executed.append, "read1", priority=PRIORITY_READ),
+            self.engine.submit("read", executed.append, "read2", priority=PRIORITY_READ),
+            self.engine.submit("write", executed.append, "write", priority=PRIORITY_WRITE),
+        ]
+        release.set()
+        for request in requests:
+            request.wait(1.0)
+        self.assertEqual(["write", "read1", "read2", "background"], executed)
+
+        class_stats = self.engine.get_class_stats()
+        self.assertEqual(2, class_stats["read"]["queue_wait"]["count"])
+        self.assertEqual(2, class_stats["read"]["max_depth"])
+        self.assertEqual(0, class_stats["read"]["depth"])
+        ## depth seen by submitted reads: 0 and 1
+        self.assertEqual([(0, 1), (1, 1)], class_stats["read"]["depth_histogram"][:2])
+
+    def test_deadline(self):
+        release = self._block_engine()
+        executed = []
+        expired = self.engine.submit("read", executed.append, "expired", priority=PRIORITY_READ, deadline=0.0)
+        valid = self.engine.submit("read", executed.append, "valid", priority=PRIORITY_READ, deadline=10.0)
+        time.sleep(0.01)
+        release.set()
+        self.assertRaises(RequestExpiredError, expired.wait, 1.0)
+        valid.wait(1.0)
+        self.assertEqual(["valid"], executed)
+        self.assertEqual(1, self.engine.get_class_stats()["read"]["expired"])
@@ -0,0 +1,84 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import unittest
+
+from btgattmitm.valuecache import ValueCache, CachePolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.value = 0.0
+
+    def __call__(self):
+        return self.value
+
+
+class ValueCacheTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.clock = FakeClock()
+        self.cache = ValueCache(max_size=2, clock=self.clock)
+        self.cache.uuid_policies["aaa"] = CachePolicy("static")
+        self.cache.uuid_policies["bbb"] = CachePolicy("ttl", 5.0)
+        self.cache.register(1, "AAA")
+        self.cache.register(2, "bbb")
+        self.cache.register(3, "ccc")
+
+    def test_static(self):
+        self.assertIsNone(self.cache.get(1))
+        self.cache.put(1, b"\x01")
+        self.clock.value = 1000.0
+        self.assertEqual(b"\x01", self.cache.get(1))
+        stats = self.cache.get_stats()
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(1, stats["misses"])
+
+    def test_ttl(self):
+        self.cache.put(2, b"\x02")
+        self.clock.value = 4.0
+        self.assertEqual(b"\x02", self.cache.get(2))
+        self.clock.value = 6.0
+        self.assertIsNone(self.cache.get(2))
+
+    def test_through(self):
+        self.cache.put(3, b"\x03")
+        self.assertIsNone(self.cache.get(3))
+        self.assertEqual(0, self.cache.get_stats()["size"])
+
+    def test_invalidate(self):
+        self.cache.put(1, b"\x01")
+        self.cache.invalidate(1)
+        self.assertIsNone(self.cache.get(1))
+
+    def test_lru(self):
+        self.cache.register(4, "aaa")
+        self.cache.put(1, b"\x01")
+        self.cache.put(2, b"\x02")
+        self.cache.get(1)
+        self.cache.put(4, b"\x04")
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(b"\x01", self.cache.get(1))
+        self.assertEqual(1, self.cache.get_stats()["evictions"])
+
+    def test_from_config(self):
+        config = {
+            "maxsize": 10,
+            "default": "static",
+            "characteristics": {"AAA": "through", "bbb": {"policy": "ttl", "ttl": 1.5}},
+        }
+        cache = ValueCache.from_config(config)
+        self.assertEqual(10, cache.max_size)
+        self.assertEqual("static", cache.default_policy.policy)
+        self.assertEqual("through", cache.uuid_policies["aaa"].policy)
+        self.assertEqual(1.5, cache.uuid_policies["bbb"].ttl)
+        self.assertIsNone(ValueCache.from_config(None))
+
+    def test_invalid_policy(self):
+        self.assertRaises(ValueError, CachePolicy, "unknown")
+        self.assertRaises(ValueError, CachePolicy, "ttl")
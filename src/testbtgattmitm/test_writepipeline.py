@@ -0,0 +1,153 @@
+#
+# Copyright (c) 2023, Arkadiusz Netczuk <dev.arnet@gmail.com>
+# All rights reserved.
+#
+# This source code is licensed under the BSD 3-Clause license found in the
+# LICENSE file in the root directory of this source tree.
+#
+
+import unittest
+import time
+import threading
+
+from btgattmitm.connector import ServiceConnector
+from btgattmitm.writepipeline import WritePipeline
+
+
+class FakeConnector(ServiceConnector):
+    def __init__(self):
+        self.writes = []
+        self.release = threading.Event()
+        self.release.set()
+        self.fail = False
+
+    def write_characteristic(self, handle, val, with_response=False):
+        self.release.wait(1.0)
+        if self.fail:
+            raise ValueError("write failed")
+        self.writes.append((handle, val, with_response))
+
+
+class WritePipelineTest(unittest.TestCase):
+    def setUp(self):
+        ## Called before testfunction is executed
+        self.connector = FakeConnector()
+        self.pipeline = WritePipeline(self.connector, max_pending=2, timeout=0.5, coalesce_uuids=["AAA"])
+        self.pipeline.register(1, "aaa")
+        self.pipeline.register(2, "bbb")
+
+    def tearDown(self):
+        ## Called after testfunction was executed
+        self.connector.release.set()
+        self.pipeline.stop()
+
+    def test_request(self):
+        self.pipeline.start()
+        self.pipeline.write_request(2, b"\x01")
+        self.assertEqual([(2, b"\x01", True)], self.connector.writes)
+
+    def test_request_error(self):
+        self.connector.fail = True
+        self.pipeline.start()
+        self.assertRaises(ValueError, self.pipeline.write_request, 2, b"\x01")
+        self.assertEqual(1, self.pipeline.get_stats()["failed"])
+
+    def test_coalesce(self):
+        self.pipeline.write_command(1, b"\x01")
+        self.pipeline.write_command(1, b"\x02")
+        self.pipeline.write_command(2, b"\x03")
+        self.pipeline.start()
+        self.pipeline.write_request(2, b"\x04")
+        self.assertEqual(
+            [(1, b"\x02", False), (2, b"\x03", False), (2, b"\x04", True)],
+            self.connector.writes,
+        )
+        self.assertEqual(1, self.pipeline.get_stats()["coalesced"])
+
+    def test_coalesce_interleaved(self):
+        self.pipeline.max_pending = 4
+        self.pipeline.write_command(1, b"\x01")
+        self.pipeline.write_command(2, b"\x02")
+        self.pipeline.write_command(1, b"\x03")
+        self.pipeline.write_command(1, b"\x04")
+        self.pipeline.start()
+        self.pipeline.stop()
+        ## order of writes to different handles kept
+        self.assertEqual(
+            [(1, b"\x01", False), (2, b"\x02", False), (1, b"\x04", False)],
+            self.connector.writes,
+        )
+        self.assertEqual(1, self.pipeline.get_stats()["coalesced"])
+
+    def test_no_coalesce(self):
+        self.pipeline.write_command(2, b"\x01")
+        self.pipeline.write_command(2, b"\x02")
+        self.pipeline.start()
+        self.pipeline.stop()
+        self.assertEqual([(2, b"\x01", False), (2, b"\x02", False)], self.connector.writes)
+
+    def test_backpressure(self):
+        ## pipeline not started - queue fills up
+        self.pipeline.write_command(2, b"\x01")
+        self.pipeline.write_command(2, b"\x02")
+        ## command dropped without waiting
+        self.pipeline.write_command(2, b"\x03")
+        self.assertEqual(1, self.pipeline.get_stats()["dropped"])
+        ## request waits for free slot
+        self.assertRaises(TimeoutError, self.pipeline.write_request, 2, b"\x04")
+        self.assertEqual(1, self.pipeline.get_stats()["rejected"])
+
+    def test_request_timeout(self):
+        ## pipeline not started - request times out before being sent
+        self.assertRaises(TimeoutError, self.pipeline.write_request, 2, b"\x01")
+        self.pipeline.start()
+        self.pipeline.stop()
+        self.assertEqual([], self.connector.writes)
+        self.assertEqual(1, self.pipeline.get_stats()["cancelled"])
+
+    def test_request_single_timeout(self):
+        self.pipeline.write_command(2, b"\x01")
+        self.pipeline.write_command(2, b"\x02")
+        ## sending blocks - slots are freed when batch is taken after delay
+        self.connector.release.clear()
+        starter = threading.Timer(0.3, self.pipeline.start)
+        starter.start()
+        start_time = time.monotonic()
+        self.assertRaises(TimeoutError, self.pipeline.write_request, 2, b"\x03")
+        ## waiting for slot and for confirmation share one timeout
+        self.assertLess(time.monotonic() - start_time, 0.7)
+        starter.join()
+
+    def test_submit_request(self):
+        results = []
+        done = threading.Event()
+
+        def callback(error):
+            results.append(error)
+            done.set()
+
+        self.pipeline.start()
+        self.pipeline.submit_request(2, b"\x01", callback)
+        self.assertTrue(done.wait(1.0))
+        self.assertEqual([None], results)
+        self.assertEqual([(2, b"\x01", True)], self.connector.writes)
+
+    def test_submit_request_full(self):
+        ## pipeline not started - queue fills up
+        self.pipeline.write_command(2, b"\x01")
+        self.pipeline.write_command(2, b"\x02")
+        ## rejected without waiting
+        start_time = time.monotonic()
+        self.assertRaises(TimeoutError, self.pipeline.submit_request, 2, b"\x03", print)
+        self.assertLess(time.monotonic() - start_time, 0.1)
+        self.assertEqual(1, self.pipeline.get_stats()["rejected"])
+
+    def test_cancel_request(self):
+        results = []
+        request = self.pipeline.submit_request(2, b"\x01", results.append)
+        self.assertTrue(self.pipeline.cancel_request(request))
+        self.pipeline.start()
+        self.pipeline.stop()
+        self.assertEqual([], self.connector.writes)
+        self.assertEqual([], results)
+        self.assertEqual(1, self.pipeline.get_stats()["cancelled"])